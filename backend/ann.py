@@ -0,0 +1,353 @@
+import os
+import threading
+import time
+import numpy as np
+
+# "exact" scores every row, "ivf" probes a few k-means partitions, "auto" switches at ANN_MIN_ROWS
+JOB_INDEX = os.getenv("JOB_INDEX", "auto")
+JOB_INDEX_PATH = os.getenv("JOB_INDEX_PATH", "data/job_index.npz")
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "20000"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+
+
+def top_k_indices(scores, k):
+    # argpartition is O(N); only the k survivors get sorted (score desc, position asc)
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.lexsort((top, -scores[top]))]
+
+
+def _rows_for_ids(arrays, ids):
+    # arrays.ids is sorted, so id -> row is a binary search; ids deleted since indexing are dropped
+    rows = np.searchsorted(arrays.ids, ids)
+    rows = np.minimum(rows, max(len(arrays.ids) - 1, 0))
+    valid = arrays.ids[rows] == ids if len(arrays.ids) else np.zeros(len(ids), dtype=bool)
+    return rows[valid]
+
+
+# Brute force over the whole matrix; exact, and the reference for recall measurements
+class ExactIndex:
+    exact = True
+
+    def sync(self, arrays):
+        pass
+
+    def wait(self, timeout=None):
+        pass
+
+    def search(self, arrays, query, n):
+        sims = arrays.matrix @ query
+        rows = top_k_indices(sims, n)
+        return rows, sims[rows]
+
+    def save(self, path=JOB_INDEX_PATH):
+        pass
+
+    def load(self, path=JOB_INDEX_PATH):
+        return False
+
+
+# Inverted-file index: spherical k-means centroids, each job id filed under its nearest centroid.
+# Search scores only the ids in the nprobe closest partitions against the shared job matrix.
+# Centroids, partitions and indexed ids are one immutable tuple that writers replace whole,
+# so a search always sees a consistent index, even during a rebuild.
+class IVFIndex:
+    exact = False
+
+    def __init__(self, nlist=None, nprobe=IVF_NPROBE, train_sample=50000, iterations=10, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_sample = train_sample
+        self.iterations = iterations
+        self.seed = seed
+        self._state = (None, [], np.zeros(0, dtype=np.int64))
+        self.trained_rows = 0
+        self._latest = None
+        self._rebuild = None
+        self._lock = threading.Lock()
+
+    @property
+    def centroids(self):
+        return self._state[0]
+
+    @property
+    def lists(self):
+        return self._state[1]
+
+    @property
+    def indexed_ids(self):
+        return self._state[2]
+
+    def __len__(self):
+        return len(self.indexed_ids)
+
+    # whether centroids for vectors of this dimension are published, i.e. search can answer
+    def ready(self, dim):
+        centroids = self.centroids
+        return centroids is not None and centroids.shape[1] == dim
+
+    @staticmethod
+    def _assign(vectors, centroids, chunk=65536):
+        labels = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk):
+            labels[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+        return labels
+
+    def train(self, matrix):
+        rng = np.random.default_rng(self.seed)
+        nlist = self.nlist or int(np.clip(np.sqrt(len(matrix)), 1, 4096))
+        sample = matrix
+        if len(matrix) > self.train_sample:
+            sample = matrix[rng.choice(len(matrix), self.train_sample, replace=False)]
+        centroids = sample[rng.choice(len(sample), min(nlist, len(sample)), replace=False)].copy()
+        for _ in range(self.iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # empty partitions keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.where(norms > 0, norms, 1.0), centroids)
+        return centroids.astype(np.float32)
+
+    @classmethod
+    def _with_ids(cls, state, ids, vectors):
+        centroids, lists, indexed_ids = state
+        if len(ids) == 0:
+            return state
+        labels = cls._assign(vectors, centroids)
+        lists = list(lists)
+        for label in np.unique(labels):
+            lists[label] = np.concatenate([lists[label], ids[labels == label]])
+        return centroids, lists, np.union1d(indexed_ids, ids)
+
+    def add(self, ids, vectors):
+        with self._lock:
+            self._state = self._with_ids(self._state, ids, vectors)
+
+    def _fit(self, arrays):
+        centroids = self.train(arrays.matrix)
+        empty = (centroids, [np.zeros(0, dtype=np.int64) for _ in range(len(centroids))], np.zeros(0, dtype=np.int64))
+        return self._with_ids(empty, arrays.ids, arrays.matrix)
+
+    def _publish(self, state, trained_rows):
+        with self._lock:
+            # ids synced while this state was being fitted are filed into it before it goes live
+            latest = self._latest
+            if latest is not None and latest.dim == state[0].shape[1]:
+                missing = np.setdiff1d(latest.ids, state[2], assume_unique=True)
+                state = self._with_ids(state, missing, latest.matrix[np.searchsorted(latest.ids, missing)])
+            self._state = state
+            self.trained_rows = trained_rows
+
+    def build(self, arrays):
+        self._publish(self._fit(arrays), len(arrays))
+
+    def _rebuild_in_background(self, arrays):
+        if self._rebuild is not None and self._rebuild.is_alive():
+            return
+
+        def run():
+            try:
+                self._publish(self._fit(arrays), len(arrays))
+            except Exception as e:
+                print(f"Error rebuilding job index: {str(e)}")
+
+        self._rebuild = threading.Thread(target=run, name="ivf-rebuild", daemon=True)
+        self._rebuild.start()
+
+    # Waits for a background retrain, if one is running (tests, benchmarks)
+    def wait(self, timeout=None):
+        if self._rebuild is not None:
+            self._rebuild.join(timeout)
+
+    # With background=True the first build (or one after a dimension change) also runs in a
+    # thread; search finds nothing until it is published, so callers need a fallback meanwhile.
+    def sync(self, arrays, background=False):
+        with self._lock:
+            self._latest = arrays
+        if not len(arrays):
+            return
+        if not self.ready(arrays.dim):
+            if background:
+                self._rebuild_in_background(arrays)
+            else:
+                self.build(arrays)
+            return
+        new_ids = np.setdiff1d(arrays.ids, self.indexed_ids, assume_unique=True)
+        if len(new_ids):
+            self.add(new_ids, arrays.matrix[np.searchsorted(arrays.ids, new_ids)])
+        # retrain once the corpus has grown well past what the centroids were fitted on; new ids
+        # are already filed above, so searches stay complete while the retrain runs
+        if len(arrays) > 4 * max(self.trained_rows, 1):
+            self._rebuild_in_background(arrays)
+
+    def search(self, arrays, query, n):
+        centroids, lists, _ = self._state
+        if centroids is None or len(arrays) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        probe = top_k_indices(centroids @ query, self.nprobe)
+        candidate_ids = np.concatenate([lists[p] for p in probe])
+        rows = _rows_for_ids(arrays, candidate_ids)
+        sims = arrays.matrix[rows] @ query
+        top = top_k_indices(sims, n)
+        return rows[top], sims[top]
+
+    def save(self, path=JOB_INDEX_PATH):
+        centroids, lists, _ = self._state
+        if centroids is None:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        offsets = np.cumsum([0] + [len(ids) for ids in lists])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                centroids=centroids,
+                list_ids=np.concatenate(lists) if lists else np.zeros(0, dtype=np.int64),
+                list_offsets=offsets,
+                trained_rows=np.array(self.trained_rows),
+            )
+        os.replace(tmp_path, path)
+
+    def load(self, path=JOB_INDEX_PATH):
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as data:
+            centroids = data["centroids"]
+            list_ids = data["list_ids"]
+            offsets = data["list_offsets"]
+            trained_rows = int(data["trained_rows"])
+        lists = [list_ids[offsets[i]:offsets[i + 1]] for i in range(len(centroids))]
+        with self._lock:
+            self._state = (centroids, lists, np.unique(list_ids))
+            self.trained_rows = trained_rows
+        return True
+
+
+# Exact search for small corpora, IVF once the table outgrows ANN_MIN_ROWS. The IVF index is
+# trained in the background, and exact search keeps answering until it is ready.
+class AutoIndex:
+    def __init__(self, min_rows=ANN_MIN_ROWS):
+        self.min_rows = min_rows
+        self.exact_index = ExactIndex()
+        self.ivf_index = IVFIndex()
+        self.use_ivf = False
+        self.dim = None
+
+    @property
+    def exact(self):
+        return not (self.use_ivf and self.ivf_index.ready(self.dim))
+
+    def sync(self, arrays):
+        self.dim = arrays.dim
+        self.use_ivf = len(arrays) >= self.min_rows
+        if self.use_ivf:
+            self.ivf_index.sync(arrays, background=True)
+
+    def wait(self, timeout=None):
+        self.ivf_index.wait(timeout)
+
+    def search(self, arrays, query, n):
+        index = self.exact_index if self.exact else self.ivf_index
+        return index.search(arrays, query, n)
+
+    def save(self, path=JOB_INDEX_PATH):
+        self.ivf_index.save(path)
+
+    def load(self, path=JOB_INDEX_PATH):
+        return self.ivf_index.load(path)
+
+
+def make_index(kind=JOB_INDEX):
+    if kind == "exact":
+        return ExactIndex()
+    if kind == "ivf":
+        return IVFIndex()
+    if kind == "auto":
+        return AutoIndex()
+    raise ValueError(f"Unknown job index type: {kind}")
+
+
+def recall_at_k(index, arrays, queries, k=10):
+    exact = ExactIndex()
+    hits = 0
+    for query in queries:
+        expected, _ = exact.search(arrays, query, k)
+        found, _ = index.search(arrays, query, k)
+        hits += len(np.intersect1d(expected, found))
+    return hits / (k * len(queries))
+
+
+def _synthetic_arrays(rows, dim, clusters, seed):
+    from backend.vector_store import JobArrays
+
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    matrix = centers[rng.integers(0, clusters, rows)] + 0.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+    vocab = [f"skill{i}" for i in range(200)]
+    skills = [list(rng.choice(vocab, 5, replace=False)) for _ in range(rows)]
+    return JobArrays(
+        (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)).astype(np.float32),
+        np.arange(1, rows + 1, dtype=np.int64),
+        np.array([f"Job {i}" for i in range(rows)], dtype=object),
+        np.array(["Co"] * rows, dtype=object),
+        skills,
+    ), vocab
+
+
+# Recall of IVF candidates vs brute force, and of the blended top-10 vs the exact scorer
+def benchmark(rows=100000, dim=384, queries=50, k=10, nprobe=IVF_NPROBE, seed=0):
+    from backend.scoring import score_candidates
+
+    arrays, vocab = _synthetic_arrays(rows, dim, clusters=max(rows // 500, 8), seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    query_rows = rng.choice(rows, queries, replace=False)
+    query_vecs = arrays.matrix[query_rows] + 0.05 * rng.standard_normal((queries, dim)).astype(np.float32)
+    query_vecs /= np.linalg.norm(query_vecs, axis=1, keepdims=True)
+    query_skills = [list(rng.choice(vocab, 5, replace=False)) for _ in range(queries)]
+
+    start = time.perf_counter()
+    index = IVFIndex(nprobe=nprobe)
+    index.build(arrays)
+    build_s = time.perf_counter() - start
+
+    exact = ExactIndex()
+    timings = {"exact": 0.0, "ivf": 0.0}
+    ranked_hits = 0
+    for query, skills in zip(query_vecs, query_skills):
+        results = {}
+        for name, idx in (("exact", exact), ("ivf", index)):
+            start = time.perf_counter()
+            results[name] = score_candidates(arrays, idx, query, skills, k)
+            timings[name] += time.perf_counter() - start
+        ranked_hits += len(np.intersect1d(results["exact"][0], results["ivf"][0]))
+
+    return {
+        "rows": rows,
+        "dim": dim,
+        "nlist": len(index.centroids),
+        "nprobe": nprobe,
+        "build_seconds": round(build_s, 3),
+        "retrieval_recall_at_k": recall_at_k(index, arrays, query_vecs, k),
+        "ranked_recall_at_k": ranked_hits / (k * queries),
+        "exact_ms_per_query": round(1000 * timings["exact"] / queries, 3),
+        "ivf_ms_per_query": round(1000 * timings["ivf"] / queries, 3),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="IVF recall/latency vs exact job scoring")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=IVF_NPROBE)
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.rows, args.dim, args.queries, args.k, args.nprobe), indent=2))
@@ -6,25 +6,50 @@ from contextlib import asynccontextmanager
 
 load_dotenv()
 
-from fastapi import FastAPI, UploadFile, File, Body, Depends, BackgroundTasks
+# /jobs/ page sizes
+DEFAULT_PAGE_SIZE = int(os.getenv("JOBS_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("JOBS_MAX_PAGE_SIZE", "500"))
+
+# upper bound on resumes per /rank_jobs/batch call
+MAX_BATCH_RESUMES = int(os.getenv("MAX_BATCH_RESUMES", "1000"))
+
+# upper bound on job_ids per /explain_matches/ call
+MAX_BATCH_EXPLANATIONS = int(os.getenv("MAX_BATCH_EXPLANATIONS", "20"))
+
+# load the sentence encoder in the background at startup instead of on the first upload
+WARM_MODEL = os.getenv("WARM_MODEL", "1") == "1"
+
+from fastapi import FastAPI, UploadFile, File, Body, Depends, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 from backend.db import SessionLocal
 from fastapi.middleware.cors import CORSMiddleware
-from backend.parser import parse_resume
-from backend.embedding import embed_text
-from backend.scoring import rank_jobs
-from backend.explanation import explain_match
-from backend.ingestion.scraping import ingest_jobs
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+import base64
+import itertools
+import json
+from backend.cache import content_key
+from backend.parser import extract_text, extract_skills_async, skill_cache
+from backend.executors import run_blocking
+from backend.embedding import embed_text, embedding_cache, get_model, is_model_loaded, decode_embedding
+from backend.scoring import rank_jobs, rank_jobs_batch, score_jobs, rank_cache_stats
+from backend.filters import JobFilter
+from backend.explanation import explain_match, explanation_stats, stream_explanation, explain_matches
+from backend.ingestion import scraping
+from backend.ingestion.scheduler import INGEST_SCHEDULER, IngestAlreadyRunning, ingest_scheduler
+from backend.vector_store import job_store
+from backend.sessions import resume_store
+from backend.models import Jobs
+from backend.metrics import MetricsMiddleware, profiles, render_metrics, span
 
+JOB_FIELDS = ("id", "title", "company", "description", "remote", "skills", "salary_min", "salary_max", "created_at", "embedding")
+DEFAULT_JOB_FIELDS = ["id", "title", "company", "remote", "skills", "salary_min", "salary_max", "created_at"]
 
-app = FastAPI()
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# JSON bodies time their own encoding, so slow serialization shows up as its own stage
+class TimedJSONResponse(JSONResponse):
+    def render(self, content):
+        with span("serialize"):
+            return super().render(content)
 
 def get_db():
     db = SessionLocal()
@@ -32,77 +57,403 @@ def get_db():
         yield db
     finally:
         db.close()
-    
-### Scheduled scraping background task
-async def scheduled_scraping():
-    while True:
-        try:
-            ingest_jobs()
-        except Exception as e:
-            print(f"Error during scheduled scraping: {str(e)}")
-        await asyncio.sleep(60 * 60 * 24) # every 24 hours
 
+# Resume fields come from the server-side store when the client sends a resume_id,
+# otherwise from the (legacy) inline text/embedding/skills payload
+def resolve_resume(payload):
+    resume_id = payload.get("resume_id")
+    if resume_id:
+        resume = resume_store.get(resume_id)
+        if resume is None:
+            raise HTTPException(status_code=404, detail=f"Unknown or expired resume_id: {resume_id}")
+        return resume["text"], resume["embedding"], resume["skills"]
+    resume_text = payload.get("resume_text")
+    resume_emb = payload.get("embedding") or payload.get("resume_emb")
+    resume_skills = payload.get("skills") or payload.get("resume_skills")
+    if not resume_text or not resume_emb or not resume_skills:
+        raise ValueError("Missing required fields: resume_id, or resume_text, embedding and skills")
+    return resume_text, resume_emb, resume_skills
+
+# the background encoder load started at startup; /ready reports its failure
+model_warmup = None
+
+def _warmup_error(future):
+    if future is None or not future.done() or future.cancelled():
+        return None
+    return future.exception()
+
+def _report_warmup(future):
+    error = _warmup_error(future)
+    if error is not None:
+        print(f"Error loading the sentence encoder: {str(error)}")
+    
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    global model_warmup
     # startup code
-    asyncio.create_task(scheduled_scraping())
+    job_store.load_index()
+    job_store.load_snapshot()
+    if WARM_MODEL:
+        model_warmup = asyncio.get_running_loop().run_in_executor(None, get_model)
+        model_warmup.add_done_callback(_report_warmup)
+    # scheduled ingestion runs in the scheduler's own thread, in one worker at a time
+    if INGEST_SCHEDULER:
+        ingest_scheduler.start()
     yield
-    # shutdown code (clean up resources if needed)
-    pass
+    # shutdown code
+    ingest_scheduler.stop()
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=TimedJSONResponse)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+# outermost, so its latency includes CORS handling and every stage span lands in the request
+app.add_middleware(MetricsMiddleware)
 
 @app.post("/admin/ingest_jobs/")
-def trigger_scraping(background_tasks: BackgroundTasks):
-    background_tasks.add_task(ingest_jobs)
-    return {"status": "Scraping started in background"}
+def trigger_scraping():
+    try:
+        run_id = ingest_scheduler.trigger("manual")
+    except IngestAlreadyRunning:
+        raise HTTPException(status_code=409, detail="An ingest run is already in progress")
+    return {"status": "Scraping started in background", "run_id": run_id}
+
+# scheduler state of this worker and the latest runs of all workers, newest first
+@app.get("/admin/ingest_runs/")
+def ingest_runs(limit: int = Query(20, ge=1, le=500)):
+    return {"scheduler": ingest_scheduler.status(), "runs": ingest_scheduler.history(limit)}
+
+# per-stage items, busy seconds and throughput of the running (or last) ingest
+@app.get("/admin/ingest_stats/")
+def ingest_stats():
+    return {name: counter.stats() for name, counter in scraping.pipeline_counters.items()}
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+# ready once the encoder is loaded; uploads before that would block on the model load
+@app.get("/ready")
+def ready():
+    if not is_model_loaded():
+        content = {"ready": False, "model_loaded": False}
+        error = _warmup_error(model_warmup)
+        if error is not None:
+            content["model_error"] = str(error)
+        return JSONResponse(status_code=503, content=content)
+    return {"ready": True, "model_loaded": True}
+
+@app.get("/admin/cache_stats/")
+def cache_stats():
+    return {
+        "embedding": embedding_cache.stats(),
+        "resumes": resume_store.stats(),
+        "skills": skill_cache.stats(),
+        "explanations": explanation_stats(),
+        "rankings": rank_cache_stats(),
+    }
+
+# Prometheus text format: per-route request latency and per-stage durations
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# sampled stacks of a request sent with ?profile=1 (PROFILING_ENABLED=1); format=folded gives
+# flame graph input, one "frame;frame;frame count" line per stack. The samples cover every
+# thread of the worker while the request ran, so concurrent work is included (scope "process").
+@app.get("/admin/profiles/{profile_id}")
+def get_profile(profile_id: str, format: str = Query("json")):
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired profile: {profile_id}")
+    if format == "folded":
+        return PlainTextResponse("".join(f"{stack} {count}\n" for stack, count in profile["stacks"].items()))
+    return profile
 
 # API endpoint to upload resume and get embedding
 @app.post("/upload_resume/")
-async def upload_resume(file: UploadFile = File(...)):
+async def upload_resume(file: UploadFile = File(...), include_embedding: bool = Query(False)):
     print("Received file:", file.filename)
     try:
         file_bytes = await file.read()
-        text, skills = parse_resume(file_bytes)
-        embedding = embed_text(text)
-        return {"resume_text": text, "skills": skills, "embedding": embedding}
+        loop = asyncio.get_running_loop()
+        prefix_ready = loop.create_future()
+
+        def on_prefix(prefix):
+            loop.call_soon_threadsafe(lambda: prefix_ready.done() or prefix_ready.set_result(prefix))
+
+        extraction = asyncio.ensure_future(run_blocking(extract_text, file_bytes, on_prefix=on_prefix))
+        await asyncio.wait([prefix_ready, extraction], return_when=asyncio.FIRST_COMPLETED)
+        prefix = prefix_ready.result() if prefix_ready.done() else await extraction
+        # the skill prompt only needs the first pages, so it runs while the rest is extracted and encoded
+        skills_task = asyncio.ensure_future(extract_skills_async(prefix))
+        try:
+            text = await extraction
+            embedding = await run_blocking(embed_text, text)
+            skills = await skills_task
+        finally:
+            skills_task.cancel()
+        resume_id = resume_store.put(text, skills, embedding)
+        response = {"resume_id": resume_id, "resume_text": text, "skills": skills}
+        if include_embedding:
+            response["embedding"] = embedding
+        return response
     except Exception as e:
         return HTTPException(status_code=500, detail=f"Error processing resume data: {str(e)}")
 
-# API endpoint to list all jobs
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def job_fields(fields):
+    if not fields:
+        return DEFAULT_JOB_FIELDS
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in JOB_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # the id is always returned, clients need it to refer to jobs
+    return ["id"] + [name for name in dict.fromkeys(names) if name != "id"]
+
+
+# API endpoint to list jobs, newest first, one page at a time.
+# Keyset pagination on id (ids are assigned in insertion order, so this is also created_at order):
+# pass next_cursor back as ?cursor= for the following page. description and embedding are opt-in via ?fields=.
 @app.get("/jobs/")
-def list_jobs(db: Session = Depends(get_db)):
+def list_jobs(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = Query(None),
+    fields: str = Query(None),
+    db: Session = Depends(get_db),
+):
+    columns = job_fields(fields)
     try:
-        jobs = db.query(Jobs).all()
-        return {"jobs": jobs}
+        query = db.query(*(getattr(Jobs, name) for name in columns))
+        if cursor:
+            query = query.filter(Jobs.id < decode_cursor(cursor))
+        rows = query.order_by(Jobs.id.desc()).limit(limit + 1).all()
+    except HTTPException:
+        raise
     except Exception as e:
         return HTTPException(status_code=500, detail=f"Error fetching jobs: {str(e)}")
 
-# API endpoint to rank jobs based on resume keywords and embedding
+    jobs = []
+    for row in rows[:limit]:
+        job = dict(row._mapping)
+        if "embedding" in job:
+            job["embedding"] = decode_embedding(job["embedding"]).tolist() if job["embedding"] else None
+        jobs.append(job)
+    next_cursor = encode_cursor(jobs[-1]["id"]) if len(rows) > limit else None
+    body = json.dumps(jsonable_encoder({"jobs": jobs, "next_cursor": next_cursor}), separators=(",", ":"))
+
+    # clients revalidate with If-None-Match; an unchanged page costs a query but no payload
+    etag = '"' + content_key(body)[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# API endpoint to rank jobs based on resume keywords and embedding.
+# Optional "filters": {"remote", "min_salary", "max_salary", "companies", "posted_within_days"}
 @app.post("/rank_jobs/")
 def rank_jobs_endpoint(payload: dict = Body(...), db: Session = Depends(get_db)):
     try:
-        resume_text = payload.get("resume_text")
-        resume_emb = payload.get("embedding") or payload.get("resume_emb")
-        resume_skills = payload.get("skills") or payload.get("resume_skills")
-        if not resume_text or not resume_emb or not resume_skills:
-            raise ValueError("Missing required fields: resume_text, embedding, or skills")
-        ranked = rank_jobs(db, resume_text, resume_emb, resume_skills)
+        try:
+            filters = JobFilter.from_payload(payload.get("filters"))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        resume_text, resume_emb, resume_skills = resolve_resume(payload)
+        ranked = rank_jobs(db, resume_text, resume_emb, resume_skills, filters=filters)
         return {"ranked_jobs": ranked}
+    except HTTPException:
+        raise
     except Exception as e:
         return HTTPException(status_code=500, detail=f"Error ranking jobs: {str(e)}")
 
-# API endpoint to explain job match score with LLM prompt
-@app.post("/explain_match/")
-def explain_endpoint(payload: dict = Body(...)):
+def _batch_resumes(payload):
+    resumes = payload["resumes"]
+    if not isinstance(resumes, list) or not resumes or len(resumes) > MAX_BATCH_RESUMES:
+        raise HTTPException(status_code=400, detail=f"resumes must hold between 1 and {MAX_BATCH_RESUMES} entries")
+    entries = []
+    for i, item in enumerate(resumes):
+        if item.get("resume_id"):
+            resume = resume_store.get(item["resume_id"])
+            if resume is None:
+                entries.append((i, item, None, None))
+                continue
+            entries.append((i, item, resume["embedding"], resume["skills"]))
+        elif item.get("embedding"):
+            entries.append((i, item, item["embedding"], item.get("skills") or []))
+        else:
+            raise HTTPException(status_code=400, detail=f"resumes[{i}] needs a resume_id or an embedding")
+    return entries
+
+# API endpoint to rank jobs for many resumes at once, e.g. a recruiter's bulk upload.
+# Body: {"resumes": [{"resume_id"} or {"embedding", "skills"}], "k", "filters"}.
+# Streams one NDJSON line per resume: {"index", "resume_id", "ranked_jobs"} or {"index", "error"}.
+@app.post("/rank_jobs/batch")
+def rank_jobs_batch_endpoint(payload: dict = Body(...), db: Session = Depends(get_db)):
     try:
-        resume_text = payload["resume_text"]
+        entries = _batch_resumes(payload)
+        filters = JobFilter.from_payload(payload.get("filters"))
+        k = int(payload.get("k", 10))
+    except HTTPException:
+        raise
+    except (KeyError, AttributeError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch request: {str(e)}")
+    known = [entry for entry in entries if entry[2] is not None]
+    try:
+        # job arrays are resolved before streaming starts; the request session is not used afterwards
+        ranked = rank_jobs_batch(db, [entry[2] for entry in known], [entry[3] for entry in known], k, filters)
+        first = next(ranked, None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error ranking jobs: {str(e)}")
+
+    def lines():
+        results = ranked if first is None else itertools.chain([first], ranked)
+        failure = None
+        for i, item, embedding, _ in entries:
+            line = {"index": i, "resume_id": item.get("resume_id")}
+            if embedding is None:
+                line["error"] = f"Unknown or expired resume_id: {item['resume_id']}"
+            else:
+                # a failure of the ranking itself ends the generator; the resumes after it report it too
+                if failure is None:
+                    try:
+                        ranked_jobs = next(results)
+                    except Exception as e:
+                        failure = e
+                if failure is not None:
+                    ranked_jobs = failure
+                if isinstance(ranked_jobs, Exception):
+                    line["error"] = f"Error ranking jobs: {str(ranked_jobs)}"
+                else:
+                    line["ranked_jobs"] = ranked_jobs
+            yield json.dumps(line) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+# Explanation inputs from resume_id/job_id, or from the inline text fields
+def explanation_inputs(payload, db: Session):
+    resume_text = resolve_resume(payload)[0] if payload.get("resume_id") else payload["resume_text"]
+    if payload.get("job_id") is not None:
+        job = db.get(Jobs, payload["job_id"])
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Unknown job_id: {payload['job_id']}")
+        job_title, job_desc = job.title, job.description
+    else:
         job_title = payload["job_title"]
         job_desc = payload["job_desc"]
-        score = payload["score"]
+    return resume_text, job_title, job_desc, payload["score"]
+
+# API endpoint to explain job match score with LLM prompt
+@app.post("/explain_match/")
+def explain_endpoint(payload: dict = Body(...), db: Session = Depends(get_db)):
+    try:
+        resume_text, job_title, job_desc, score = explanation_inputs(payload, db)
         explanation = explain_match(resume_text, job_title, job_desc, score)
         return {"explanation": explanation}
+    except HTTPException:
+        raise
     except KeyError as e:
         raise HTTPException(status_code=400, detail=f"Missing required fields in request: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating score explanation: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error generating score explanation: {str(e)}")
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+# Same as /explain_match/, streamed as Server-Sent Events: one "data" event per token, then "done"
+@app.post("/explain_match/stream")
+def explain_stream_endpoint(payload: dict = Body(...), db: Session = Depends(get_db)):
+    try:
+        resume_text, job_title, job_desc, score = explanation_inputs(payload, db)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Missing required fields in request: {str(e)}")
+
+    def events():
+        try:
+            for token in stream_explanation(resume_text, job_title, job_desc, score):
+                yield sse_event({"token": token})
+            yield sse_event({}, event="done")
+        except Exception as e:
+            yield sse_event({"detail": f"Error generating score explanation: {str(e)}"}, event="error")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _batch_explain_jobs(payload, db: Session):
+    resume_text, resume_emb, resume_skills = resolve_resume(payload)
+    job_ids = payload["job_ids"]
+    if not isinstance(job_ids, list) or not all(isinstance(job_id, int) and not isinstance(job_id, bool) for job_id in job_ids):
+        raise HTTPException(status_code=400, detail="job_ids must be a list of integer ids")
+    if not job_ids or len(job_ids) > MAX_BATCH_EXPLANATIONS:
+        raise HTTPException(status_code=400, detail=f"job_ids must hold between 1 and {MAX_BATCH_EXPLANATIONS} ids")
+    # clients may pass the scores they got from /rank_jobs/; otherwise they are recomputed
+    scores = payload.get("scores") or {}
+    try:
+        if not isinstance(scores, dict):
+            raise ValueError
+        scores = {int(job_id): float(score) for job_id, score in scores.items()}
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="scores must map job ids to numbers")
+    rows = {row.id: row for row in db.query(Jobs.id, Jobs.title, Jobs.description).filter(Jobs.id.in_(job_ids)).all()}
+    missing = [job_id for job_id in job_ids if job_id in rows and job_id not in scores]
+    if missing:
+        scores.update(score_jobs(db, resume_emb, resume_skills, missing))
+    jobs = [
+        {"id": job_id, "title": rows[job_id].title, "description": rows[job_id].description, "score": scores[job_id]}
+        for job_id in dict.fromkeys(job_ids) if job_id in rows
+    ]
+    return resume_text, jobs, [job_id for job_id in job_ids if job_id not in rows]
+
+# API endpoint to explain several ranked jobs at once; completions run concurrently.
+# With "stream": true, results come back as NDJSON lines in completion order.
+@app.post("/explain_matches/")
+async def explain_matches_endpoint(payload: dict = Body(...), db: Session = Depends(get_db)):
+    try:
+        resume_text, jobs, unknown_ids = await run_blocking(_batch_explain_jobs, payload, db)
+    except HTTPException:
+        raise
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Missing required fields in request: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating score explanations: {str(e)}")
+
+    def result(job, explanation, error):
+        item = {"job_id": job["id"], "title": job["title"], "score": job["score"]}
+        if error:
+            item["error"] = error
+        else:
+            item["explanation"] = explanation
+        return item
+
+    if payload.get("stream"):
+        async def lines():
+            for job_id in unknown_ids:
+                yield json.dumps({"job_id": job_id, "error": f"Unknown job_id: {job_id}"}) + "\n"
+            async for job, explanation, error in explain_matches(resume_text, jobs):
+                yield json.dumps(result(job, explanation, error)) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    results = {}
+    async for job, explanation, error in explain_matches(resume_text, jobs):
+        results[job["id"]] = result(job, explanation, error)
+    return {
+        "explanations": [results[job["id"]] for job in jobs],
+        "unknown_job_ids": unknown_ids,
+    }
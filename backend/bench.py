@@ -0,0 +1,405 @@
+# Offline benchmarks of the hot paths (throwaway SQLite DB, fake LLM and feed), printed as JSON.
+# Usage: python -m backend.bench --sizes 1000,100000 --output bench.json
+import os
+import tempfile
+
+# must be set before the backend modules read their configuration. The database is always a
+# fresh file here: the benchmarks drop and recreate every table.
+_WORKDIR = tempfile.mkdtemp(prefix="job-bench-")
+_DATABASE_PATH = os.path.join(_WORKDIR, "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DATABASE_PATH}"
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("WARM_MODEL", "0")
+os.environ.setdefault("JOB_SOURCES", "bench")
+os.environ.setdefault("FETCH_STATE_PATH", "")
+os.environ.setdefault("EMBEDDING_CACHE_PATH", "")
+os.environ.setdefault("SKILL_CACHE_PATH", "")
+os.environ.setdefault("JOB_INDEX_PATH", os.path.join(_WORKDIR, "job_index.npz"))
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import platform
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from sqlalchemy import insert
+
+import backend.embedding as embedding
+import backend.llm as llm
+from backend.db import Base, SessionLocal, engine
+from backend.embedding import encode_embedding
+from backend.explanation import explanation_cache
+from backend.ingestion.scraping import ingest_jobs
+from backend.ingestion.sources import JobSource, register_source
+from backend.models import Jobs
+from backend.parser import parse_resume, skill_cache
+from backend.samples import make_pdf
+from backend.scoring import rank_cache, rank_jobs, score_batch
+from backend.sessions import resume_store
+from backend.vector_store import job_store
+
+DIM = 384
+SKILLS = ["Python", "SQL", "Java", "Go", "Rust", "Docker", "Kubernetes", "AWS", "React", "TypeScript",
+          "PostgreSQL", "Machine Learning", "CI/CD", "Terraform", "GraphQL", "Node.js", "C++", "Spark"]
+
+
+def latency_stats(samples):
+    samples = np.asarray(samples, dtype=np.float64) * 1000
+    if len(samples) == 0:
+        return {"n": 0}
+    return {
+        "n": len(samples),
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "min_ms": round(float(samples.min()), 3),
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return latency_stats(samples)
+
+
+# Deterministic stand-in for the SentenceTransformer: a unit vector seeded by the text hash
+class HashEncoder:
+    def __init__(self, dim=DIM):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        single = isinstance(texts, str)
+        vectors = []
+        for text in [texts] if single else texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            vectors.append(vector / np.linalg.norm(vector))
+        matrix = np.stack(vectors) if vectors else np.zeros((0, self.dim), dtype=np.float32)
+        return matrix[0] if single else matrix
+
+
+def reset_database():
+    # backend.db may have been imported (and bound to another database) before this module
+    if engine.url.get_backend_name() != "sqlite" or os.path.abspath(engine.url.database or "") != _DATABASE_PATH:
+        raise RuntimeError(f"Refusing to reset {engine.url.render_as_string(hide_password=True)}: "
+                           "run the benchmarks as python -m backend.bench")
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    job_store.invalidate()
+    rank_cache.clear()
+
+
+# Jobs rows in chunks; embeddings are drawn around a few hundred cluster centres so the
+# corpus has the structure the ANN index relies on
+def synthetic_job_rows(rows, dim=DIM, seed=0, chunk=5000):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(rows // 500, 8), dim)).astype(np.float32)
+    for start in range(0, rows, chunk):
+        n = min(chunk, rows - start)
+        vectors = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+        salaries = rng.integers(40, 250, n) * 1000
+        yield [
+            {
+                "title": f"Engineer {start + i}",
+                "company": f"Company {(start + i) % 997}",
+                "description": f"Job {start + i}",
+                "remote": bool(i % 3),
+                "skills": [SKILLS[j] for j in rng.choice(len(SKILLS), 4, replace=False)],
+                "salary_min": float(salaries[i]),
+                "salary_max": float(salaries[i] + 30000),
+                "embedding": encode_embedding(vectors[i]),
+            }
+            for i in range(n)
+        ]
+
+
+def populate_jobs(rows, dim=DIM, seed=0):
+    reset_database()
+    db = SessionLocal()
+    try:
+        for chunk in synthetic_job_rows(rows, dim, seed):
+            db.execute(insert(Jobs), chunk)
+            db.commit()
+    finally:
+        db.close()
+
+
+def remotive_feed(jobs, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "0-legal-notice": "synthetic feed for benchmarks",
+        "job-count": jobs,
+        "jobs": [
+            {
+                "title": f"Feed Engineer {i}",
+                "company_name": f"Company {i % 997}",
+                "description": f"<p>Build things with {SKILLS[i % len(SKILLS)]}.</p>" * 20,
+                "candidate_required_location": "Worldwide" if i % 2 else "USA",
+                "tags": [SKILLS[j] for j in rng.choice(len(SKILLS), 4, replace=False)],
+                "job_type": "full_time",
+            }
+            for i in range(jobs)
+        ],
+    }
+
+
+# Local Remotive stand-in: serves one feed with an ETag after `latency` seconds
+class FakeRemotive:
+    def __init__(self, feed, latency=0.0):
+        self.body = json.dumps(feed).encode("utf-8")
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:16] + '"'
+        self.latency = latency
+        self.requests = 0
+
+    def __enter__(self):
+        remote = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                remote.requests += 1
+                time.sleep(remote.latency)
+                if self.headers.get("If-None-Match") == remote.etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(remote.body)))
+                self.send_header("ETag", remote.etag)
+                self.end_headers()
+                self.wfile.write(remote.body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/remote-jobs"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def synthetic_resume_pdf(pages=3, lines_per_page=30):
+    return make_pdf([
+        "\n".join(f"Page {page} line {line}: built services in {SKILLS[line % len(SKILLS)]}" for line in range(lines_per_page))
+        for page in range(pages)
+    ])
+
+
+def _queries(count, dim=DIM, seed=1):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    skills = [[SKILLS[j] for j in rng.choice(len(SKILLS), 3, replace=False)] for _ in range(count)]
+    return [vector.tolist() for vector in vectors], skills
+
+
+def bench_rank(rows, queries=50, k=10, batch=64):
+    start = time.perf_counter()
+    populate_jobs(rows)
+    populate_s = time.perf_counter() - start
+    embs, skills = _queries(queries)
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        jobs = job_store.get(db)
+        load_s = time.perf_counter() - start
+        # the ANN index trains in the background; rank against the finished one
+        start = time.perf_counter()
+        job_store.index.wait()
+        index_s = time.perf_counter() - start
+
+        it = iter(range(queries))
+
+        def rank_uncached():
+            i = next(it) % queries
+            rank_cache.clear()
+            rank_jobs(db, "", embs[i], skills[i], k)
+
+        cold = timed(rank_uncached, queries)
+        cached = timed(lambda: rank_jobs(db, "", embs[0], skills[0], k), queries)
+
+        batch_embs = (embs * (batch // len(embs) + 1))[:batch]
+        batch_skills = (skills * (batch // len(skills) + 1))[:batch]
+        start = time.perf_counter()
+        for _ in score_batch(jobs, batch_embs, batch_skills, k):
+            pass
+        batch_s = time.perf_counter() - start
+    finally:
+        db.close()
+    return {
+        "rows": rows,
+        "populate_seconds": round(populate_s, 3),
+        "store_load_seconds": round(load_s, 3),
+        "index_build_wait_seconds": round(index_s, 3),
+        "index": type(job_store.index).__name__,
+        "rank_jobs": cold,
+        "rank_jobs_cached": cached,
+        "batch": {"resumes": batch, "seconds": round(batch_s, 3), "resumes_per_second": round(batch / batch_s, 1)},
+    }
+
+
+def bench_ingest(feed_jobs=2000, latency=0.2):
+    reset_database()
+    with FakeRemotive(remotive_feed(feed_jobs), latency=latency) as remote:
+        register_source(JobSource("bench", remote.url))
+        start = time.perf_counter()
+        first = ingest_jobs()
+        first_s = time.perf_counter() - start
+        start = time.perf_counter()
+        second = ingest_jobs()
+        second_s = time.perf_counter() - start
+    return {
+        "feed_jobs": feed_jobs,
+        "feed_latency_seconds": latency,
+        "full": {"seconds": round(first_s, 3), "jobs_per_second": round(feed_jobs / first_s, 1), **first},
+        "unchanged": {"seconds": round(second_s, 3), **second},
+    }
+
+
+def bench_parse(pages=3, repeat=20, llm_latency=0.05):
+    llm._client = llm.FakeLLMClient(latency=llm_latency)
+    pdf = synthetic_resume_pdf(pages)
+
+    def parse():
+        skill_cache.memory.clear()
+        parse_resume(pdf)
+
+    return {
+        "pages": pages,
+        "llm_latency_seconds": llm_latency,
+        "parse_resume": timed(parse, repeat),
+        "parse_resume_cached_skills": timed(lambda: parse_resume(pdf), repeat),
+    }
+
+
+async def _load(client, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+    errors = 0
+
+    async def one(make_request):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await make_request()
+            samples.append(time.perf_counter() - start)
+            errors += response.status_code >= 400
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(make_request) for make_request in requests))
+    elapsed = time.perf_counter() - start
+    return {**latency_stats(samples), "errors": errors, "requests_per_second": round(len(requests) / elapsed, 1)}
+
+
+def bench_http(rows=1000, requests=200, concurrency=16, llm_latency=0.05):
+    import httpx
+    from backend.app import app
+
+    populate_jobs(rows)
+    llm._async_client = llm.AsyncFakeLLMClient(latency=llm_latency)
+    llm._client = llm.FakeLLMClient(latency=llm_latency)
+    embs, skills = _queries(requests)
+    resume_ids = [resume_store.put("Benchmark resume", skills[i], embs[i]) for i in range(requests)]
+    pdf = synthetic_resume_pdf(2)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            results = {}
+            results["rank_jobs"] = await _load(client, [
+                lambda i=i: client.post("/rank_jobs/", json={"resume_id": resume_ids[i]}) for i in range(requests)
+            ], concurrency)
+            results["jobs_page"] = await _load(client, [
+                lambda: client.get("/jobs/", params={"limit": 50}) for _ in range(requests)
+            ], concurrency)
+            explanation_cache.clear()
+            results["explain_match"] = await _load(client, [
+                lambda i=i: client.post("/explain_match/", json={"resume_id": resume_ids[i], "job_id": 1, "score": 0.5})
+                for i in range(requests)
+            ], concurrency)
+            skill_cache.memory.clear()
+            results["upload_resume"] = await _load(client, [
+                lambda i=i: client.post("/upload_resume/", files={"file": (f"resume{i}.pdf", pdf, "application/pdf")})
+                for i in range(min(requests, 50))
+            ], concurrency)
+            return results
+
+    return {"rows": rows, "concurrency": concurrency, "llm_latency_seconds": llm_latency, **asyncio.run(run())}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Offline benchmarks for ranking, ingestion, parsing and the HTTP API")
+    parser.add_argument("--only", default="rank,ingest,parse,http", help="comma-separated benchmarks to run")
+    parser.add_argument("--sizes", default="1000,100000", help="corpus sizes for rank (e.g. 1000,100000,1000000)")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--feed-jobs", type=int, default=2000)
+    parser.add_argument("--feed-latency", type=float, default=0.2)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--encoder", choices=["hash", "model"], default="hash", help="hash: fast deterministic stand-in; model: the real sentence encoder")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.encoder == "hash":
+        embedding._model = HashEncoder()
+    selected = {name.strip() for name in args.only.split(",")}
+    results = {}
+    # the backend logs with print(); keep stdout for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        if "rank" in selected:
+            results["rank"] = [bench_rank(int(size), args.queries) for size in args.sizes.split(",")]
+        if "ingest" in selected:
+            results["ingest"] = bench_ingest(args.feed_jobs, args.feed_latency)
+        if "parse" in selected:
+            results["parse"] = bench_parse(llm_latency=args.llm_latency)
+        if "http" in selected:
+            results["http"] = bench_http(requests=args.requests, concurrency=args.concurrency, llm_latency=args.llm_latency)
+
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "encoder": args.encoder,
+            "database": engine.url.render_as_string(hide_password=True),
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+    return report
+
+
+if __name__ == "__main__":
+    main()
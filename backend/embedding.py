@@ -1,15 +1,158 @@
-from sentence_transformers import SentenceTransformer
 import numpy as np
+import os
+import re
+import threading
+from backend.cache import LRUCache, SqliteCache, content_key
+from backend.metrics import span
 
 # free local model since no Groq embedding model available
-model = SentenceTransformer('all-MiniLM-L6-v2')
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# loaded on first use (or by the app's warm-up) so importing this module stays cheap
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(MODEL_NAME)
+    return _model
+
+
+def is_model_loaded():
+    return _model is not None
+
+# storage precision for Jobs.embedding: float32 (exact), float16 (half size) or int8 (quarter size)
+EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "float32")
+
+# ingestion encodes in batches; EMBED_WORKERS > 1 fans large batches out to a process pool
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "0"))
+
+# embeddings are cached by (model, normalized text); empty path disables the on-disk tier
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite3")
+
+# 4-byte tags keep the float payload 4-byte aligned for np.frombuffer
+_TAGS = {"float32": b"EF32", "float16": b"EF16", "int8": b"EQ08"}
+
+
+# Memory LRU in front of a SQLite tier, so re-uploaded resumes and reposted jobs skip the encoder
+class EmbeddingCache:
+    def __init__(self, maxsize=EMBEDDING_CACHE_SIZE, path=EMBEDDING_CACHE_PATH, model_name=MODEL_NAME):
+        self.model_name = model_name
+        self.memory = LRUCache(maxsize)
+        self.disk = SqliteCache(path, table="embeddings") if path else None
+
+    def key(self, text):
+        return content_key(self.model_name, re.sub(r"\s+", " ", text).strip())
+
+    def get_many(self, keys):
+        found = {}
+        missing = []
+        for key in keys:
+            vector = self.memory.get(key)
+            if vector is None:
+                missing.append(key)
+            else:
+                found[key] = vector
+        if missing and self.disk is not None:
+            for key, buf in self.disk.get_many(missing).items():
+                vector = decode_embedding(buf)
+                self.memory.set(key, vector)
+                found[key] = vector
+        return found
+
+    def set_many(self, vectors):
+        for key, vector in vectors.items():
+            self.memory.set(key, vector)
+        if self.disk is not None and vectors:
+            self.disk.set_many({key: encode_embedding(vector, "float32") for key, vector in vectors.items()})
+
+    def stats(self):
+        memory = self.memory.stats()
+        disk = self.disk.stats() if self.disk is not None else {"hits": 0, "misses": memory["misses"]}
+        return {
+            "hits": memory["hits"] + disk["hits"],
+            "misses": disk["misses"],
+            "memory": memory,
+            "disk": disk if self.disk is not None else None,
+        }
+
+
+embedding_cache = EmbeddingCache()
+
 
 def embed_text(text: str):
     if not text:
         return np.zeros((384, ))  # fallback for empty text
-    embedding = model.encode(text)
-    return embedding.tolist()
+    return embed_texts([text])[0].tolist()
+
+def embed_texts(texts, batch_size=EMBED_BATCH_SIZE, workers=EMBED_WORKERS):
+    texts = list(texts)
+    keys = [embedding_cache.key(text) for text in texts]
+    cached = embedding_cache.get_many(set(keys))
+
+    # encode each distinct uncached text once
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in pending:
+            pending[key] = text
+    if pending:
+        with span("embedding.encode"):
+            encoded = _encode(list(pending.values()), batch_size, workers)
+        fresh = dict(zip(pending.keys(), encoded))
+        embedding_cache.set_many(fresh)
+        cached.update(fresh)
+
+    if not texts:
+        return np.zeros((0, get_model().get_sentence_embedding_dimension()), dtype=np.float32)
+    return np.stack([cached[key] for key in keys]).astype(np.float32, copy=False)
+
+def _encode(texts, batch_size, workers):
+    # pool start-up costs seconds, so it only pays off when every worker gets several batches
+    model = get_model()
+    if workers > 1 and len(texts) >= batch_size * workers * 4:
+        pool = model.start_multi_process_pool(target_devices=["cpu"] * workers)
+        try:
+            embeddings = model.encode_multi_process(texts, pool, batch_size=batch_size)
+        finally:
+            model.stop_multi_process_pool(pool)
+    else:
+        embeddings = model.encode(texts, batch_size=batch_size)
+    return np.asarray(embeddings, dtype=np.float32)
 
 def cosine_sim(a, b):
     a, b = np.array(a), np.array(b)
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
\ No newline at end of file
+    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+
+
+def encode_embedding(vector, dtype=EMBEDDING_DTYPE) -> bytes:
+    if dtype not in _TAGS:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    if dtype == "float32":
+        return _TAGS[dtype] + vector.tobytes()
+    if dtype == "float16":
+        return _TAGS[dtype] + vector.astype(np.float16).tobytes()
+    # symmetric int8 quantization with one float32 scale per vector
+    scale = float(np.abs(vector).max()) / 127 if len(vector) else 0.0
+    quantized = np.round(vector / scale).astype(np.int8) if scale else np.zeros(len(vector), dtype=np.int8)
+    return _TAGS[dtype] + np.float32(scale).tobytes() + quantized.tobytes()
+
+
+def decode_embedding(buf) -> np.ndarray:
+    tag = bytes(buf[:4])
+    if tag == _TAGS["float32"]:
+        # zero-copy, read-only view over the column bytes
+        return np.frombuffer(buf, dtype=np.float32, offset=4)
+    if tag == _TAGS["float16"]:
+        return np.frombuffer(buf, dtype=np.float16, offset=4).astype(np.float32)
+    if tag == _TAGS["int8"]:
+        scale = np.frombuffer(buf, dtype=np.float32, count=1, offset=4)[0]
+        return np.frombuffer(buf, dtype=np.int8, offset=8).astype(np.float32) * scale
+    raise ValueError(f"Unknown embedding encoding: {tag!r}")
@@ -0,0 +1,35 @@
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+# bounded pool for blocking work called from async endpoints (PDF extraction, encoding)
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+cpu_pool = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+
+
+# the caller's context goes along, so spans inside fn count towards the request that ran it
+async def run_blocking(fn, *args, **kwargs):
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(cpu_pool, partial(context.run, fn, *args, **kwargs))
+
+
+# pure-Python CPU work (PyPDF2 page parsing) holds the GIL, so it needs processes to run in parallel.
+# Workers are spawned, not forked: a fork would copy the server's threads, locks and open connections.
+PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        with _process_pool_lock:
+            if _process_pool is None:
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _process_pool
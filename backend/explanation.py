@@ -1,16 +1,153 @@
-from groq import Groq
+import asyncio
 import os
+import time
+from backend.llm import get_client, get_async_client
+from backend.cache import LRUCache, SingleFlight, AsyncSingleFlight, content_key
+from backend.metrics import span
 
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+EXPLAIN_MODEL = "llama-3.1-8b-instant"
+# identical (resume, job, score) prompts are answered from memory for EXPLANATION_CACHE_TTL_SECONDS
+EXPLANATION_CACHE_SIZE = int(os.getenv("EXPLANATION_CACHE_SIZE", "2000"))
+EXPLANATION_CACHE_TTL_SECONDS = int(os.getenv("EXPLANATION_CACHE_TTL_SECONDS", str(60 * 60 * 24)))
+
+# batch explanations: at most EXPLAIN_CONCURRENCY completions in flight per batch (0, the default,
+# means one per result, which MAX_BATCH_EXPLANATIONS already bounds); 429s retried with backoff
+EXPLAIN_CONCURRENCY = int(os.getenv("EXPLAIN_CONCURRENCY", "0"))
+EXPLAIN_MAX_RETRIES = int(os.getenv("EXPLAIN_MAX_RETRIES", "3"))
+
+explanation_cache = LRUCache(EXPLANATION_CACHE_SIZE, ttl=EXPLANATION_CACHE_TTL_SECONDS)
+_inflight = SingleFlight()
+_async_inflight = AsyncSingleFlight()
+# monotonic time before which no new completion is started, set when Groq answers 429
+_cooldown_until = 0.0
+
+
+def explanation_prompt(resume_text, job_title, job_desc, score):
+    return f"Candidate: {resume_text[:1000]}\nJob: {job_title}\nDescription: {job_desc}\nFit score: {score}.\nExplain why this is a good fit and how to improve callback chances."
 
 
 def explain_match(resume_text, job_title, job_desc, score):
     try:
-        prompt = f"Candidate: {resume_text[:1000]}\nJob: {job_title}\nDescription: {job_desc}\nFit score: {score}.\nExplain why this is a good fit and how to improve callback chances."
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role":"user","content":prompt}]
-        )
-        return response.choices[0].message.content
+        prompt = explanation_prompt(resume_text, job_title, job_desc, score)
+        key = content_key(EXPLAIN_MODEL, prompt)
+        cached = explanation_cache.get(key)
+        if cached is not None:
+            return cached
+
+        def complete():
+            with span("llm.explain"):
+                response = get_client().chat.completions.create(
+                    model=EXPLAIN_MODEL,
+                    messages=[{"role":"user","content":prompt}]
+                )
+            explanation = response.choices[0].message.content
+            explanation_cache.set(key, explanation)
+            return explanation
+
+        # double clicks and Streamlit reruns arrive concurrently; they share one completion
+        return _inflight.do(key, complete)
+    except Exception as e:
+        raise ValueError(f"Explanation error - Explain match failed: {str(e)}")
+
+
+# Yields the explanation as it is generated; a cached answer comes back as a single piece
+def stream_explanation(resume_text, job_title, job_desc, score):
+    prompt = explanation_prompt(resume_text, job_title, job_desc, score)
+    key = content_key(EXPLAIN_MODEL, prompt)
+    cached = explanation_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    try:
+        # time to the stream opening; the tokens are paced by the client reading them
+        with span("llm.explain_stream"):
+            stream = get_client().chat.completions.create(
+                model=EXPLAIN_MODEL,
+                messages=[{"role":"user","content":prompt}],
+                stream=True,
+            )
+        parts = []
+        for chunk in stream:
+            token = chunk.choices[0].delta.content
+            if token:
+                parts.append(token)
+                yield token
+    except Exception as e:
+        raise ValueError(f"Explanation error - Explain match failed: {str(e)}")
+    explanation_cache.set(key, "".join(parts))
+
+
+def _retry_after(error, attempt):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return min(2 ** attempt, 30)
+
+
+async def _complete_with_backoff(prompt):
+    global _cooldown_until
+    for attempt in range(EXPLAIN_MAX_RETRIES + 1):
+        # every task honours a rate limit hit by any other task
+        await asyncio.sleep(max(0.0, _cooldown_until - time.monotonic()))
+        try:
+            with span("llm.explain"):
+                response = await get_async_client().chat.completions.create(
+                    model=EXPLAIN_MODEL,
+                    messages=[{"role":"user","content":prompt}]
+                )
+            return response.choices[0].message.content
+        except Exception as e:
+            if getattr(e, "status_code", None) != 429 or attempt == EXPLAIN_MAX_RETRIES:
+                raise
+            _cooldown_until = max(_cooldown_until, time.monotonic() + _retry_after(e, attempt))
+
+
+async def explain_match_async(resume_text, job_title, job_desc, score, semaphore=None):
+    try:
+        prompt = explanation_prompt(resume_text, job_title, job_desc, score)
+        key = content_key(EXPLAIN_MODEL, prompt)
+        cached = explanation_cache.get(key)
+        if cached is not None:
+            return cached
+
+        async def complete():
+            if semaphore is None:
+                explanation = await _complete_with_backoff(prompt)
+            else:
+                async with semaphore:
+                    explanation = await _complete_with_backoff(prompt)
+            explanation_cache.set(key, explanation)
+            return explanation
+
+        return await _async_inflight.do(key, complete)
     except Exception as e:
-        raise ValueError(f"Explanation error - Explain match failed: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"Explanation error - Explain match failed: {str(e)}")
+
+
+# Yields (job, explanation, error) as each completion finishes, not in input order
+async def explain_matches(resume_text, jobs, concurrency=EXPLAIN_CONCURRENCY):
+    semaphore = asyncio.Semaphore(concurrency or max(1, len(jobs)))
+
+    async def explain(job):
+        try:
+            explanation = await explain_match_async(resume_text, job["title"], job["description"], job["score"], semaphore)
+            return job, explanation, None
+        except Exception as e:
+            return job, None, str(e)
+
+    tasks = [asyncio.ensure_future(explain(job)) for job in jobs]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def explanation_stats():
+    return {
+        "cache": explanation_cache.stats(),
+        "inflight": _inflight.stats(),
+        "async_inflight": _async_inflight.stats(),
+    }
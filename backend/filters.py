@@ -0,0 +1,86 @@
+import time
+import numpy as np
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+def _optional_float(filters, name):
+    value = filters.get(name)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"Invalid filter {name}: {value!r}")
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"Invalid filter {name}: {value!r}")
+
+
+# Eligibility predicates for ranking, applied as column masks over the in-memory JobArrays.
+# Filtering never reaches SQL, so the jobs table deliberately has no indexes for it (see migration 004).
+# Salary filters drop jobs whose salary is unknown; company names match case-insensitively.
+class JobFilter:
+    FIELDS = ("remote", "min_salary", "max_salary", "companies", "posted_within_days")
+
+    def __init__(self, remote=None, min_salary=None, max_salary=None, companies=None, posted_within_days=None):
+        self.remote = remote
+        self.min_salary = min_salary
+        self.max_salary = max_salary
+        self.companies = sorted({str(company).lower() for company in companies}) if companies else None
+        self.posted_within_days = posted_within_days
+
+    @classmethod
+    def from_payload(cls, filters):
+        if not filters:
+            return cls()
+        if not isinstance(filters, dict):
+            raise ValueError("filters must be an object")
+        unknown = set(filters) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+        remote = filters.get("remote")
+        if remote is not None and not isinstance(remote, bool):
+            raise ValueError(f"Invalid filter remote: {remote!r}")
+        companies = filters.get("companies")
+        if isinstance(companies, str):
+            companies = [companies]
+        if companies is not None and not isinstance(companies, list):
+            raise ValueError(f"Invalid filter companies: {companies!r}")
+        return cls(
+            remote=remote,
+            min_salary=_optional_float(filters, "min_salary"),
+            max_salary=_optional_float(filters, "max_salary"),
+            companies=companies,
+            posted_within_days=_optional_float(filters, "posted_within_days"),
+        )
+
+    @property
+    def active(self):
+        return any(getattr(self, name) is not None for name in self.FIELDS)
+
+    # stable description of the predicates, for cache keys and logs
+    def key(self):
+        values = {name: getattr(self, name) for name in self.FIELDS}
+        values["companies"] = tuple(self.companies) if self.companies is not None else None
+        return tuple((name, value) for name, value in values.items() if value is not None)
+
+    def _cutoff(self, now=None):
+        return (time.time() if now is None else now) - self.posted_within_days * DAY_SECONDS
+
+    # Boolean row mask over JobArrays, or None when nothing is filtered
+    def mask(self, jobs, now=None):
+        if not self.active:
+            return None
+        mask = np.ones(len(jobs), dtype=bool)
+        if self.remote is not None:
+            mask &= jobs.remote == self.remote
+        # NaN (unknown salary) compares False, so those rows drop out
+        if self.min_salary is not None:
+            mask &= np.fmax(jobs.salary_max, jobs.salary_min) >= self.min_salary
+        if self.max_salary is not None:
+            mask &= np.fmin(jobs.salary_min, jobs.salary_max) <= self.max_salary
+        if self.companies is not None:
+            mask &= np.isin(jobs.company_codes, jobs.company_codes_for(self.companies))
+        if self.posted_within_days is not None:
+            mask &= jobs.created_at >= self._cutoff(now)
+        return mask
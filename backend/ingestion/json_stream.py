@@ -0,0 +1,97 @@
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+# Push parser for feeds shaped like {"...": ..., "<key>": [item, item, ...], ...}.
+# feed() takes text as it arrives and returns the array items completed so far, so the
+# whole document is never held in memory. Only the pending (incomplete) item is buffered;
+# other top-level values are skipped whole, which is fine for small metadata fields.
+class JsonArrayStream:
+    def __init__(self, key):
+        self.key = key
+        self.buffer = ""
+        self.pos = 0
+        self.state = "start"
+        self.current_key = None
+        self.found = False
+
+    def _skip_whitespace(self):
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+            self.pos += 1
+        return self.pos < len(self.buffer)
+
+    def _expect(self, chars):
+        char = self.buffer[self.pos]
+        if char not in chars:
+            raise ValueError(f"expected {chars!r} at offset {self.pos}, got {char!r}")
+        self.pos += 1
+        return char
+
+    def _decode(self, final):
+        try:
+            value, end = _decoder.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None, False
+        # a number at the very end of the buffer may continue in the next chunk
+        if end == len(self.buffer) and not final:
+            return None, False
+        self.pos = end
+        return value, True
+
+    def feed(self, text, final=False):
+        self.buffer += text
+        items = []
+        while self.state != "done" and self._skip_whitespace():
+            if self.state == "start":
+                self._expect("{")
+                self.state = "key"
+            elif self.state == "key":
+                if self.buffer[self.pos] == "}":
+                    self.pos += 1
+                    self.state = "done"
+                    continue
+                key, complete = self._decode(final)
+                if not complete:
+                    break
+                self.current_key = key
+                self.state = "colon"
+            elif self.state == "colon":
+                self._expect(":")
+                self.state = "array" if self.current_key == self.key else "value"
+            elif self.state == "value":
+                _, complete = self._decode(final)
+                if not complete:
+                    break
+                self.state = "next_key"
+            elif self.state == "array":
+                self._expect("[")
+                self.found = True
+                self.state = "item"
+            elif self.state == "item":
+                if self.buffer[self.pos] == "]":
+                    self.pos += 1
+                    self.state = "next_key"
+                    continue
+                item, complete = self._decode(final)
+                if not complete:
+                    break
+                items.append(item)
+                self.state = "next_item"
+            elif self.state == "next_item":
+                self.state = "item" if self._expect(",]") == "," else "next_key"
+            elif self.state == "next_key":
+                self.state = "key" if self._expect(",}") == "," else "done"
+        # drop what has been consumed so memory stays bounded by one item
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        return items
+
+    def close(self):
+        items = self.feed("", final=True)
+        if self.state != "done" or not self.found:
+            raise ValueError(f"no complete \"{self.key}\" array")
+        return items
@@ -0,0 +1,339 @@
+import fcntl
+import os
+import random
+import socket
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+from backend.db import SessionLocal, engine
+from backend.models import IngestRuns
+from backend.ingestion.scraping import ingest_jobs
+
+# INGEST_CRON (5-field, UTC) wins over INGEST_INTERVAL_SECONDS; every run starts up to
+# INGEST_JITTER_SECONDS late so workers and deployments do not hit the feeds in lockstep
+INGEST_SCHEDULER = os.getenv("INGEST_SCHEDULER", "1") == "1"
+INGEST_INTERVAL_SECONDS = float(os.getenv("INGEST_INTERVAL_SECONDS", str(60 * 60 * 24)))
+INGEST_CRON = os.getenv("INGEST_CRON", "")
+INGEST_JITTER_SECONDS = float(os.getenv("INGEST_JITTER_SECONDS", "60"))
+INGEST_ON_STARTUP = os.getenv("INGEST_ON_STARTUP", "1") == "1"
+# lock files for databases without advisory locks (SQLite); must be shared by all workers
+INGEST_LOCK_DIR = os.getenv("INGEST_LOCK_DIR", "data")
+
+
+class IngestAlreadyRunning(Exception):
+    pass
+
+
+# Non-blocking exclusive flock. Each acquire opens its own file description, so a second
+# acquire fails even from the same process; the OS drops the lock if the process dies.
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        f = open(self.path, "a+")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        f, self._file = self._file, None
+        if f is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            f.close()
+
+
+# Postgres session-level advisory lock, held on a dedicated connection until released
+# (or until the connection drops, e.g. when the worker dies)
+class AdvisoryLock:
+    def __init__(self, engine, name):
+        self.engine = engine
+        self.key = zlib.crc32(name.encode("utf-8"))
+        self._conn = None
+
+    def acquire(self):
+        conn = self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            held = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+        except Exception:
+            conn.close()
+            raise
+        if not held:
+            conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    def release(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            conn.close()
+        except Exception:
+            # never hand a connection that may still hold the lock back to the pool
+            conn.invalidate()
+
+
+def make_lock(name, engine=engine):
+    if engine.dialect.name == "postgresql":
+        return AdvisoryLock(engine, f"job_callback_agent.{name}")
+    return FileLock(os.path.join(INGEST_LOCK_DIR, f"{name}.lock"))
+
+
+class IntervalSchedule:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def next_after(self, timestamp):
+        return timestamp + self.seconds
+
+    def describe(self):
+        return f"every {self.seconds:g}s"
+
+
+# Standard 5-field cron (minute hour day-of-month month day-of-week) evaluated in UTC, with
+# "*", lists, ranges and steps. Day-of-week 0 and 7 are Sunday; when both day fields are
+# restricted a day matching either one qualifies, as in cron.
+class CronSchedule:
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Invalid cron expression {expression!r}: expected 5 fields")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(part, low, high, expression) for part, (low, high) in zip(parts, self.FIELDS)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = parts[2] == "*"
+        self.any_weekday = parts[4] == "*"
+
+    @staticmethod
+    def _parse(field, low, high, expression):
+        values = set()
+        try:
+            for part in field.split(","):
+                step = 1
+                if "/" in part:
+                    part, step = part.split("/")
+                    step = int(step)
+                if part == "*":
+                    start, end = low, high
+                elif "-" in part:
+                    start, end = (int(value) for value in part.split("-"))
+                else:
+                    start = int(part)
+                    end = high if step > 1 else start
+                if start < low or end > high or start > end or step < 1:
+                    raise ValueError
+                values.update(range(start, end + 1, step))
+        except ValueError:
+            raise ValueError(f"Invalid cron expression {expression!r}: bad field {field!r}")
+        return values
+
+    def _day_matches(self, moment):
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, timestamp):
+        moment = datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # skips whole months, days and hours that cannot match
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment.timestamp()
+        raise ValueError(f"Cron expression {self.expression!r} never matches")
+
+    def describe(self):
+        return f"cron {self.expression} (UTC)"
+
+
+def default_schedule():
+    return CronSchedule(INGEST_CRON) if INGEST_CRON else IntervalSchedule(INGEST_INTERVAL_SECONDS)
+
+
+def _isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat() if timestamp is not None else None
+
+
+def _run_dict(run):
+    return {
+        "id": run.id,
+        "trigger": run.trigger,
+        "status": run.status,
+        "worker": run.worker,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+        "duration_seconds": run.duration_seconds,
+        "stats": run.stats,
+        "error": run.error,
+    }
+
+
+# Runs ingest_jobs on a schedule in its own thread, so the event loop never waits on it.
+# Of several workers only the one holding the leader lock runs the schedule; followers try
+# to take over at each of their own ticks, so a dead leader is replaced within one period.
+# Every run, scheduled or manual and in any worker, holds the run lock, so runs never
+# overlap. Runs are recorded in the ingest_runs table.
+class IngestScheduler:
+    def __init__(
+        self,
+        schedule=None,
+        jitter=INGEST_JITTER_SECONDS,
+        run_on_start=INGEST_ON_STARTUP,
+        ingest=ingest_jobs,
+        session_factory=SessionLocal,
+        leader_lock=None,
+        run_lock=None,
+    ):
+        self.schedule = schedule or default_schedule()
+        self.jitter = jitter
+        self.run_on_start = run_on_start
+        self.ingest = ingest
+        self.session_factory = session_factory
+        self.leader_lock = leader_lock or make_lock("ingest-leader")
+        self.run_lock = run_lock or make_lock("ingest-run")
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+        self.running = None
+        self.next_run_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="ingest-scheduler", daemon=True)
+        self._thread.start()
+
+    # a run in progress is not interrupted; its thread is a daemon and its row stays "running"
+    # until the next run marks it abandoned
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self.is_leader:
+            self.leader_lock.release()
+            self.is_leader = False
+
+    def _loop(self):
+        first = True
+        while True:
+            now = time.time()
+            at = now if first and self.run_on_start else self.schedule.next_after(now)
+            first = False
+            self.next_run_at = at + random.uniform(0, self.jitter)
+            if self._stop.wait(max(0.0, self.next_run_at - time.time())):
+                return
+            try:
+                if not self.is_leader:
+                    self.is_leader = self.leader_lock.acquire()
+                if self.is_leader:
+                    self.run("schedule")
+            except IngestAlreadyRunning:
+                print("Skipping scheduled ingest: another run is in progress")
+            except Exception as e:
+                print(f"Error during scheduled scraping: {str(e)}")
+
+    def _begin(self, trigger):
+        if not self.run_lock.acquire():
+            raise IngestAlreadyRunning()
+        try:
+            db = self.session_factory()
+            try:
+                now = datetime.now(timezone.utc)
+                # holding the run lock means nobody else is running: leftovers died mid-run
+                db.query(IngestRuns).filter(IngestRuns.status == "running").update(
+                    {"status": "abandoned", "finished_at": now}, synchronize_session=False
+                )
+                run = IngestRuns(trigger=trigger, status="running", worker=self.worker, started_at=now)
+                db.add(run)
+                db.commit()
+                self.running = run.id
+                return run.id
+            finally:
+                db.close()
+        except Exception:
+            self.run_lock.release()
+            raise
+
+    def _execute(self, run_id):
+        start = time.perf_counter()
+        stats, error = None, None
+        try:
+            stats = self.ingest()
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            print(f"Error during ingest run {run_id}: {error}")
+        try:
+            db = self.session_factory()
+            try:
+                run = db.get(IngestRuns, run_id)
+                run.status = "failed" if error else "succeeded"
+                run.finished_at = datetime.now(timezone.utc)
+                run.duration_seconds = round(time.perf_counter() - start, 3)
+                run.stats = stats
+                run.error = error
+                db.commit()
+                return _run_dict(run)
+            finally:
+                db.close()
+        finally:
+            self.running = None
+            self.run_lock.release()
+
+    # Runs one ingest now, in the calling thread; raises IngestAlreadyRunning on overlap
+    def run(self, trigger="manual"):
+        return self._execute(self._begin(trigger))
+
+    # Starts one ingest in a background thread and returns its run id; raises
+    # IngestAlreadyRunning right away (not from the thread) on overlap
+    def trigger(self, trigger="manual"):
+        run_id = self._begin(trigger)
+        threading.Thread(target=self._execute, args=(run_id,), name="ingest-run", daemon=True).start()
+        return run_id
+
+    def history(self, limit=20):
+        db = self.session_factory()
+        try:
+            runs = db.query(IngestRuns).order_by(IngestRuns.id.desc()).limit(limit).all()
+            return [_run_dict(run) for run in runs]
+        finally:
+            db.close()
+
+    def status(self):
+        return {
+            "schedule": self.schedule.describe(),
+            "enabled": self._thread is not None,
+            "leader": self.is_leader,
+            "worker": self.worker,
+            "running_run_id": self.running,
+            "next_run_at": _isoformat(self.next_run_at) if self._thread is not None else None,
+        }
+
+
+ingest_scheduler = IngestScheduler()
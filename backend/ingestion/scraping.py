@@ -1,26 +1,35 @@
-import requests
+import asyncio
+import os
+import queue
+import threading
+import time
+from sqlalchemy import insert, tuple_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 from backend.db import SessionLocal
 from backend.models import Jobs
-from backend.embedding import embed_text
+from backend.embedding import embed_texts, encode_embedding
+from backend.vector_store import job_store
+from backend.skills import refresh_skill_matcher
+from backend.ingestion.sources import fetch_all, fetch_state
+from backend.metrics import observe_stage, span
 
-# using remotive API for job listings
-remotive_url = "https://remotive.com/api/remote-jobs?category=software-dev"
-# print("This is the remotive api url: ",remotive_url)
+# Jobs from every registered source (see backend.ingestion.sources); sources whose feed is
+# unchanged since the last committed fetch answer 304 and contribute nothing.
+# With on_job, jobs are streamed to it as they are parsed and the job count is returned instead.
+def fetch_jobs(sources=None, on_job=None):
+    results = asyncio.run(fetch_all(sources, state=fetch_state, on_job=on_job))
+    errors = [f"{result.source.name}: {result.error}" for result in results if result.error]
+    for result in results:
+        print(f"Source {result.source.name}: {result.status}, {result.count} jobs" + (f" ({result.error})" if result.error else ""))
+    if errors and len(errors) == len(results):
+        raise ValueError(f"Scraping Error - Error fetching jobs from API: {'; '.join(errors)}")
+    if on_job is not None:
+        return sum(result.count for result in results)
+    return [job for result in results for job in result.jobs]
 
-def fetch_jobs():
-    try:
-        response = requests.get(remotive_url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        jobs = data["jobs"]
-        return jobs
-    except requests.RequestException as e:
-        raise ValueError(f"Scraping Error - Error fetching jobs from API: {str(e)}")
-    except KeyError:
-        raise ValueError(f"Scraping Error - Unexpected API response structure: {data}")
-
-# Normalize job data to match our DB schema
+# Normalize job data to match our DB schema; embedding happens later, in batches, for new jobs only
 def normalize_job(job):
     text_for_embedding = (
         f"{job['title']} {job['description']} {job.get('job_type', '')}"
@@ -32,54 +41,244 @@ def normalize_job(job):
         "description": job["description"],
         "remote": job["candidate_required_location"] == "Worldwide",
         "skills": job.get("tags", []),
-        "embedding": embed_text(text_for_embedding),
+        "embedding_text": text_for_embedding,
     }
 
     return normalized
 
-# Collect and ingest jobs into the database
-def ingest_jobs():
-    try:
-        db: Session = SessionLocal()
-        jobs = fetch_jobs()
+INSERT_CHUNK_SIZE = int(os.getenv("INSERT_CHUNK_SIZE", "500"))
+# batches buffered between pipeline stages; bounds memory whatever the feed size
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+
+
+def _insert_statement(db: Session, rows):
+    # ON CONFLICT DO NOTHING against uq_jobs_title_company makes concurrent ingests safe
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql_insert(Jobs).values(rows).on_conflict_do_nothing(index_elements=["title", "company"])
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(Jobs).values(rows).on_conflict_do_nothing(index_elements=["title", "company"])
+    else:
+        stmt = insert(Jobs).values(rows)
+    return stmt.returning(Jobs.id)
+
+
+# Keys from the feed that are already stored. A NULL company never equals anything (and
+# uq_jobs_title_company treats NULLs as distinct), so those keys are looked up with IS NULL.
+def existing_keys(db: Session, keys):
+    keys = list(keys)
+    with_company = [key for key in keys if key[1] is not None]
+    without_company = [title for title, company in keys if company is None]
+    rows = []
+    if with_company:
+        rows += db.query(Jobs.title, Jobs.company).filter(tuple_(Jobs.title, Jobs.company).in_(with_company)).all()
+    if without_company:
+        rows += db.query(Jobs.title, Jobs.company).filter(Jobs.company.is_(None), Jobs.title.in_(without_company)).all()
+    return {(row.title, row.company) for row in rows}
+
+
+# Items processed and busy seconds for one pipeline stage
+class StageCounter:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0
+
+    def add(self, items, seconds):
+        self.items += items
+        self.seconds += seconds
+
+    def stats(self):
+        return {
+            "items": self.items,
+            "seconds": round(self.seconds, 3),
+            "per_second": round(self.items / self.seconds, 1) if self.seconds else None,
+        }
+
+
+class _Stopped(Exception):
+    pass
+
 
-        inserted_count = 0
+_DONE = object()
 
-        for job in jobs:
-            normalized = normalize_job(job)
 
-            exists = db.query(Jobs).filter(
-                Jobs.title == normalized["title"],
-                Jobs.company == normalized["company"]
-            ).first()
+# Bounded queue between two stages. A producer always ends its stream with _DONE, even when it
+# fails, so the stages after it drain and commit what is already in flight. A consumer that
+# fails closes its input instead, and the producers before it stop at their next put.
+class _Channel:
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize)
+        self.closed = threading.Event()
 
-            # print("exists result: ", exists)
+    def close(self):
+        self.closed.set()
 
-            # avoid duplicates
-            if exists:
-                continue
+    def put(self, item):
+        while not self.closed.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise _Stopped()
 
-            db_job = Jobs(
-                title=normalized["title"],
-                company=normalized["company"],
-                description=normalized["description"],
-                remote=normalized["remote"],
-                skills=normalized["skills"],
-                embedding=normalized["embedding"],
-            )
-            db.add(db_job)
-            inserted_count += 1
-            print("inserted_count: ", inserted_count)
+    async def put_async(self, item):
+        # called on the fetch event loop, which must keep serving the other feeds while it waits
+        while not self.closed.is_set():
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                await asyncio.sleep(0.01)
+        raise _Stopped()
 
-        db.commit()
+    def get(self):
+        return self.queue.get()
 
-        print(f"Inserted {inserted_count} new jobs into the database.")
+
+# counters of the running (or last) ingest, for /admin/ingest_stats/
+pipeline_counters = {}
+
+
+# Streaming ingest: fetch+parse -> normalize+dedup -> embed -> insert, one thread per stage
+# connected by bounded queues so downloading, encoding and DB writes overlap. Each chunk is
+# committed on its own, so a late failure keeps the chunks already stored.
+@span("ingest")
+def ingest_jobs():
+    global pipeline_counters
+    counters = {name: StageCounter(name) for name in ("fetch", "dedup", "embed", "insert")}
+    pipeline_counters = counters
+    raw_jobs = _Channel(INSERT_CHUNK_SIZE * INGEST_QUEUE_SIZE)
+    to_embed = _Channel(INGEST_QUEUE_SIZE)
+    to_insert = _Channel(INGEST_QUEUE_SIZE)
+    errors = []
+    fetched = []
+
+    def stage(fn, upstream, downstream):
+        def run():
+            try:
+                fn()
+            except _Stopped:
+                pass
+            except Exception as e:
+                errors.append(e)
+            finally:
+                if upstream is not None:
+                    upstream.close()
+                try:
+                    downstream.put(_DONE)
+                except _Stopped:
+                    pass
+        return threading.Thread(target=run, daemon=True)
+
+    def fetch():
+        start = time.perf_counter()
+        fetched.append(fetch_jobs(on_job=raw_jobs.put_async))
+        counters["fetch"].add(fetched[0], time.perf_counter() - start)
+
+    def dedup():
+        db = None
+        seen = set()
+        try:
+            done = False
+            while not done:
+                batch = {}
+                while len(batch) < INSERT_CHUNK_SIZE:
+                    job = raw_jobs.get()
+                    if job is _DONE:
+                        done = True
+                        break
+                    start = time.perf_counter()
+                    normalized = normalize_job(job)
+                    key = (normalized["title"], normalized["company"])
+                    # first occurrence wins for postings repeated within the feed
+                    if key not in seen:
+                        seen.add(key)
+                        batch[key] = normalized
+                    counters["dedup"].add(1, time.perf_counter() - start)
+                if batch:
+                    start = time.perf_counter()
+                    db = db or SessionLocal()
+                    known = existing_keys(db, batch.keys())
+                    new_jobs = [normalized for key, normalized in batch.items() if key not in known]
+                    counters["dedup"].add(0, time.perf_counter() - start)
+                    if new_jobs:
+                        to_embed.put(new_jobs)
+        finally:
+            if db is not None:
+                db.close()
+
+    def embed():
+        while (new_jobs := to_embed.get()) is not _DONE:
+            # only postings we do not have yet are encoded
+            start = time.perf_counter()
+            embeddings = embed_texts([normalized["embedding_text"] for normalized in new_jobs])
+            rows = [
+                {
+                    "title": normalized["title"],
+                    "company": normalized["company"],
+                    "description": normalized["description"],
+                    "remote": normalized["remote"],
+                    "skills": normalized["skills"],
+                    "embedding": encode_embedding(embedding),
+                }
+                for normalized, embedding in zip(new_jobs, embeddings)
+            ]
+            counters["embed"].add(len(rows), time.perf_counter() - start)
+            to_insert.put(rows)
+
+    threads = [stage(fetch, None, raw_jobs), stage(dedup, raw_jobs, to_embed), stage(embed, to_embed, to_insert)]
+    db: Session = SessionLocal()
+    inserted_ids = []
+    try:
+        for thread in threads:
+            thread.start()
+        try:
+            while (rows := to_insert.get()) is not _DONE:
+                start = time.perf_counter()
+                # the insert bumps the corpus version in the same transaction (backend.models)
+                result = db.execute(_insert_statement(db, rows))
+                ids = result.scalars().all()
+                db.commit()
+                inserted_ids.extend(ids)
+                counters["insert"].add(len(rows), time.perf_counter() - start)
+        finally:
+            to_insert.close()
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+        # the feeds' ETag/Last-Modified only count as seen once all their jobs are stored
+        fetch_state.commit()
+
+        if inserted_ids:
+            with span("ingest.refresh"):
+                job_store.refresh(db)
+                refresh_skill_matcher(db)
+
+        total = fetched[0] if fetched else 0
+        stats = {
+            "fetched": total,
+            "inserted": len(inserted_ids),
+            "skipped": total - len(inserted_ids),
+            "timings": {name: round(counter.seconds, 3) for name, counter in counters.items()},
+            "stages": {name: counter.stats() for name, counter in counters.items()},
+        }
+        # busy seconds per stage; the stages overlap, so these add up to more than the ingest
+        for name, counter in counters.items():
+            observe_stage(f"ingest.{name}", counter.seconds)
+        print(f"Inserted {stats['inserted']} new jobs into the database, skipped {stats['skipped']}. Timings: {stats['timings']}")
+        return stats
     except Exception as e:
         db.rollback()
+        fetch_state.discard()
+        if inserted_ids:
+            # committed chunks stay; the store picks them up on its next read
+            job_store.invalidate()
         raise ValueError(f"Scraping Error - Ingestion error: {str(e)}")
     finally:
         db.close()
 
-
 if __name__ == "__main__":
     ingest_jobs()
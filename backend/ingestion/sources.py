@@ -0,0 +1,204 @@
+import asyncio
+import codecs
+import inspect
+import json
+import os
+import threading
+import httpx
+from backend.cache import SqliteCache
+from backend.ingestion.json_stream import JsonArrayStream
+
+# comma-separated names from the registry below; every enabled source is fetched concurrently
+JOB_SOURCES = os.getenv("JOB_SOURCES", "remotive")
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "10"))
+FETCH_MAX_RETRIES = int(os.getenv("FETCH_MAX_RETRIES", "3"))
+FETCH_BACKOFF = float(os.getenv("FETCH_BACKOFF", "0.5"))
+# ETag / Last-Modified per source, so unchanged feeds cost one 304
+FETCH_STATE_PATH = os.getenv("FETCH_STATE_PATH", "data/fetch_state.sqlite3")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# A job feed: where to fetch it and how to turn its JSON into Remotive-shaped job dicts
+# (title, company_name, description, candidate_required_location, tags, job_type).
+# The feed is parsed incrementally; jobs are the items of its top-level jobs_key array.
+class JobSource:
+    def __init__(self, name, url, jobs_key="jobs", headers=None):
+        self.name = name
+        self.url = url
+        self.jobs_key = jobs_key
+        self.headers = headers or {}
+
+    def stream_parser(self):
+        return JsonArrayStream(self.jobs_key)
+
+    # maps one feed item to the Remotive shape; sources with other layouts override this
+    def parse_item(self, item):
+        return item
+
+
+_registry = {}
+
+
+def register_source(source):
+    _registry[source.name] = source
+    return source
+
+
+def get_sources(names=None):
+    names = JOB_SOURCES.split(",") if names is None else names
+    unknown = [name.strip() for name in names if name.strip() and name.strip() not in _registry]
+    if unknown:
+        raise ValueError(f"Unknown job sources: {', '.join(unknown)}")
+    return [_registry[name.strip()] for name in names if name.strip()]
+
+
+register_source(JobSource("remotive", "https://remotive.com/api/remote-jobs?category=software-dev"))
+
+
+class FetchResult:
+    def __init__(self, source, jobs=None, validators=None, not_modified=False, error=None, count=0):
+        self.source = source
+        self.jobs = jobs or []
+        self.validators = validators
+        self.not_modified = not_modified
+        self.error = error
+        self.count = count
+
+    @property
+    def status(self):
+        if self.error:
+            return "error"
+        return "not_modified" if self.not_modified else "ok"
+
+
+# Conditional-request validators per source. New validators stay pending until
+# the fetched jobs are committed, so a failed ingest does not turn the next fetch into a 304.
+class FetchState:
+    def __init__(self, path=FETCH_STATE_PATH):
+        self.store = SqliteCache(path, table="fetch_state") if path else None
+        self.memory = {}
+        self.pending = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            if name in self.memory:
+                return self.memory[name]
+        validators = {}
+        # nothing was ever committed if the file is missing; reading must not create it
+        if self.store is not None and os.path.exists(self.store.path):
+            buf = self.store.get(name)
+            if buf is not None:
+                validators = json.loads(buf)
+        with self._lock:
+            self.memory[name] = validators
+        return validators
+
+    def stage(self, name, validators):
+        with self._lock:
+            self.pending[name] = validators
+
+    def commit(self):
+        with self._lock:
+            pending, self.pending = self.pending, {}
+            self.memory.update(pending)
+        if self.store is not None and pending:
+            self.store.set_many({name: json.dumps(validators).encode("utf-8") for name, validators in pending.items()})
+
+    def discard(self):
+        with self._lock:
+            self.pending = {}
+
+
+fetch_state = FetchState()
+
+
+def _retry_delay(response, attempt):
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return FETCH_BACKOFF * (2 ** attempt)
+
+
+# Streams one feed. Jobs are handed to on_job (sync or async callable) as soon as they are
+# parsed; without on_job they are collected into FetchResult.jobs. A retry after a partial
+# download re-emits the jobs already seen; ingestion dedups by (title, company) anyway.
+async def fetch_source(client, source, state=None, max_retries=FETCH_MAX_RETRIES, on_job=None):
+    state = fetch_state if state is None else state
+    headers = dict(source.headers)
+    validators = state.get(source.name)
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    for attempt in range(max_retries + 1):
+        failed = None
+        jobs = []
+        try:
+            async with client.stream("GET", source.url, headers=headers) as response:
+                if response.status_code in RETRY_STATUSES:
+                    error, failed = f"HTTP {response.status_code}", response
+                elif response.status_code == 304:
+                    return FetchResult(source, not_modified=True)
+                elif response.status_code >= 400:
+                    return FetchResult(source, error=f"HTTP {response.status_code}")
+                else:
+                    parser = source.stream_parser()
+                    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")()
+                    count = 0
+
+                    async def emit(items):
+                        nonlocal count
+                        for item in items:
+                            job = source.parse_item(item)
+                            count += 1
+                            if on_job is None:
+                                jobs.append(job)
+                            else:
+                                result = on_job(job)
+                                if inspect.isawaitable(result):
+                                    await result
+
+                    async for chunk in response.aiter_bytes():
+                        await emit(parser.feed(decoder.decode(chunk)))
+                    await emit(parser.feed(decoder.decode(b"", final=True)))
+                    await emit(parser.close())
+                    new_validators = {
+                        "etag": response.headers.get("etag"),
+                        "last_modified": response.headers.get("last-modified"),
+                    }
+                    return FetchResult(source, jobs=jobs, validators={k: v for k, v in new_validators.items() if v}, count=count)
+        except httpx.TransportError as e:
+            error = str(e) or type(e).__name__
+        except (ValueError, KeyError, TypeError) as e:
+            return FetchResult(source, error=f"Unexpected API response structure: {e}")
+        if attempt == max_retries:
+            return FetchResult(source, error=error)
+        await asyncio.sleep(_retry_delay(failed, attempt))
+
+
+# Fetches every source concurrently over one pooled client (keep-alive connections per host).
+# A failing source is reported in its FetchResult instead of failing the others.
+async def fetch_all(sources=None, state=None, client=None, on_job=None):
+    sources = get_sources() if sources is None else sources
+    state = fetch_state if state is None else state
+    own_client = client is None
+    client = client or httpx.AsyncClient(
+        timeout=FETCH_TIMEOUT,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+    )
+    try:
+        results = await asyncio.gather(*(fetch_source(client, source, state, on_job=on_job) for source in sources))
+    finally:
+        if own_client:
+            await client.aclose()
+    for result in results:
+        if result.validators is not None:
+            state.stage(result.source.name, result.validators)
+    return results
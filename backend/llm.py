@@ -0,0 +1,94 @@
+import asyncio
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+# "groq" talks to the Groq API; "fake" answers locally (offline development, tests, benchmarks)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0"))
+
+# Groq clients are built on first use so importing the app does not pay for them
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if LLM_BACKEND == "fake":
+                    _client = FakeLLMClient(latency=FAKE_LLM_LATENCY)
+                else:
+                    from groq import Groq
+                    _client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    return _client
+
+
+_async_client = None
+
+
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                if LLM_BACKEND == "fake":
+                    _async_client = AsyncFakeLLMClient(latency=FAKE_LLM_LATENCY)
+                else:
+                    from groq import AsyncGroq
+                    _async_client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"))
+    return _async_client
+
+
+def _message(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+# Stand-in for the Groq SDK's chat.completions interface. latency is the time to the first
+# token; token_latency the gap between streamed tokens.
+class FakeLLMClient:
+    def __init__(self, reply="Python, SQL, Communication", latency=0.0, token_latency=0.0):
+        self.reply = reply
+        self.latency = latency
+        self.token_latency = token_latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _reply_for(self, messages):
+        return self.reply(messages) if callable(self.reply) else self.reply
+
+    def create(self, model=None, messages=None, stream=False, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        reply = self._reply_for(messages)
+        if not stream:
+            return _message(reply)
+        return self._stream(reply)
+
+    def _stream(self, reply):
+        for i, token in enumerate(reply.split(" ")):
+            if i:
+                time.sleep(self.token_latency)
+            yield _chunk(token if i == 0 else f" {token}")
+
+
+class AsyncFakeLLMClient(FakeLLMClient):
+    async def create(self, model=None, messages=None, stream=False, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        reply = self._reply_for(messages)
+        if not stream:
+            return _message(reply)
+        return self._stream_async(reply)
+
+    async def _stream_async(self, reply):
+        for i, token in enumerate(reply.split(" ")):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            yield _chunk(token if i == 0 else f" {token}")
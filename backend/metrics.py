@@ -0,0 +1,229 @@
+import bisect
+import contextvars
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import parse_qs
+from backend.cache import LRUCache
+
+# Requests sent with ?profile=1 or an "X-Profile: 1" header are run under the sampling profiler,
+# but only when PROFILING_ENABLED is on; the folded stacks are kept for /admin/profiles/<id>
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+
+# seconds; covers cache hits (ms) up to full ingests (minutes)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# Cumulative histogram per label combination, rendered in the Prometheus text format.
+# Values live in this process only; with several workers each one is scraped on its own.
+class Histogram:
+    def __init__(self, name, documentation, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # per-bucket counts (the last one is +Inf), sum, count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            return series[2] if series is not None else 0
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, [list(counts), total, count]) for labels, (counts, total, count) in self._series.items())
+        for labels, (counts, total, count) in series:
+            pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, labels)]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _format(bound)
+                bucket_labels = ",".join(pairs + [f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{','.join(pairs)}}}" if pairs else ""
+            lines.append(f"{self.name}_sum{suffix} {total!r}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return "\n".join(lines)
+
+
+request_seconds = Histogram(
+    "http_request_duration_seconds", "Latency of HTTP requests by route template.", ("method", "route", "status")
+)
+stage_seconds = Histogram(
+    "stage_duration_seconds", "Time spent in instrumented stages (PDF extraction, LLM calls, encoding, scoring, ingest).", ("stage",)
+)
+REGISTRY = [request_seconds, stage_seconds]
+
+
+def render_metrics():
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# stage timings of the request being handled, reported back in its Server-Timing header
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def observe_stage(stage, seconds):
+    stage_seconds.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+# Times the block as one stage; also works as a decorator on plain functions
+@contextmanager
+def span(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def server_timing(timings, total):
+    durations = {}
+    for stage, seconds in timings:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in durations.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+# Samples every thread's Python stack on a timer and counts identical stacks, root first
+# ("file:function;file:function"), which is the folded format flame graph tools read.
+# Threads parked in a wait are skipped so idle pool workers do not drown out the request.
+# Profiles are process-wide: other requests, the ingest scheduler and background threads
+# running at the same time show up next to the profiled request.
+IDLE_FUNCTIONS = {"wait", "select", "poll", "epoll", "_wait_for_tstate_lock"}
+
+
+class SamplingProfiler:
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me or frame.f_code.co_name in IDLE_FUNCTIONS:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+profiles = LRUCache(PROFILE_KEEP)
+
+
+def _wants_profile(scope):
+    if not PROFILING_ENABLED:
+        return False
+    for name, value in scope.get("headers", []):
+        if name == b"x-profile" and value in (b"1", b"true"):
+            return True
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("profile", [""])[-1] in ("1", "true")
+
+
+def _route_template(scope):
+    # the matched route's path template keeps label cardinality bounded (no ids in paths)
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+# ASGI middleware: per-route latency histogram, a Server-Timing header with the stage spans
+# recorded while handling the request, and the opt-in profiler. Latency runs to the last
+# body chunk, so streamed responses count in full; Server-Timing can only hold the spans
+# finished before the headers went out.
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        timings = []
+        token = _request_timings.set(timings)
+        profiler = SamplingProfiler().start() if _wants_profile(scope) else None
+        profile_id = uuid.uuid4().hex if profiler is not None else None
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings, time.perf_counter() - start).encode("latin-1")))
+                if profile_id is not None:
+                    headers.append((b"x-profile-id", profile_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_timings.reset(token)
+            request_seconds.observe(elapsed, scope["method"], _route_template(scope), str(status))
+            if profiler is not None:
+                stacks = profiler.stop()
+                profiles.set(profile_id, {
+                    "id": profile_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "seconds": round(elapsed, 6),
+                    "interval_ms": profiler.interval * 1000,
+                    # every thread of this worker was sampled, not just the ones serving the request
+                    "scope": "process",
+                    "samples": profiler.samples,
+                    "stacks": dict(stacks.most_common()),
+                })
@@ -0,0 +1,9 @@
+-- Embeddings move from JSONB float lists to packed binary vectors (backend/embedding.py:encode_embedding).
+-- The old column is kept as embedding_json until backend.migrations.backfill_embeddings has converted it.
+ALTER TABLE jobs RENAME COLUMN embedding TO embedding_json;
+ALTER TABLE jobs ADD COLUMN embedding BYTEA;
+
+-- After this file, apply the remaining migrations (003 onwards), then run:
+--   python -m backend.migrations.backfill_embeddings --drop-json
+-- The backfill also works right after this file; it then skips the corpus_version bump,
+-- because 006 creates that table with a fresh version.
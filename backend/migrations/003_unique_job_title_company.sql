@@ -0,0 +1,11 @@
+-- Ingestion dedups postings on (title, company) and inserts with ON CONFLICT DO NOTHING,
+-- which needs a unique index. Existing duplicates are collapsed to their oldest row first.
+DELETE FROM jobs
+WHERE EXISTS (
+  SELECT 1 FROM jobs b
+  WHERE b.title = jobs.title
+    AND b.company IS NOT DISTINCT FROM jobs.company
+    AND b.id < jobs.id
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_jobs_title_company ON jobs (title, company);
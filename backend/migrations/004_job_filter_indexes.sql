@@ -0,0 +1,6 @@
+-- Intentionally empty of new schema. The /rank_jobs/ filters (backend.filters.JobFilter) are applied
+-- as masks over the in-memory job arrays, never in SQL, so jobs has no indexes for them.
+-- An earlier revision of this file created filter indexes; drop them where it was applied.
+DROP INDEX IF EXISTS ix_jobs_remote_created_at;
+DROP INDEX IF EXISTS ix_jobs_salary_max_salary_min;
+DROP INDEX IF EXISTS ix_jobs_lower_company_created_at;
@@ -0,0 +1,14 @@
+-- History of ingest runs (backend.ingestion.scheduler), queried by /admin/ingest_runs/.
+CREATE TABLE IF NOT EXISTS ingest_runs (
+  id BIGSERIAL PRIMARY KEY,
+  trigger TEXT,
+  status TEXT,
+  worker TEXT,
+  started_at TIMESTAMPTZ,
+  finished_at TIMESTAMPTZ,
+  duration_seconds DOUBLE PRECISION,
+  stats JSONB,
+  error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS ix_ingest_runs_status ON ingest_runs (status);
@@ -0,0 +1,10 @@
+-- Corpus version behind the job store, the ranking cache and job snapshots (backend.models.CorpusVersion).
+-- Application writes bump it in their own transaction. A migration that rewrites jobs rows must
+-- end with: UPDATE corpus_version SET version = version + 1, generation = generation + 1 WHERE id = 1;
+CREATE TABLE IF NOT EXISTS corpus_version (
+  id INTEGER PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 0,
+  generation BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO corpus_version (id, version, generation) VALUES (1, 1, 1) ON CONFLICT (id) DO NOTHING;
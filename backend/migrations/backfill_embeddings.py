@@ -0,0 +1,64 @@
+import argparse
+import json
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import inspect, text
+from backend.db import engine
+from backend.embedding import encode_embedding, EMBEDDING_DTYPE
+from backend.models import bump_corpus_version
+
+
+# Converts embedding_json (JSONB float lists) into the binary embedding column, one batch per transaction
+def backfill(batch_size=1000, dtype=EMBEDDING_DTYPE, drop_json=False):
+    converted = 0
+    last_id = 0
+    # run before 006: no corpus_version yet, and 006 seeds a fresh version when it creates the table
+    with engine.connect() as conn:
+        versioned = inspect(conn).has_table("corpus_version")
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT id, embedding_json FROM jobs "
+                    "WHERE id > :last_id AND embedding IS NULL AND embedding_json IS NOT NULL "
+                    "ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": batch_size},
+            ).all()
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                values = row.embedding_json
+                if isinstance(values, str):
+                    values = json.loads(values)
+                updates.append({"id": row.id, "embedding": encode_embedding(values, dtype)})
+            conn.execute(text("UPDATE jobs SET embedding = :embedding WHERE id = :id"), updates)
+            # rows changed in place: cached rankings and job snapshots must not be reused
+            if versioned:
+                bump_corpus_version(conn, rewrite=True)
+        converted += len(rows)
+        last_id = rows[-1].id
+        print(f"Converted {converted} embeddings")
+
+    if drop_json:
+        with engine.begin() as conn:
+            remaining = conn.execute(
+                text("SELECT count(*) FROM jobs WHERE embedding IS NULL AND embedding_json IS NOT NULL")
+            ).scalar()
+            if remaining:
+                raise ValueError(f"Migration error - {remaining} rows still unconverted, not dropping embedding_json")
+            conn.execute(text("ALTER TABLE jobs DROP COLUMN embedding_json"))
+        print("Dropped jobs.embedding_json")
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill jobs.embedding from jobs.embedding_json")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dtype", default=EMBEDDING_DTYPE, choices=["float32", "float16", "int8"])
+    parser.add_argument("--drop-json", action="store_true")
+    args = parser.parse_args()
+    backfill(args.batch_size, args.dtype, args.drop_json)
@@ -1,9 +1,16 @@
-from sqlalchemy import Column, Integer, String, Boolean, JSON, Float, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, JSON, Float, DateTime, LargeBinary, Index, event, insert, update
+from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
 from backend.db import Base
 
 class Jobs(Base):
     __tablename__ = "jobs"
+    __table_args__ = (
+        # ingestion dedups on (title, company) and relies on this for ON CONFLICT DO NOTHING
+        Index("uq_jobs_title_company", "title", "company", unique=True),
+        # ids are never reused (as with Postgres sequences), so count + max(id) detects table changes
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
@@ -13,5 +20,70 @@ class Jobs(Base):
     skills = Column(JSON)
     salary_min = Column(Float)
     salary_max = Column(Float)
-    embedding = Column(JSON)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    embedding = Column(LargeBinary)  # packed vector, see backend.embedding.encode_embedding
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+
+# Single-row counter that every write to jobs bumps in the same transaction. version changes on
+# any write; generation only when existing rows are changed or removed, so a cached result for
+# the same generation can be brought up to date by looking at the appended ids alone.
+# Writes that bypass the ORM session (migrations, backfills) call bump_corpus_version themselves.
+class CorpusVersion(Base):
+    __tablename__ = "corpus_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    generation = Column(Integer, nullable=False, default=0)
+
+
+def corpus_version(db):
+    row = db.query(CorpusVersion.version, CorpusVersion.generation).filter(CorpusVersion.id == 1).one_or_none()
+    return (row.version, row.generation) if row is not None else (0, 0)
+
+
+# conn is a Connection (or anything with execute) inside the writing transaction
+def bump_corpus_version(conn, rewrite=False):
+    values = {"version": CorpusVersion.version + 1}
+    if rewrite:
+        values["generation"] = CorpusVersion.generation + 1
+    result = conn.execute(update(CorpusVersion).where(CorpusVersion.id == 1).values(**values))
+    if result.rowcount == 0:
+        conn.execute(insert(CorpusVersion).values(id=1, version=1, generation=1 if rewrite else 0))
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_after_flush(session, flush_context):
+    changed = [obj for obj in session.dirty if isinstance(obj, Jobs) and session.is_modified(obj)]
+    removed = [obj for obj in session.deleted if isinstance(obj, Jobs)]
+    if changed or removed:
+        bump_corpus_version(session.connection(), rewrite=True)
+    elif any(isinstance(obj, Jobs) for obj in session.new):
+        bump_corpus_version(session.connection())
+
+
+# bulk statements (ingest's INSERT .. ON CONFLICT, query(Jobs).delete()) skip the flush
+@event.listens_for(Session, "do_orm_execute")
+def _bump_on_bulk_write(orm_execute_state):
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Jobs:
+        return
+    if orm_execute_state.is_insert:
+        bump_corpus_version(orm_execute_state.session.connection())
+    elif orm_execute_state.is_update or orm_execute_state.is_delete:
+        bump_corpus_version(orm_execute_state.session.connection(), rewrite=True)
+
+
+# One row per ingest run (scheduled or manual), written by backend.ingestion.scheduler
+class IngestRuns(Base):
+    __tablename__ = "ingest_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    trigger = Column(String)  # "schedule" or "manual"
+    status = Column(String, index=True)  # running, succeeded, failed, abandoned
+    worker = Column(String)  # host:pid that ran it
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    duration_seconds = Column(Float)
+    stats = Column(JSON)  # ingest_jobs() stats of a successful run
+    error = Column(String)
@@ -1,23 +1,167 @@
 import io
-import PyPDF2
-from groq import Groq
+import json
 import os
+import PyPDF2
+from backend.llm import get_client, get_async_client
+from backend.executors import get_process_pool, run_blocking
+from backend.cache import LRUCache, SqliteCache, content_key
+from backend.skills import get_skill_matcher
+from backend.metrics import span
+
+SKILLS_MODEL = "llama-3.1-8b-instant"
+# the skill prompt only looks at the start of the resume
+SKILLS_PROMPT_CHARS = 4000
+# LLM skill lists are cached per resume text; the SQLite tier is optional
+SKILL_CACHE_SIZE = int(os.getenv("SKILL_CACHE_SIZE", "1000"))
+SKILL_CACHE_TTL_SECONDS = int(os.getenv("SKILL_CACHE_TTL_SECONDS", str(60 * 60 * 24 * 7)))
+SKILL_CACHE_PATH = os.getenv("SKILL_CACHE_PATH", "")
+# past this many seconds the vocabulary matcher answers instead of the LLM
+SKILL_LLM_TIMEOUT = float(os.getenv("SKILL_LLM_TIMEOUT", "10"))
+# documents with at least this many pages are split across the process pool
+PDF_PARALLEL_PAGES = int(os.getenv("PDF_PARALLEL_PAGES", "8"))
+
+
+def _extract_page_range(file_bytes, start, stop):
+    # runs in a worker process, which opens its own reader
+    reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
+    return [reader.pages[i].extract_text() for i in range(start, stop)]
+
+
+# Yields page texts in order, extracting each page exactly once
+def iter_page_texts(file_bytes: bytes, pool=None):
+    reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
+    page_count = len(reader.pages)
+    if page_count < PDF_PARALLEL_PAGES:
+        for page in reader.pages:
+            text = page.extract_text()
+            if text:
+                yield text
+        return
+
+    pool = pool or get_process_pool()
+    # small ranges so the first pages come back early, but not one task per page
+    step = max(1, page_count // (2 * getattr(pool, "_max_workers", 4)))
+    futures = [
+        pool.submit(_extract_page_range, file_bytes, start, min(start + step, page_count))
+        for start in range(0, page_count, step)
+    ]
+    try:
+        for future in futures:
+            for text in future.result():
+                if text:
+                    yield text
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+# on_prefix(text) fires as soon as SKILLS_PROMPT_CHARS are available, before the rest is extracted
+@span("pdf.extract")
+def extract_text(file_bytes: bytes, on_prefix=None, pool=None) -> str:
+    parts = []
+    length = 0
+    for text in iter_page_texts(file_bytes, pool):
+        parts.append(text)
+        length += len(text) + 1
+        if on_prefix is not None and length >= SKILLS_PROMPT_CHARS:
+            on_prefix(" ".join(parts))
+            on_prefix = None
+    full_text = " ".join(parts)
+    if on_prefix is not None:
+        on_prefix(full_text)
+    return full_text
+
+
+class SkillCache:
+    def __init__(self, maxsize=SKILL_CACHE_SIZE, ttl=SKILL_CACHE_TTL_SECONDS, path=SKILL_CACHE_PATH):
+        self.memory = LRUCache(maxsize, ttl=ttl)
+        self.disk = SqliteCache(path, table="skills", ttl=ttl) if path else None
+
+    def key(self, text):
+        # only the prompt slice influences the answer
+        return content_key(SKILLS_MODEL, text[:SKILLS_PROMPT_CHARS])
+
+    def get(self, text):
+        key = self.key(text)
+        skills = self.memory.get(key)
+        if skills is None and self.disk is not None:
+            buf = self.disk.get(key)
+            if buf is not None:
+                skills = json.loads(buf)
+                self.memory.set(key, skills)
+        return skills
+
+    def set(self, text, skills):
+        key = self.key(text)
+        self.memory.set(key, skills)
+        if self.disk is not None:
+            self.disk.set(key, json.dumps(skills).encode("utf-8"))
 
+    def stats(self):
+        return {"memory": self.memory.stats(), "disk": self.disk.stats() if self.disk is not None else None}
 
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+
+skill_cache = SkillCache()
+
+
+def _skills_messages(text):
+    prompt = f"Extract key skills as a list from this resume text: {text[:SKILLS_PROMPT_CHARS]}"
+    return [{"role":"user","content":prompt}]
+
+
+def _parse_skills(skills_text):
+    return [s.strip() for s in skills_text.split(',') if s.strip()]
+
+
+# Offline answer when the LLM is slow or down: skills from the job tags that appear in the text
+def _fallback_skills(text, error):
+    try:
+        matcher = get_skill_matcher()
+    except Exception:
+        matcher = None
+    if not matcher:
+        raise ValueError(f"Parsing error - Resume parsing failed: {str(error)}")
+    print(f"Skill extraction fell back to vocabulary matcher: {str(error)}")
+    return matcher.match(text[:SKILLS_PROMPT_CHARS])
+
+
+def extract_skills(text: str):
+    cached = skill_cache.get(text)
+    if cached is not None:
+        return cached
+    try:
+        with span("llm.skills"):
+            response = get_client().chat.completions.create(
+                model=SKILLS_MODEL, messages=_skills_messages(text), timeout=SKILL_LLM_TIMEOUT
+            )
+        skills = _parse_skills(response.choices[0].message.content)
+    except Exception as e:
+        return _fallback_skills(text, e)
+    skill_cache.set(text, skills)
+    return skills
+
+
+# same as extract_skills, but awaits the Groq call instead of blocking the event loop
+async def extract_skills_async(text: str):
+    cached = skill_cache.get(text)
+    if cached is not None:
+        return cached
+    try:
+        with span("llm.skills"):
+            response = await get_async_client().chat.completions.create(
+                model=SKILLS_MODEL, messages=_skills_messages(text), timeout=SKILL_LLM_TIMEOUT
+            )
+        skills = _parse_skills(response.choices[0].message.content)
+    except Exception as e:
+        # the first fallback builds the matcher from the jobs table, which must not block the loop
+        return await run_blocking(_fallback_skills, text, e)
+    skill_cache.set(text, skills)
+    return skills
 
 
 def parse_resume(file_bytes: bytes):
     try:
-        reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
-        text = " ".join([page.extract_text() for page in reader.pages if page.extract_text()])
-        prompt = f"Extract key skills as a list from this resume text: {text[:4000]}"
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role":"user","content":prompt}]
-        )
-        skills_text = response.choices[0].message.content
-        skills = [s.strip() for s in skills_text.split(',') if s.strip()]
-        return text, skills
+        text = extract_text(file_bytes)
     except Exception as e:
-        raise ValueError(f"Parsing error - Resume parsing failed: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"Parsing error - Resume parsing failed: {str(e)}")
+    return text, extract_skills(text)
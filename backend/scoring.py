@@ -1,7 +1,23 @@
-import json
+import os
+import numpy as np
 from sqlalchemy.orm import Session
 from backend.models import Jobs
-from backend.embedding import cosine_sim, embed_text
+from backend.vector_store import job_store, top_k_indices
+from backend.skills import normalize_skill
+from backend.cache import LRUCache, content_key
+from backend.metrics import span
+
+# an approximate index only has to surface candidates; skills and the blend are applied to these
+ANN_CANDIDATES = int(os.getenv("ANN_CANDIDATES", "200"))
+# filtered rankings with at most this many eligible jobs skip the ANN index and score them all
+FILTER_EXACT_ROWS = int(os.getenv("FILTER_EXACT_ROWS", "20000"))
+# ranked top-k per (resume, filters, k); entries carry the corpus version they were computed on
+RANK_CACHE_SIZE = int(os.getenv("RANK_CACHE_SIZE", "1024"))
+rank_cache = LRUCache(RANK_CACHE_SIZE)
+rank_cache_merges = 0
+
+# resumes per matrix-matrix product in batch ranking; bounds the (chunk x jobs) score matrix
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "64"))
 
 
 # def load_jobs():
@@ -9,44 +25,215 @@ from backend.embedding import cosine_sim, embed_text
 #         return json.load(f)
 
 
+# Reference (single job) version of JobArrays.skill_overlaps; skills compare after normalization
 def skill_overlap(resume_skills, job_skills):
-    if not job_skills:
+    job_set = {normalize_skill(skill) for skill in job_skills or []} - {""}
+    if not job_set:
         return 0
-    overlap = len(set(resume_skills) & set(job_skills))
-    return overlap / len(job_skills)
+    overlap = len({normalize_skill(skill) for skill in resume_skills} & job_set)
+    return overlap / len(job_set)
+
+
+def blend_scores(sims, overlaps):
+    return np.round(0.7 * np.asarray(sims, dtype=np.float64) + 0.3 * np.asarray(overlaps, dtype=np.float64), 3)
+
+
+def _filtered_candidates(jobs, index, resume_emb, k, mask):
+    eligible = np.flatnonzero(mask)
+    if len(eligible) == 0:
+        return eligible, np.zeros(0, dtype=np.float32)
+    query = jobs.query_vector(resume_emb)
+    if not index.exact and len(eligible) > FILTER_EXACT_ROWS:
+        # widen the candidate pool by 1/selectivity so about ANN_CANDIDATES survive the mask
+        n = min(len(jobs), max(ANN_CANDIDATES, k) * len(jobs) // len(eligible))
+        rows, sims = index.search(jobs, query, n)
+        keep = mask[rows]
+        if keep.sum() >= k:
+            return rows[keep], sims[keep]
+    # selective filters: only the eligible rows are scored, so cost shrinks with the filter
+    return eligible, jobs.matrix[eligible] @ query
+
+
+# Returns (rows, scores) of the best k jobs; exact indexes score every row, ANN ones only their candidates.
+# mask (from JobFilter.mask) restricts the ranking to eligible rows.
+def score_candidates(jobs, index, resume_emb, resume_skills, k=10, mask=None):
+    if mask is not None:
+        rows, sims = _filtered_candidates(jobs, index, resume_emb, k, mask)
+        overlaps = jobs.skill_overlaps(resume_skills, rows)
+    elif index.exact:
+        rows = np.arange(len(jobs))
+        sims = jobs.similarities(resume_emb)
+        overlaps = jobs.skill_overlaps(resume_skills)
+    else:
+        rows, sims = index.search(jobs, jobs.query_vector(resume_emb), max(ANN_CANDIDATES, k))
+        overlaps = jobs.skill_overlaps(resume_skills, rows)
+    scores = blend_scores(sims, overlaps)
+    top = top_k_indices(scores, k)
+    return rows[top], scores[top]
+
+
+def resume_fingerprint(resume_emb, resume_skills):
+    skills = sorted({normalize_skill(skill) for skill in resume_skills or []})
+    return content_key(np.asarray(resume_emb, dtype=np.float32).tobytes().hex(), skills)
+
+
+# Rows of jobs appended since a corpus of `count` rows with largest id `max_id`, or None when
+# that corpus was changed in place (another generation) or lost rows. Ids are never reused,
+# so an append-only change keeps every old id.
+def appended_rows(jobs, generation, count, max_id):
+    if jobs.version[1] != generation:
+        return None
+    if max_id is None:
+        return np.arange(len(jobs)) if count == 0 else None
+    start = int(np.searchsorted(jobs.ids, max_id, side="right"))
+    return np.arange(start, len(jobs)) if start == count else None
+
+
+# score_candidates behind rank_cache. A cached ranking for the current corpus version is reused;
+# after an append-only ingest only the new rows are scored and merged into the cached top-k.
+def cached_candidates(jobs, index, resume_emb, resume_skills, k=10, filters=None):
+    global rank_cache_merges
+    mask = filters.mask(jobs) if filters is not None else None
+    # recency filters move with the clock, so they are always computed fresh
+    if jobs.version is None or (filters is not None and filters.posted_within_days is not None):
+        return score_candidates(jobs, index, resume_emb, resume_skills, k, mask)
+
+    key = content_key(resume_fingerprint(resume_emb, resume_skills), filters.key() if filters is not None else (), k)
+    entry = rank_cache.get(key)
+    if entry is not None and entry["version"] == jobs.version:
+        return np.searchsorted(jobs.ids, entry["ids"]), entry["scores"]
+
+    new_rows = appended_rows(jobs, entry["version"][1], entry["count"], entry["max_id"]) if entry is not None else None
+    if new_rows is not None:
+        if mask is not None:
+            new_rows = new_rows[mask[new_rows]]
+        sims = jobs.matrix[new_rows] @ jobs.query_vector(resume_emb) if len(new_rows) else np.zeros(0)
+        new_scores = blend_scores(sims, jobs.skill_overlaps(resume_skills, new_rows))
+        rows = np.concatenate([np.searchsorted(jobs.ids, entry["ids"]), new_rows])
+        scores = np.concatenate([entry["scores"], new_scores])
+        top = top_k_indices(scores, k)
+        rows, scores = rows[top], scores[top]
+        rank_cache_merges += 1
+    else:
+        rows, scores = score_candidates(jobs, index, resume_emb, resume_skills, k, mask)
+    rank_cache.set(key, {
+        "version": jobs.version,
+        "count": len(jobs),
+        "max_id": int(jobs.ids[-1]) if len(jobs) else None,
+        "ids": jobs.ids[rows],
+        "scores": scores,
+    })
+    return rows, scores
+
 
+def rank_cache_stats():
+    return {**rank_cache.stats(), "merges": rank_cache_merges}
 
-def rank_jobs(db: Session, resume_text, resume_emb, resume_skills):
+
+# Batch version of score_candidates: every chunk of resumes is scored against all eligible jobs
+# with one matrix-matrix product, then top-k runs per row. Yields (rows, scores) in input order.
+def score_batch(jobs, resume_embs, resume_skills, k=10, mask=None, chunk_size=BATCH_CHUNK_SIZE):
+    rows = np.arange(len(jobs)) if mask is None else np.flatnonzero(mask)
+    matrix = jobs.matrix if mask is None else jobs.matrix[rows]
+    for start in range(0, len(resume_embs), chunk_size):
+        embs = resume_embs[start:start + chunk_size]
+        if len(rows) == 0:
+            for _ in embs:
+                yield rows, np.zeros(0)
+            continue
+        queries = np.stack([jobs.query_vector(emb) for emb in embs])
+        sims = queries @ matrix.T
+        for sim, skills in zip(sims, resume_skills[start:start + chunk_size]):
+            overlaps = jobs.skill_overlaps(skills) if mask is None else jobs.skill_overlaps(skills, rows)
+            scores = blend_scores(sim, overlaps)
+            top = top_k_indices(scores, k)
+            yield rows[top], scores[top]
+
+
+# Scores for specific job ids (unknown ids are left out), e.g. jobs a client wants explained
+def score_jobs(db: Session, resume_emb, resume_skills, job_ids):
+    try:
+        with span("scoring.load"):
+            jobs = job_store.get(db)
+        ids = np.asarray(job_ids, dtype=np.int64)
+        rows = np.searchsorted(jobs.ids, ids)
+        known = rows < len(jobs)
+        known[known] = jobs.ids[rows[known]] == ids[known]
+        rows = rows[known]
+        sims = jobs.matrix[rows] @ jobs.query_vector(resume_emb) if len(rows) else np.zeros(0)
+        overlaps = jobs.skill_overlaps(resume_skills, rows)
+        scores = blend_scores(sims, overlaps)
+        return {int(jobs.ids[row]): float(score) for row, score in zip(rows, scores)}
+    except Exception as e:
+        raise ValueError(f"Scoring error - Score jobs failed: {str(e)}")
+
+
+def rank_jobs(db: Session, resume_text, resume_emb, resume_skills, k=10, filters=None):
     try:
-        jobs = db.query(Jobs).all()
-        # print("All jobs: ",jobs[0].title)
+        with span("scoring.load"):
+            jobs = job_store.get(db)
+        with span("scoring.rank"):
+            top, scores = cached_candidates(jobs, job_store.index, resume_emb, resume_skills, k, filters)
+
+        # descriptions are only needed for the returned rows, so they stay out of the matrix store
+        top_ids = [int(job_id) for job_id in jobs.ids[top]]
+        with span("db.descriptions"):
+            descriptions = {
+                row.id: row.description
+                for row in db.query(Jobs.id, Jobs.description).filter(Jobs.id.in_(top_ids)).all()
+            }
         results = []
-        for job in jobs:
-            job_emb = job.embedding
-            if isinstance(job_emb, str):
-                try:
-                    job_emb = json.loads(job_emb)
-                except Exception:
-                    job_emb = []
-            # print("resume_emb:", resume_emb, "job_emb:", job_emb)
-            sim = cosine_sim(resume_emb, job_emb)
-
-            job_skills = job.skills or []
-            if isinstance(job_skills, str):
-                try:
-                    job_skills = json.loads(job_skills)
-                except Exception:
-                    job_skills = []
-            overlap = skill_overlap(resume_skills, job_skills)
-            score = round(0.7 * sim + 0.3 * overlap, 3)
+        for row, score in zip(top, scores):
+            job_id = int(jobs.ids[row])
             results.append({
-                "id": job.id,
-                "title": job.title, 
-                "company": job.company,
-                "description": job.description,
-                "skills": job.skills,
-                "score": score
+                "id": job_id,
+                "title": jobs.titles[row],
+                "company": jobs.companies[row],
+                "description": descriptions.get(job_id),
+                "skills": jobs.skills[row],
+                "score": float(score)
             })
-        return sorted(results, key=lambda x: x["score"], reverse=True)[:10]
+        return results
+    except Exception as e:
+        raise ValueError(f"Scoring error - Rank jobs failed: {str(e)}")
+
+
+# Ranks many resumes in one pass; yields one ranked list per resume, in input order, or the
+# ValueError for a resume that could not be scored (e.g. a malformed embedding). Descriptions are left out to keep bulk results small (GET /jobs/?fields=description has them).
+def rank_jobs_batch(db: Session, resume_embs, resume_skills, k=10, filters=None):
+    try:
+        with span("scoring.load"):
+            jobs = job_store.get(db)
+        mask = filters.mask(jobs) if filters is not None else None
+    except Exception as e:
+        raise ValueError(f"Scoring error - Rank jobs failed: {str(e)}")
+    for start in range(0, len(resume_embs), BATCH_CHUNK_SIZE):
+        embs = resume_embs[start:start + BATCH_CHUNK_SIZE]
+        skills = resume_skills[start:start + BATCH_CHUNK_SIZE]
+        try:
+            results = list(score_batch(jobs, embs, skills, k, mask))
+        except Exception:
+            # one bad resume fails its whole chunk; score the chunk one by one so only it reports the error
+            results = [_score_one(jobs, emb, resume, k, mask) for emb, resume in zip(embs, skills)]
+        for result in results:
+            if isinstance(result, Exception):
+                yield result
+                continue
+            top, scores = result
+            yield [
+                {
+                    "id": int(jobs.ids[row]),
+                    "title": jobs.titles[row],
+                    "company": jobs.companies[row],
+                    "skills": jobs.skills[row],
+                    "score": float(score),
+                }
+                for row, score in zip(top, scores)
+            ]
+
+
+def _score_one(jobs, resume_emb, resume_skills, k, mask):
+    try:
+        return next(score_batch(jobs, [resume_emb], [resume_skills], k, mask))
     except Exception as e:
-        raise ValueError(f"Scoring error - Rank jobs failed: {str(e)}")
\ No newline at end of file
+        return ValueError(f"Scoring error - Rank jobs failed: {str(e)}")
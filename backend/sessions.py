@@ -0,0 +1,53 @@
+import json
+import os
+import struct
+import uuid
+import numpy as np
+from backend.cache import LRUCache, SqliteCache
+from backend.embedding import encode_embedding, decode_embedding
+
+# uploaded resumes live server-side; clients only carry the resume_id
+RESUME_TTL_SECONDS = int(os.getenv("RESUME_TTL_SECONDS", str(60 * 60 * 24)))
+RESUME_STORE_SIZE = int(os.getenv("RESUME_STORE_SIZE", "1000"))
+# optional SQLite file so sessions survive restarts and are shared between workers
+RESUME_STORE_PATH = os.getenv("RESUME_STORE_PATH", "")
+
+
+def _pack(resume):
+    meta = json.dumps({"text": resume["text"], "skills": resume["skills"]}).encode("utf-8")
+    return struct.pack("<I", len(meta)) + meta + encode_embedding(resume["embedding"], "float32")
+
+
+def _unpack(buf):
+    (meta_len,) = struct.unpack_from("<I", buf)
+    meta = json.loads(buf[4:4 + meta_len].decode("utf-8"))
+    return {"text": meta["text"], "skills": meta["skills"], "embedding": decode_embedding(buf[4 + meta_len:])}
+
+
+class ResumeStore:
+    def __init__(self, maxsize=RESUME_STORE_SIZE, ttl=RESUME_TTL_SECONDS, path=RESUME_STORE_PATH):
+        self.memory = LRUCache(maxsize, ttl=ttl)
+        self.disk = SqliteCache(path, table="resumes", ttl=ttl) if path else None
+
+    def put(self, text, skills, embedding):
+        resume_id = uuid.uuid4().hex
+        resume = {"text": text, "skills": list(skills), "embedding": np.asarray(embedding, dtype=np.float32)}
+        self.memory.set(resume_id, resume)
+        if self.disk is not None:
+            self.disk.set(resume_id, _pack(resume))
+        return resume_id
+
+    def get(self, resume_id):
+        resume = self.memory.get(resume_id)
+        if resume is None and self.disk is not None:
+            buf = self.disk.get(resume_id)
+            if buf is not None:
+                resume = _unpack(buf)
+                self.memory.set(resume_id, resume)
+        return resume
+
+    def stats(self):
+        return {"memory": self.memory.stats(), "disk": self.disk.stats() if self.disk is not None else None}
+
+
+resume_store = ResumeStore()
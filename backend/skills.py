@@ -0,0 +1,116 @@
+import re
+import threading
+import numpy as np
+from sqlalchemy.orm import Session
+from backend.db import SessionLocal
+from backend.models import Jobs
+
+# keeps the characters that matter in skill names (c++, c#, node.js, ci/cd)
+_TOKEN = re.compile(r"[a-z0-9+#./-]+")
+
+
+def normalize_skill(skill) -> str:
+    tokens = [token.strip("./-") for token in _TOKEN.findall(str(skill).lower())]
+    return " ".join(token for token in tokens if token)
+
+
+# Interns normalized skill names to dense integer ids ("Python", "python " -> same id)
+class SkillVocabulary:
+    def __init__(self, names=None):
+        self.names = list(names or [])
+        self.ids = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, skill):
+        key = normalize_skill(skill)
+        if not key:
+            return None
+        skill_id = self.ids.get(key)
+        if skill_id is None:
+            skill_id = self.ids[key] = len(self.names)
+            self.names.append(key)
+        return skill_id
+
+    def lookup(self, skill):
+        return self.ids.get(normalize_skill(skill))
+
+    # dense boolean vector over the vocabulary; unknown skills cannot overlap with any job
+    def mask(self, skills):
+        mask = np.zeros(len(self), dtype=bool)
+        for skill in skills or []:
+            skill_id = self.lookup(skill)
+            if skill_id is not None:
+                mask[skill_id] = True
+        return mask
+
+
+# CSR layout of per-job skill ids: job i owns skill_ids[indptr[i]:indptr[i + 1]]
+def build_skill_index(skill_lists, vocabulary):
+    indptr = np.zeros(len(skill_lists) + 1, dtype=np.int64)
+    ids = []
+    for i, skills in enumerate(skill_lists):
+        job_ids = sorted({vocabulary.intern(skill) for skill in skills or []} - {None})
+        ids.extend(job_ids)
+        indptr[i + 1] = len(ids)
+    return indptr, np.array(ids, dtype=np.int32)
+
+
+# Finds known skills in free text with n-gram dictionary lookups (no LLM involved)
+class SkillMatcher:
+    def __init__(self, vocabulary):
+        self.skills = {}
+        for skill in vocabulary:
+            key = normalize_skill(skill)
+            if key:
+                self.skills.setdefault(key, str(skill).strip())
+        self.max_words = max((len(key.split()) for key in self.skills), default=0)
+
+    def __len__(self):
+        return len(self.skills)
+
+    def match(self, text):
+        tokens = normalize_skill(text).split()
+        found = {}
+        for start in range(len(tokens)):
+            for size in range(1, self.max_words + 1):
+                if start + size > len(tokens):
+                    break
+                key = " ".join(tokens[start:start + size])
+                if key in self.skills and key not in found:
+                    found[key] = self.skills[key]
+        return list(found.values())
+
+
+def load_skill_vocabulary(db: Session):
+    vocabulary = set()
+    for (skills,) in db.query(Jobs.skills).all():
+        if isinstance(skills, list):
+            vocabulary.update(skill for skill in skills if isinstance(skill, str))
+    return vocabulary
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def refresh_skill_matcher(db: Session = None):
+    global _matcher
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        matcher = SkillMatcher(load_skill_vocabulary(db))
+    finally:
+        if own_session:
+            db.close()
+    with _matcher_lock:
+        _matcher = matcher
+    return matcher
+
+
+# built from the job skill tags on first use; ingestion refreshes it when new jobs arrive
+def get_skill_matcher():
+    if _matcher is None:
+        return refresh_skill_matcher()
+    return _matcher
@@ -0,0 +1,184 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from backend.skills import SkillVocabulary
+
+# Immutable, versioned on-disk copies of JobArrays that every worker process mmaps read-only.
+#   <dir>/CURRENT          name of the live snapshot, replaced atomically
+#   <dir>/v<version>-<generation>/  one directory per corpus version (backend.models.CorpusVersion):
+#       manifest.json      format, corpus version, shape (written last)
+#       <field>.npy        numeric columns, loaded with mmap_mode="r"
+#       <field>.data.npy, <field>.offsets.npy
+#                          titles, companies and skills as packed JSON values, decoded per row on access
+#       meta.json          the skill vocabulary and company names
+#       index.npz          the publisher's ANN index, when it had one trained for this version
+SNAPSHOT_FORMAT = 2
+# empty (the default) disables snapshots and each process loads the jobs table itself; point it
+# at a directory every worker on the host can write to, e.g. JOB_SNAPSHOT_DIR=data/job_snapshots
+JOB_SNAPSHOT_DIR = os.getenv("JOB_SNAPSHOT_DIR", "")
+JOB_SNAPSHOT_KEEP = int(os.getenv("JOB_SNAPSHOT_KEEP", "3"))
+
+ARRAY_FIELDS = (
+    "matrix", "ids", "skill_indptr", "skill_ids", "skill_rows",
+    "remote", "salary_min", "salary_max", "created_at", "company_codes",
+)
+PACKED_FIELDS = ("titles", "companies", "skills")
+INDEX_FILE = "index.npz"
+
+
+# Read-only column of JSON values packed into one byte array; a row is decoded when it is read,
+# so mapping a snapshot does not parse every title, company and skill list up front
+class PackedColumn:
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @staticmethod
+    def pack(values):
+        encoded = [json.dumps(value).encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return json.loads(self.data[self.offsets[row]:self.offsets[row + 1]].tobytes())
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+
+# Any write to jobs, in place or not, bumps the version, so a snapshot is never reused for
+# rows it does not hold
+def snapshot_name(version):
+    number, generation = version
+    return f"v{number}-{generation}"
+
+
+def _write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def _point_current(directory, name):
+    tmp_path = os.path.join(directory, f".CURRENT.{os.getpid()}")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(tmp_path, os.path.join(directory, "CURRENT"))
+
+
+def current_snapshot(directory):
+    try:
+        with open(os.path.join(directory, "CURRENT"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+# Writes arrays (which must carry a version) as a new snapshot and points CURRENT at it, with
+# index (already synced to arrays) saved alongside when it is trained.
+# Concurrent publishers of the same version are harmless: the first rename wins.
+def publish_snapshot(arrays, directory=JOB_SNAPSHOT_DIR, keep=JOB_SNAPSHOT_KEEP, index=None):
+    os.makedirs(directory, exist_ok=True)
+    name = snapshot_name(arrays.version)
+    target = os.path.join(directory, name)
+    if not os.path.exists(target):
+        tmp_dir = tempfile.mkdtemp(dir=directory, prefix=f".{name}.")
+        try:
+            for field in ARRAY_FIELDS:
+                np.save(os.path.join(tmp_dir, f"{field}.npy"), np.ascontiguousarray(getattr(arrays, field)))
+            for field in PACKED_FIELDS:
+                data, offsets = PackedColumn.pack(getattr(arrays, field))
+                np.save(os.path.join(tmp_dir, f"{field}.data.npy"), data)
+                np.save(os.path.join(tmp_dir, f"{field}.offsets.npy"), offsets)
+            _write_json(os.path.join(tmp_dir, "meta.json"), {
+                "vocabulary": arrays.vocabulary.names,
+                "company_names": list(arrays.company_names),
+            })
+            if index is not None:
+                # a no-op for exact search and for an IVF index that is still training
+                index.save(os.path.join(tmp_dir, INDEX_FILE))
+            _write_json(os.path.join(tmp_dir, "manifest.json"), {
+                "format": SNAPSHOT_FORMAT,
+                "version": list(arrays.version),
+                "rows": len(arrays),
+                "dim": arrays.dim,
+                "published_at": time.time(),
+            })
+            os.rename(tmp_dir, target)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.exists(target):
+                raise
+    _point_current(directory, name)
+    prune_snapshots(directory, keep)
+    return target
+
+
+# Old versions are removed; processes that still map them keep valid mappings until they swap
+def prune_snapshots(directory, keep=JOB_SNAPSHOT_KEEP):
+    current = current_snapshot(directory)
+    names = [name for name in os.listdir(directory) if name.startswith("v") and name != current]
+    names.sort(key=lambda name: os.path.getmtime(os.path.join(directory, name)), reverse=True)
+    for name in names[max(keep - 1, 0):]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+# The live snapshot as JobArrays backed by read-only memory maps, or None if there is none
+# (or it was written in a format this code does not read)
+def load_snapshot(directory=JOB_SNAPSHOT_DIR):
+    from backend.vector_store import JobArrays
+
+    name = current_snapshot(directory)
+    if name is None:
+        return None
+    path = os.path.join(directory, name)
+    try:
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != SNAPSHOT_FORMAT:
+            return None
+        columns = {field: np.load(os.path.join(path, f"{field}.npy"), mmap_mode="r") for field in ARRAY_FIELDS}
+        packed = {
+            field: PackedColumn(
+                np.load(os.path.join(path, f"{field}.data.npy"), mmap_mode="r"),
+                np.load(os.path.join(path, f"{field}.offsets.npy"), mmap_mode="r"),
+            )
+            for field in PACKED_FIELDS
+        }
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        # pruned between reading CURRENT and opening it; the caller falls back to the database
+        return None
+
+    arrays = JobArrays(
+        columns["matrix"],
+        columns["ids"],
+        packed["titles"],
+        packed["companies"],
+        packed["skills"],
+        vocabulary=SkillVocabulary(meta["vocabulary"]),
+        remote=columns["remote"],
+        salary_min=columns["salary_min"],
+        salary_max=columns["salary_max"],
+        created_at=columns["created_at"],
+        skill_index=(columns["skill_indptr"], columns["skill_ids"], columns["skill_rows"]),
+        company_index=(np.array(meta["company_names"], dtype=object), columns["company_codes"]),
+    )
+    arrays.version = tuple(manifest["version"])
+    return arrays
+
+
+# Loads the index published with the snapshot of version into index; False if there is none
+def load_snapshot_index(index, version, directory=JOB_SNAPSHOT_DIR):
+    try:
+        return index.load(os.path.join(directory, snapshot_name(version), INDEX_FILE))
+    except (OSError, ValueError, KeyError):
+        # pruned or half-written; the index is rebuilt from the arrays instead
+        return False
@@ -0,0 +1,231 @@
+import json
+import threading
+from datetime import datetime, timezone
+import numpy as np
+from sqlalchemy.orm import Session
+from backend.models import Jobs, corpus_version
+from backend.ann import make_index, top_k_indices
+from backend.embedding import decode_embedding
+from backend.skills import SkillVocabulary, build_skill_index
+from backend.snapshot import JOB_SNAPSHOT_DIR, load_snapshot, load_snapshot_index, publish_snapshot
+
+
+def _decode_list(value):
+    # legacy rows may hold JSON strings instead of lists
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except Exception:
+            return []
+    return value or []
+
+
+def _decode_vector(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        try:
+            return decode_embedding(value)
+        except ValueError:
+            return np.zeros(0, dtype=np.float32)
+    # rows not yet converted by the 002 migration still carry JSON lists
+    return np.asarray(_decode_list(value), dtype=np.float32).ravel()
+
+
+def _float_or_nan(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return np.nan
+
+
+def _timestamp(value):
+    if isinstance(value, datetime):
+        # SQLite hands back naive datetimes; they are stored as UTC
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+    return np.nan
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+# Immutable column arrays for every job; row i of each array describes the same job.
+# Skills are interned into a per-snapshot vocabulary and kept as a CSR index for vectorized overlap.
+# remote/salary/created_at (epoch seconds, NaN when unknown) are the columns filters mask on.
+class JobArrays:
+    def __init__(self, matrix, ids, titles, companies, skills, vocabulary=None,
+                 remote=None, salary_min=None, salary_max=None, created_at=None,
+                 skill_index=None, company_index=None):
+        self.matrix = matrix
+        self.ids = ids
+        self.titles = titles
+        self.companies = companies
+        self.skills = skills
+        # (version, generation) of the corpus_version row these rows were read at, set by JobVectorStore
+        self.version = None
+        self.vocabulary = vocabulary or SkillVocabulary()
+        unknown = np.full(len(ids), np.nan)
+        self.remote = np.zeros(len(ids), dtype=bool) if remote is None else remote
+        self.salary_min = unknown if salary_min is None else salary_min
+        self.salary_max = unknown if salary_max is None else salary_max
+        self.created_at = unknown if created_at is None else created_at
+        # derived indexes can be passed in precomputed (e.g. mmap'd from a snapshot)
+        if skill_index is None:
+            indptr, skill_ids = build_skill_index(skills, self.vocabulary)
+            skill_index = (indptr, skill_ids, np.repeat(np.arange(len(ids), dtype=np.int32), np.diff(indptr)))
+        self.skill_indptr, self.skill_ids, self.skill_rows = skill_index
+        self.skill_counts = np.diff(self.skill_indptr)
+        # companies as small ints so company filters are an isin over integers
+        if company_index is None:
+            company_keys = np.array([str(company).lower() for company in companies], dtype=object)
+            company_index = np.unique(company_keys, return_inverse=True)
+        self.company_names, self.company_codes = company_index
+
+    def __len__(self):
+        return len(self.ids)
+
+    # lower-cased company names -> codes; names no job carries are dropped
+    def company_codes_for(self, names):
+        return np.flatnonzero(np.isin(self.company_names, list(names)))
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            np.zeros((0, 0), dtype=np.float32),
+            np.zeros(0, dtype=np.int64),
+            np.zeros(0, dtype=object),
+            np.zeros(0, dtype=object),
+            [],
+        )
+
+    @classmethod
+    def from_rows(cls, rows):
+        # sorted by id so the ANN index can map ids back to rows with a binary search
+        rows = sorted(rows, key=lambda row: row.id)
+        vectors = [_decode_vector(row.embedding) for row in rows]
+        dim = next((len(v) for v in vectors if len(v)), 0)
+
+        matrix = np.zeros((len(rows), dim), dtype=np.float32)
+        for i, vec in enumerate(vectors):
+            # missing or malformed embeddings stay as zero rows (similarity 0)
+            if len(vec) == dim:
+                matrix[i] = vec
+
+        return cls(
+            np.ascontiguousarray(normalize_rows(matrix), dtype=np.float32),
+            np.array([row.id for row in rows], dtype=np.int64),
+            np.array([row.title for row in rows], dtype=object),
+            np.array([row.company for row in rows], dtype=object),
+            [_decode_list(row.skills) for row in rows],
+            remote=np.array([row.remote is True for row in rows], dtype=bool),
+            salary_min=np.array([_float_or_nan(row.salary_min) for row in rows], dtype=np.float64),
+            salary_max=np.array([_float_or_nan(row.salary_max) for row in rows], dtype=np.float64),
+            created_at=np.array([_timestamp(row.created_at) for row in rows], dtype=np.float64),
+        )
+
+    def query_vector(self, query):
+        query = np.asarray(query, dtype=np.float32).ravel()
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Embedding dimension mismatch: got {query.shape[0]}, expected {self.dim}")
+        return normalize_rows(query)
+
+    def similarities(self, query):
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.float32)
+        return self.matrix @ self.query_vector(query)
+
+    # Fraction of each job's skills found in resume_skills, for all rows or only the given ones
+    def skill_overlaps(self, resume_skills, rows=None):
+        mask = self.vocabulary.mask(resume_skills)
+        if rows is None:
+            counts = self.skill_counts
+            hits = np.bincount(self.skill_rows, weights=mask[self.skill_ids], minlength=len(self))
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+            counts = self.skill_counts[rows]
+            # gather the CSR entries of just these rows
+            owner = np.repeat(np.arange(len(rows)), counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            entries = self.skill_indptr[rows][owner] + offsets
+            hits = np.bincount(owner, weights=mask[self.skill_ids[entries]], minlength=len(rows))
+        return np.divide(hits, counts, out=np.zeros(len(counts)), where=counts > 0)
+
+
+# Process-wide cache of JobArrays (plus the retrieval index over them), reloaded when the corpus
+# version changes (one primary-key read per request).
+# With a snapshot directory, a new corpus version is read from the shared mmap'd snapshot (and
+# the ANN index published with it) when one exists; a process that has to load from the table
+# publishes both for the others.
+class JobVectorStore:
+    def __init__(self, index=None, snapshot_dir=JOB_SNAPSHOT_DIR):
+        self._lock = threading.Lock()
+        self._signature = None
+        self.arrays = JobArrays.empty()
+        self.index = index if index is not None else make_index()
+        self.snapshot_dir = snapshot_dir
+
+    def invalidate(self):
+        with self._lock:
+            self._signature = None
+
+    def _reload(self, db: Session, signature):
+        if self.snapshot_dir:
+            arrays = load_snapshot(self.snapshot_dir)
+            if arrays is not None and arrays.version == signature:
+                load_snapshot_index(self.index, signature, self.snapshot_dir)
+                self._swap(arrays)
+                return
+        rows = db.query(
+            Jobs.id, Jobs.title, Jobs.company, Jobs.skills, Jobs.embedding,
+            Jobs.remote, Jobs.salary_min, Jobs.salary_max, Jobs.created_at,
+        ).all()
+        arrays = JobArrays.from_rows(rows)
+        arrays.version = signature
+        self._swap(arrays)
+        if self.snapshot_dir:
+            try:
+                publish_snapshot(arrays, self.snapshot_dir, index=self.index)
+            except OSError as e:
+                print(f"Could not publish job snapshot: {str(e)}")
+
+    def _swap(self, arrays):
+        # new ids are filed into the existing index; it only retrains when the corpus outgrows it
+        self.index.sync(arrays)
+        self.arrays = arrays
+        self._signature = arrays.version
+
+    def get(self, db: Session) -> JobArrays:
+        signature = corpus_version(db)
+        with self._lock:
+            if self._signature is None or self._signature != signature:
+                self._reload(db, signature)
+            return self.arrays
+
+    # Called by ingestion after a commit: reload now and persist the updated index for the next startup
+    def refresh(self, db: Session):
+        self.invalidate()
+        arrays = self.get(db)
+        self.index.save()
+        return arrays
+
+    def load_index(self):
+        return self.index.load()
+
+    # Startup: map the live snapshot without touching the database; get() still checks its version
+    def load_snapshot(self):
+        if not self.snapshot_dir:
+            return False
+        arrays = load_snapshot(self.snapshot_dir)
+        if arrays is None:
+            return False
+        with self._lock:
+            load_snapshot_index(self.index, arrays.version, self.snapshot_dir)
+            self._swap(arrays)
+        return True
+
+
+job_store = JobVectorStore()
@@ -1,3 +1,4 @@
+import json
 import streamlit as st
 import requests
 
@@ -5,6 +6,39 @@ import requests
 API_URL = "http://localhost:8000"
 
 
+def check_explain_response(response):
+    # False after telling the user what went wrong; a 404 means the resume session expired
+    if response.status_code == 404:
+        # upload again on the next rerun
+        st.session_state.pop("resume_data", None)
+        st.session_state.pop("ranked_jobs", None)
+        st.warning("Your resume session expired, please upload it again.")
+        return False
+    if response.status_code != 200:
+        st.error(f"Could not explain the match: {response.json().get('detail', response.status_code)}")
+        return False
+    return True
+
+
+def stream_explanation(payload):
+    # parses the backend's Server-Sent Events into text pieces for st.write_stream
+    with requests.post(f"{API_URL}/explain_match/stream", json=payload, stream=True) as response:
+        if not check_explain_response(response):
+            return
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):])
+                if event == "error":
+                    yield f"\n\n{data['detail']}"
+                elif event is None:
+                    yield data["token"]
+            elif not line:
+                event = None
+
+
 def main():
     st.title("Job Callback Agent")
     uploaded = st.file_uploader("Upload your resume (PDF)")
@@ -17,29 +51,50 @@ def main():
         st.session_state.resume_data = res
     
     if "resume_data" in st.session_state:
-        resume_text = st.session_state.resume_data["resume_text"]
-        emb = st.session_state.resume_data["embedding"]
-        skills = st.session_state.resume_data["skills"]
+        # the backend keeps the resume text, skills and embedding; we only send its id
+        resume_id = st.session_state.resume_data["resume_id"]
         
         if st.button("Find Best Jobs"):
-            payload = {"resume_text": resume_text, "embedding": emb, "skills": skills}
-            ranked = requests.post(f"{API_URL}/rank_jobs/", json=payload).json()
+            response = requests.post(f"{API_URL}/rank_jobs/", json={"resume_id": resume_id})
+            if response.status_code == 404:
+                # server-side session expired: upload again on the next rerun
+                del st.session_state.resume_data
+                st.warning("Your resume session expired, please upload it again.")
+                return
+            ranked = response.json()
             print("Ranked jobs response: ", ranked)  # Debug print
             st.session_state.ranked_jobs = ranked["ranked_jobs"]
         
     if "ranked_jobs" in st.session_state:
+        if st.button("Explain top matches"):
+            # one request for all results; explanations render as each completion finishes
+            jobs = st.session_state.ranked_jobs[:5]
+            with requests.post(f"{API_URL}/explain_matches/", json={
+                "resume_id": st.session_state.resume_data["resume_id"],
+                "job_ids": [job["id"] for job in jobs],
+                "scores": {job["id"]: job["score"] for job in jobs},
+                "stream": True
+            }, stream=True) as response:
+                if not check_explain_response(response):
+                    return
+                for line in response.iter_lines(decode_unicode=True):
+                    if line:
+                        item = json.loads(line)
+                        st.subheader(item.get("title", f"Job {item['job_id']}"))
+                        if "error" in item:
+                            st.error(item["error"])
+                        else:
+                            st.info(item["explanation"])
         for idx, job in enumerate(st.session_state.ranked_jobs):
             st.subheader(f"{job['title']} @ {job['company']}")
             st.write(f"Fit score: {job['score']}")
             if st.button(f"Explain match for {job['title']}", key=f"explain_{idx}"):
                 st.write(f"Requesting explanation for job: {job['title']}")
-                explain = requests.post(f"{API_URL}/explain_match/", json={
-                    "resume_text": resume_text,
-                    "job_title": job["title"],
-                    "job_desc": job.get("description", ""),
+                st.write_stream(stream_explanation({
+                    "resume_id": st.session_state.resume_data["resume_id"],
+                    "job_id": job["id"],
                     "score": job["score"]
-                }).json()
-                st.info(explain["explanation"])
+                }))
 
 
 if __name__ == "__main__":
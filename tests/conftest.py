@@ -0,0 +1,34 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import backend.embedding
+import backend.ingestion.scraping
+import backend.ingestion.sources
+from backend.db import Base
+from backend.embedding import EmbeddingCache
+from backend.ingestion.sources import FetchState
+
+
+# keep the on-disk embedding tier and fetch state out of the working tree
+@pytest.fixture(autouse=True)
+def embedding_cache(tmp_path, monkeypatch):
+    cache = EmbeddingCache(path=str(tmp_path / "embedding_cache.sqlite3"))
+    monkeypatch.setattr(backend.embedding, "embedding_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def fetch_state(tmp_path, monkeypatch):
+    state = FetchState(path=str(tmp_path / "fetch_state.sqlite3"))
+    monkeypatch.setattr(backend.ingestion.sources, "fetch_state", state)
+    monkeypatch.setattr(backend.ingestion.scraping, "fetch_state", state)
+    return state
+
+
+# session factory over a throwaway SQLite database with the full schema
+@pytest.fixture()
+def sqlite_session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
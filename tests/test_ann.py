@@ -0,0 +1,143 @@
+import numpy as np
+from unittest.mock import patch
+from backend.ann import ExactIndex, IVFIndex, AutoIndex, make_index, recall_at_k, _synthetic_arrays
+from backend.scoring import score_candidates
+
+
+def test_ivf_recall_against_exact():
+    arrays, _ = _synthetic_arrays(rows=2000, dim=32, clusters=20, seed=0)
+    index = IVFIndex(nprobe=8)
+    index.build(arrays)
+
+    queries = arrays.matrix[:20]
+    assert recall_at_k(index, arrays, queries, k=10) >= 0.9
+
+
+def test_ivf_incremental_sync_adds_new_ids():
+    arrays, _ = _synthetic_arrays(rows=1000, dim=16, clusters=10, seed=1)
+    index = IVFIndex(nprobe=4)
+    index.build(arrays)
+    assert len(index) == 1000
+
+    grown, _ = _synthetic_arrays(rows=1200, dim=16, clusters=10, seed=1)
+    index.sync(grown)
+    assert len(index) == 1200
+    assert index.trained_rows == 1000  # new rows were filed, not retrained
+
+    rows, _ = index.search(grown, grown.matrix[1100], 5)
+    assert 1100 in rows
+
+
+def test_ivf_save_and_load(tmp_path):
+    arrays, _ = _synthetic_arrays(rows=500, dim=16, clusters=5, seed=2)
+    index = IVFIndex(nprobe=4)
+    index.build(arrays)
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+
+    loaded = IVFIndex(nprobe=4)
+    assert loaded.load(path)
+    query = arrays.matrix[42]
+    assert np.array_equal(index.search(arrays, query, 10)[0], loaded.search(arrays, query, 10)[0])
+
+
+def test_load_missing_index(tmp_path):
+    assert not IVFIndex().load(str(tmp_path / "missing.npz"))
+
+
+def test_auto_index_switches_on_size():
+    arrays, _ = _synthetic_arrays(rows=300, dim=8, clusters=4, seed=3)
+    index = AutoIndex(min_rows=1000)
+    index.sync(arrays)
+    assert index.exact
+
+    index = AutoIndex(min_rows=100)
+    index.sync(arrays)
+    index.wait(10)
+    assert not index.exact
+
+
+def test_auto_index_serves_exact_until_the_first_ivf_build():
+    import threading
+
+    arrays, _ = _synthetic_arrays(rows=300, dim=8, clusters=4, seed=3)
+    index = AutoIndex(min_rows=100)
+    release = threading.Event()
+    train = IVFIndex.train
+
+    def slow_train(self, matrix):
+        release.wait(10)
+        return train(self, matrix)
+
+    with patch.object(IVFIndex, 'train', slow_train):
+        index.sync(arrays)  # returns while the build is still waiting
+        assert index.exact
+        rows, _ = index.search(arrays, arrays.matrix[3], 5)
+        assert rows[0] == 3
+        release.set()
+        index.wait(10)
+    assert not index.exact
+    assert index.search(arrays, arrays.matrix[3], 5)[0][0] == 3
+
+
+def test_make_index_kinds():
+    assert isinstance(make_index("exact"), ExactIndex)
+    assert isinstance(make_index("ivf"), IVFIndex)
+
+
+def test_score_candidates_ann_matches_exact_top_hit():
+    arrays, vocab = _synthetic_arrays(rows=2000, dim=32, clusters=20, seed=4)
+    index = IVFIndex(nprobe=8)
+    index.build(arrays)
+
+    query = arrays.matrix[7]
+    exact_rows, exact_scores = score_candidates(arrays, ExactIndex(), query, arrays.skills[7], k=5)
+    ann_rows, ann_scores = score_candidates(arrays, index, query, arrays.skills[7], k=5)
+    assert exact_rows[0] == ann_rows[0] == 7
+    assert exact_scores[0] == ann_scores[0]
+
+
+def test_ivf_retrains_in_background_after_growth():
+    small, _ = _synthetic_arrays(rows=200, dim=16, clusters=5, seed=5)
+    index = IVFIndex(nprobe=4)
+    index.build(small)
+
+    grown, _ = _synthetic_arrays(rows=2000, dim=16, clusters=5, seed=5)
+    index.sync(grown)
+    # new ids are searchable right away, with the old centroids
+    assert len(index) == 2000
+    rows, _ = index.search(grown, grown.matrix[1500], 5)
+    assert 1500 in rows
+
+    index.wait(10)
+    assert index.trained_rows == 2000
+    assert len(index.centroids) == len(index.lists) > 5
+    assert len(index) == 2000
+
+
+def test_ivf_search_sees_consistent_state_during_rebuilds():
+    import threading
+
+    small, _ = _synthetic_arrays(rows=100, dim=16, clusters=4, seed=6)
+    big, _ = _synthetic_arrays(rows=3000, dim=16, clusters=20, seed=6)
+    index = IVFIndex(nprobe=64)
+    index.build(small)
+    errors = []
+    stop = threading.Event()
+
+    def search_loop():
+        while not stop.is_set():
+            try:
+                rows, _ = index.search(big, big.matrix[0], 5)
+                assert len(rows) > 0
+            except Exception as e:
+                errors.append(e)
+                return
+
+    thread = threading.Thread(target=search_loop)
+    thread.start()
+    for arrays in (big, small, big, small):
+        index.build(arrays)
+    stop.set()
+    thread.join()
+    assert errors == []
@@ -1,10 +1,18 @@
+import asyncio
 import pytest
 from contextlib import asynccontextmanager
 from fastapi.testclient import TestClient
 from unittest.mock import patch, AsyncMock, MagicMock
-from backend.app import app, lifespan, scheduled_scraping
+import backend.app
+from backend.app import app, lifespan
 from backend.db import SessionLocal
 from backend.models import Jobs
+from backend.embedding import encode_embedding
+from backend.sessions import resume_store
+from backend.explanation import explanation_cache
+from backend.llm import FakeLLMClient, AsyncFakeLLMClient
+from backend.ingestion.scheduler import IngestAlreadyRunning, ingest_scheduler
+import json
 
 client = TestClient(app)
 
@@ -16,36 +24,53 @@ def db_session():
 
 @pytest.mark.asyncio
 async def test_lifespan_startup():
-    with patch('backend.app.scheduled_scraping', new_callable=AsyncMock) as mock_scheduled:
-        with patch('backend.app.asyncio.create_task') as mock_create_task:
-            app_mock = MagicMock()
-            async with lifespan(app_mock):
-                pass
-            
-            # Verify create_task was called during startup
-            mock_create_task.assert_called_once()
+    with patch('backend.app.ingest_scheduler') as mock_scheduler, \
+         patch('backend.app.job_store') as mock_store, \
+         patch('backend.app.get_model') as mock_get_model, \
+         patch('backend.app.WARM_MODEL', True), \
+         patch('backend.app.INGEST_SCHEDULER', True), \
+         patch('backend.app.model_warmup', None):
+        app_mock = MagicMock()
+        async with lifespan(app_mock):
+            # Verify the ingest scheduler thread was started during startup
+            mock_scheduler.start.assert_called_once()
+            mock_scheduler.stop.assert_not_called()
+            mock_store.load_index.assert_called_once()
+            mock_store.load_snapshot.assert_called_once()
+            await backend.app.model_warmup
+            mock_get_model.assert_called_once()
+        mock_scheduler.stop.assert_called_once()
 
 @pytest.mark.asyncio
-async def test_scheduled_scraping():
-    with patch('backend.app.ingest_jobs') as mock_ingest, \
-         patch('backend.app.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
-        
-        mock_sleep.side_effect = [None, Exception("Stop loop")]  # Stop after first iteration
-        async def run_once():
-            try:
-                await scheduled_scraping()
-            except Exception as e:
-                if str(e) != "Stop loop":
-                    raise
-
-        await run_once()
-        
-        assert mock_ingest.call_count >= 1
-        mock_sleep.assert_called_with(60 * 60 * 24)
+async def test_lifespan_without_scheduler():
+    with patch('backend.app.ingest_scheduler') as mock_scheduler, \
+         patch('backend.app.job_store'), \
+         patch('backend.app.WARM_MODEL', False), \
+         patch('backend.app.INGEST_SCHEDULER', False):
+        async with lifespan(MagicMock()):
+            pass
+        mock_scheduler.start.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_failed_model_warmup_is_reported_by_ready():
+    with patch('backend.app.ingest_scheduler'), \
+         patch('backend.app.job_store'), \
+         patch('backend.app.get_model', side_effect=OSError("model download failed")), \
+         patch('backend.app.is_model_loaded', return_value=False), \
+         patch('backend.app.WARM_MODEL', True), \
+         patch('backend.app.INGEST_SCHEDULER', False), \
+         patch('backend.app.model_warmup', None):
+        async with lifespan(MagicMock()):
+            with pytest.raises(OSError):
+                await backend.app.model_warmup
+            response = backend.app.ready()
+        assert response.status_code == 503
+        assert json.loads(response.body) == {"ready": False, "model_loaded": False, "model_error": "model download failed"}
 
 def test_upload_resume(db_session):
-    # Mock parse_resume to return dummy data
-    with patch('backend.app.parse_resume', return_value=("dummy text", ["Python"])), \
+    # Mock PDF extraction and skill extraction to return dummy data
+    with patch('backend.app.extract_text', return_value="dummy text"), \
+         patch('backend.app.extract_skills_async', new_callable=AsyncMock, return_value=["Python"]), \
          patch('backend.app.embed_text', return_value=[0.1] * 384):
         files = {"file": ("test_resume.pdf", b"fake resume content", "application/pdf")}
         response = client.post("/upload_resume/", files=files)
@@ -54,14 +79,33 @@ def test_upload_resume(db_session):
         assert "resume_text" in data
         assert data["resume_text"] == "dummy text"
         assert "skills" in data
-        assert "embedding" in data
+        assert "resume_id" in data
+        assert "embedding" not in data  # kept server-side unless include_embedding=true
+
+        response = client.post("/upload_resume/?include_embedding=true", files=files)
+        assert response.json()["embedding"] == [0.1] * 384
 
 def test_trigger_scraping():
-    with patch('backend.app.ingest_jobs') as mock_ingest:
+    with patch.object(ingest_scheduler, 'trigger', return_value=7) as mock_trigger:
         response = client.post("/admin/ingest_jobs/")
         assert response.status_code == 200
         data = response.json()
-        assert data == {"status": "Scraping started in background"}
+        assert data == {"status": "Scraping started in background", "run_id": 7}
+        mock_trigger.assert_called_once_with("manual")
+
+def test_trigger_scraping_while_running_returns_409():
+    with patch.object(ingest_scheduler, 'trigger', side_effect=IngestAlreadyRunning()):
+        response = client.post("/admin/ingest_jobs/")
+    assert response.status_code == 409
+
+def test_ingest_runs_lists_history():
+    runs = [{"id": 2, "trigger": "manual", "status": "running"}, {"id": 1, "trigger": "schedule", "status": "succeeded"}]
+    with patch.object(ingest_scheduler, 'history', return_value=runs) as mock_history:
+        response = client.get("/admin/ingest_runs/?limit=2")
+    assert response.status_code == 200
+    assert response.json()["runs"] == runs
+    assert response.json()["scheduler"]["running_run_id"] is None
+    mock_history.assert_called_once_with(2)
 
 
 def test_rank_jobs(db_session):
@@ -75,7 +119,7 @@ def test_rank_jobs(db_session):
         company="Test Company",
         description="Test Description",
         skills=["Python"],
-        embedding=[0.1] * 384
+        embedding=encode_embedding([0.1] * 384)
     )
     db_session.add(job)
     db_session.commit()
@@ -101,4 +145,342 @@ def test_explain_match():
     response = client.post("/explain_match/", json=payload)
     assert response.status_code == 200
     data = response.json()
-    assert "explanation" in data
\ No newline at end of file
+    assert "explanation" in data
+
+def test_health():
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_ready_reports_model_state():
+    with patch('backend.app.is_model_loaded', return_value=False):
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["model_loaded"] is False
+
+    with patch('backend.app.is_model_loaded', return_value=True):
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json() == {"ready": True, "model_loaded": True}
+
+
+def test_rank_and_explain_by_resume_id(db_session):
+    db_session.query(Jobs).delete()
+    db_session.commit()
+    job = Jobs(title="Stored Job", company="Test Company", description="Stored Description", skills=["Python"], embedding=encode_embedding([0.1] * 384))
+    db_session.add(job)
+    db_session.commit()
+
+    resume_id = resume_store.put("Stored resume", ["Python"], [0.1] * 384)
+
+    response = client.post("/rank_jobs/", json={"resume_id": resume_id})
+    assert response.status_code == 200
+    ranked = response.json()["ranked_jobs"]
+    assert ranked[0]["title"] == "Stored Job"
+
+    with patch('backend.app.explain_match', return_value="Great fit") as mock_explain:
+        response = client.post("/explain_match/", json={"resume_id": resume_id, "job_id": ranked[0]["id"], "score": ranked[0]["score"]})
+        assert response.status_code == 200
+        assert response.json() == {"explanation": "Great fit"}
+        mock_explain.assert_called_once_with("Stored resume", "Stored Job", "Stored Description", ranked[0]["score"])
+
+
+def test_unknown_resume_id_returns_404():
+    response = client.post("/rank_jobs/", json={"resume_id": "missing"})
+    assert response.status_code == 404
+
+    response = client.post("/explain_match/", json={"resume_id": "missing", "job_id": 1, "score": 0.5})
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_upload_resume_does_not_block_event_loop():
+    import time
+    import httpx
+
+    def slow_extract(file_bytes, on_prefix=None):
+        time.sleep(0.5)  # stands in for a large PDF
+        return "dummy text"
+
+    async def slow_skills(text):
+        await asyncio.sleep(0.3)
+        return ["Python"]
+
+    def slow_embed(text):
+        time.sleep(0.3)
+        return [0.1] * 384
+
+    with patch('backend.app.extract_text', side_effect=slow_extract), \
+         patch('backend.app.extract_skills_async', side_effect=slow_skills), \
+         patch('backend.app.embed_text', side_effect=slow_embed):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            files = {"file": ("test_resume.pdf", b"fake resume content", "application/pdf")}
+            upload_start = time.perf_counter()
+            upload = asyncio.create_task(async_client.post("/upload_resume/", files=files))
+            await asyncio.sleep(0.05)
+
+            start = time.perf_counter()
+            health = await async_client.get("/health")
+            assert health.status_code == 200
+            assert time.perf_counter() - start < 0.25  # served while the upload is still extracting
+
+            response = await upload
+            assert response.json()["skills"] == ["Python"]
+    # 0.5s extraction, then skills and encoding overlap (0.3s), instead of 0.5 + 0.3 + 0.3
+    assert time.perf_counter() - upload_start < 1.0
+
+
+def _sse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = None, None
+        for line in block.split("\n"):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        events.append((event, data))
+    return events
+
+
+def test_explain_match_stream():
+    explanation_cache.clear()
+    fake = FakeLLMClient(reply="Strong Python background fits this role.")
+    payload = {"resume_text": "Test Text", "job_title": "Stream Job", "job_desc": "Test Description", "score": 0.9}
+
+    with patch('backend.explanation.get_client', return_value=fake):
+        response = client.post("/explain_match/stream", json=payload)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _sse_events(response.text)
+        tokens = [data["token"] for event, data in events if event is None]
+        assert len(tokens) == 6
+        assert "".join(tokens) == "Strong Python background fits this role."
+        assert events[-1] == ("done", {})
+
+        # the finished stream was cached: the plain endpoint does not call the LLM again
+        assert client.post("/explain_match/", json=payload).json()["explanation"] == "Strong Python background fits this role."
+        assert fake.calls == 1
+
+
+def test_explain_match_stream_error_event():
+    explanation_cache.clear()
+    payload = {"resume_text": "Test Text", "job_title": "Broken Job", "job_desc": "Test Description", "score": 0.1}
+    with patch('backend.explanation.get_client') as mock_get_client:
+        mock_get_client.return_value.chat.completions.create.side_effect = Exception("API error")
+        response = client.post("/explain_match/stream", json=payload)
+    event, data = _sse_events(response.text)[-1]
+    assert event == "error"
+    assert "API error" in data["detail"]
+
+
+def test_explain_match_stream_missing_fields():
+    response = client.post("/explain_match/stream", json={"resume_text": "Test Text"})
+    assert response.status_code == 400
+
+
+def _add_jobs(db_session, count):
+    db_session.query(Jobs).delete()
+    db_session.commit()
+    jobs = [
+        Jobs(title=f"Batch Job {i}", company="Batch Co", description=f"Description {i}", skills=["Python"], embedding=encode_embedding([0.1] * 384))
+        for i in range(count)
+    ]
+    db_session.add_all(jobs)
+    db_session.commit()
+    return [job.id for job in jobs]
+
+
+def test_explain_matches_runs_concurrently(db_session):
+    import time
+
+    explanation_cache.clear()
+    job_ids = _add_jobs(db_session, 5)
+    resume_id = resume_store.put("Batch resume", ["Python"], [0.1] * 384)
+    fake = AsyncFakeLLMClient(reply=lambda messages: messages[0]["content"].split("\n")[1], latency=0.3)
+
+    with patch('backend.explanation.get_async_client', return_value=fake):
+        start = time.perf_counter()
+        response = client.post("/explain_matches/", json={"resume_id": resume_id, "job_ids": job_ids + [999999]})
+        elapsed = time.perf_counter() - start
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["job_id"] for item in data["explanations"]] == job_ids
+    assert data["explanations"][2]["explanation"] == "Job: Batch Job 2"
+    assert data["explanations"][0]["score"] == 1.0  # recomputed: same embedding, all skills match
+    assert data["unknown_job_ids"] == [999999]
+    assert fake.calls == 5
+    assert elapsed < 1.0  # five 0.3s completions overlap instead of taking 1.5s
+
+
+def test_explain_matches_stream_ndjson(db_session):
+    explanation_cache.clear()
+    job_ids = _add_jobs(db_session, 2)
+    fake = AsyncFakeLLMClient(reply="Fits well")
+    payload = {
+        "resume_text": "Batch resume", "embedding": [0.1] * 384, "skills": ["Python"],
+        "job_ids": job_ids, "scores": {str(job_ids[0]): 0.5}, "stream": True,
+    }
+
+    with patch('backend.explanation.get_async_client', return_value=fake):
+        response = client.post("/explain_matches/", json=payload)
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(item["job_id"] for item in items) == sorted(job_ids)
+    assert {item["job_id"]: item["score"] for item in items}[job_ids[0]] == 0.5
+    assert all(item["explanation"] == "Fits well" for item in items)
+
+
+def test_explain_matches_rejects_too_many_ids():
+    resume_id = resume_store.put("Batch resume", ["Python"], [0.1] * 384)
+    response = client.post("/explain_matches/", json={"resume_id": resume_id, "job_ids": list(range(1, 100))})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("payload", [
+    {"job_ids": "1,2"},
+    {"job_ids": [1, "two"]},
+    {"job_ids": [1], "scores": {"1": "high"}},
+    {"job_ids": [1], "scores": [0.5]},
+])
+def test_explain_matches_rejects_malformed_input(payload):
+    resume_id = resume_store.put("Batch resume", ["Python"], [0.1] * 384)
+    response = client.post("/explain_matches/", json={"resume_id": resume_id, **payload})
+    assert response.status_code == 400
+
+
+def test_rank_jobs_rejects_invalid_filters():
+    payload = {"resume_text": "Test Text", "embedding": [0.1] * 384, "skills": ["Python"], "filters": {"remote": "maybe"}}
+    response = client.post("/rank_jobs/", json=payload)
+    assert response.status_code == 400
+    assert "Invalid filter remote" in response.json()["detail"]
+
+
+def test_list_jobs_paginates_with_cursor_and_projection(db_session):
+    db_session.query(Jobs).delete()
+    db_session.commit()
+    for i in range(5):
+        db_session.add(Jobs(title=f"Job {i}", company="Co", description="<p>long</p>", skills=["Python"], embedding=encode_embedding([0.1] * 384)))
+    db_session.commit()
+
+    response = client.get("/jobs/", params={"limit": 2})
+    assert response.status_code == 200
+    page = response.json()
+    assert [job["title"] for job in page["jobs"]] == ["Job 4", "Job 3"]
+    assert "description" not in page["jobs"][0] and "embedding" not in page["jobs"][0]
+
+    titles = [job["title"] for job in page["jobs"]]
+    while page["next_cursor"]:
+        page = client.get("/jobs/", params={"limit": 2, "cursor": page["next_cursor"]}).json()
+        titles.extend(job["title"] for job in page["jobs"])
+    assert titles == [f"Job {i}" for i in range(4, -1, -1)]
+
+    page = client.get("/jobs/", params={"limit": 1, "fields": "title,description,embedding"}).json()
+    assert set(page["jobs"][0]) == {"id", "title", "description", "embedding"}
+    assert len(page["jobs"][0]["embedding"]) == 384
+
+    assert client.get("/jobs/", params={"fields": "password"}).status_code == 400
+    assert client.get("/jobs/", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_list_jobs_etag_returns_304_until_page_changes(db_session):
+    db_session.query(Jobs).delete()
+    db_session.commit()
+    db_session.add(Jobs(title="Job A", company="Co", skills=[], embedding=encode_embedding([0.1] * 384)))
+    db_session.commit()
+
+    response = client.get("/jobs/")
+    etag = response.headers["etag"]
+    response = client.get("/jobs/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    db_session.add(Jobs(title="Job B", company="Co", skills=[], embedding=encode_embedding([0.1] * 384)))
+    db_session.commit()
+    response = client.get("/jobs/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_rank_jobs_batch_streams_ndjson(db_session):
+    db_session.query(Jobs).delete()
+    db_session.commit()
+    db_session.add(Jobs(title="Python Job", company="Co", skills=["Python"], embedding=encode_embedding([1.0] + [0.0] * 383)))
+    db_session.add(Jobs(title="Java Job", company="Co", skills=["Java"], embedding=encode_embedding([0.0, 1.0] + [0.0] * 382)))
+    db_session.commit()
+    resume_id = resume_store.put("Stored resume", ["Java"], [0.0, 1.0] + [0.0] * 382)
+
+    payload = {
+        "resumes": [
+            {"embedding": [1.0] + [0.0] * 383, "skills": ["Python"]},
+            {"resume_id": "missing"},
+            {"resume_id": resume_id},
+        ],
+        "k": 1,
+    }
+    response = client.post("/rank_jobs/batch", json=payload)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert [job["title"] for job in lines[0]["ranked_jobs"]] == ["Python Job"]
+    assert "Unknown or expired resume_id" in lines[1]["error"]
+    assert [job["title"] for job in lines[2]["ranked_jobs"]] == ["Java Job"]
+
+    assert client.post("/rank_jobs/batch", json={"resumes": []}).status_code == 400
+    assert client.post("/rank_jobs/batch", json={"resumes": [{"skills": ["Python"]}]}).status_code == 400
+
+    # a resume that cannot be scored gets its own error line; the others are still ranked
+    payload["resumes"].insert(1, {"embedding": [1.0, 2.0], "skills": []})
+    lines = [json.loads(line) for line in client.post("/rank_jobs/batch", json=payload).text.splitlines()]
+    assert [line["index"] for line in lines] == [0, 1, 2, 3]
+    assert [job["title"] for job in lines[0]["ranked_jobs"]] == ["Python Job"]
+    assert "Error ranking jobs" in lines[1]["error"] and "ranked_jobs" not in lines[1]
+    assert [job["title"] for job in lines[3]["ranked_jobs"]] == ["Java Job"]
+
+
+def test_ingest_stats_reports_pipeline_counters():
+    from backend.ingestion import scraping
+
+    counter = scraping.StageCounter("embed")
+    counter.add(100, 2.0)
+    with patch.object(scraping, 'pipeline_counters', {"embed": counter}):
+        response = client.get("/admin/ingest_stats/")
+    assert response.json() == {"embed": {"items": 100, "seconds": 2.0, "per_second": 50.0}}
+
+
+def test_metrics_and_server_timing_cover_rank_jobs(db_session):
+    db_session.query(Jobs).delete()
+    db_session.add(Jobs(title="Metered Job", company="Acme", description="d", skills=["Python"], embedding=encode_embedding([0.1] * 384)))
+    db_session.commit()
+
+    response = client.post("/rank_jobs/", json={"resume_text": "t", "embedding": [0.1] * 384, "skills": ["Python"]})
+    assert response.status_code == 200
+    stages = {entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")}
+    assert {"scoring.load", "scoring.rank", "serialize", "total"} <= stages
+
+    body = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="POST",route="/rank_jobs/",status="200"}' in body
+    assert 'stage_duration_seconds_count{stage="scoring.rank"}' in body
+
+
+def test_cors_headers_are_sent():
+    response = client.get("/health", headers={"Origin": "http://localhost:8501"})
+    assert response.headers["access-control-allow-origin"] == "http://localhost:8501"
+
+
+def test_profile_is_opt_in():
+    from backend import metrics
+
+    assert "x-profile-id" not in client.get("/health?profile=1").headers
+    with patch.object(metrics, 'PROFILING_ENABLED', True):
+        response = client.get("/health", headers={"X-Profile": "1"})
+    profile_id = response.headers["x-profile-id"]
+    profile = client.get(f"/admin/profiles/{profile_id}").json()
+    assert profile["path"] == "/health" and profile["status"] == 200 and profile["scope"] == "process"
+    assert client.get(f"/admin/profiles/{profile_id}?format=folded").status_code == 200
+    assert client.get("/admin/profiles/missing").status_code == 404
@@ -0,0 +1,42 @@
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# runs in a child process: backend.bench points backend.db at its own temporary database,
+# which only works before anything else has imported it
+def run_bench(*args, env=None):
+    code = f"from backend.bench import main; main({list(args)!r})"
+    return subprocess.run(
+        [sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, timeout=300, env=env or os.environ.copy()
+    )
+
+
+def test_bench_smoke(tmp_path):
+    output = tmp_path / "bench.json"
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'mine.db'}"}
+    result = run_bench(
+        "--only", "rank,ingest,parse", "--sizes", "200", "--queries", "3", "--feed-jobs", "20",
+        "--feed-latency", "0", "--llm-latency", "0", "--output", str(output), env=env,
+    )
+    assert result.returncode == 0, result.stderr
+    report = json.loads(output.read_text())
+    assert report["meta"]["database"].startswith("sqlite:///") and "job-bench-" in report["meta"]["database"]
+    assert report["results"]["rank"][0]["rows"] == 200
+    assert report["results"]["rank"][0]["rank_jobs"]["n"] == 3
+    assert report["results"]["ingest"]["full"]["inserted"] == 20
+    assert report["results"]["ingest"]["unchanged"]["inserted"] == 0
+    assert report["results"]["parse"]["parse_resume"]["n"] > 0
+    # an exported DATABASE_URL is never touched
+    assert not (tmp_path / "mine.db").exists()
+
+
+def test_bench_refuses_other_databases(tmp_path):
+    code = "import backend.db; from backend import bench; bench.reset_database()"
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'mine.db'}"}
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, timeout=120, env=env)
+    assert result.returncode != 0
+    assert "Refusing to reset" in result.stderr
@@ -0,0 +1,97 @@
+import os
+import pytest
+from unittest.mock import patch
+from backend.cache import LRUCache, SqliteCache, content_key
+
+
+def test_content_key_is_stable_and_separates_parts():
+    assert content_key("a", "b") == content_key("a", "b")
+    assert content_key("ab", "") != content_key("a", "b")
+
+
+def test_lru_cache_evicts_least_recent():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recent
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_cache_ttl_expiry():
+    cache = LRUCache(maxsize=10, ttl=5)
+    with patch('backend.cache.time.monotonic', return_value=100.0):
+        cache.set("a", 1)
+    with patch('backend.cache.time.monotonic', return_value=104.0):
+        assert cache.get("a") == 1
+    with patch('backend.cache.time.monotonic', return_value=106.0):
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_sqlite_cache_roundtrip(tmp_path):
+    path = str(tmp_path / "cache" / "cache.sqlite3")
+    cache = SqliteCache(path, table="things")
+    # nothing touches the disk until the first read or write
+    assert not os.path.exists(path)
+    cache.set_many({"a": b"1", "b": b"2"})
+    assert cache.get_many(["a", "b", "c"]) == {"a": b"1", "b": b"2"}
+    assert cache.stats()["misses"] == 1
+
+    # a second handle (e.g. another worker) sees the same entries
+    assert SqliteCache(path, table="things").get("a") == b"1"
+    cache.delete("a")
+    assert cache.get("a") is None
+
+
+def test_sqlite_cache_ttl(tmp_path):
+    cache = SqliteCache(str(tmp_path / "cache.sqlite3"), ttl=60)
+    with patch('backend.cache.time.time', return_value=1000.0):
+        cache.set("a", b"1")
+    with patch('backend.cache.time.time', return_value=1030.0):
+        assert cache.get("a") == b"1"
+    with patch('backend.cache.time.time', return_value=1100.0):
+        assert cache.get("a") is None
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from backend.cache import SingleFlight
+
+    flight = SingleFlight()
+    started = threading.Event()
+    runs = []
+
+    def slow():
+        runs.append(1)
+        started.set()
+        time.sleep(0.2)
+        return "done"
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        leader = pool.submit(flight.do, "key", slow)
+        started.wait()
+        followers = [pool.submit(flight.do, "key", slow) for _ in range(4)]
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert results == ["done"] * 5
+    assert len(runs) == 1
+    assert flight.stats() == {"calls": 1, "coalesced": 4, "inflight": 0}
+
+
+def test_single_flight_propagates_errors():
+    from backend.cache import SingleFlight
+
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: "retry") == "retry"  # failures are not remembered
@@ -1,7 +1,67 @@
-from backend.embedding import embed_text
+import numpy as np
+import pytest
+from unittest.mock import patch
+from backend.embedding import embed_text, embed_texts, encode_embedding, decode_embedding, EmbeddingCache
 
 def test_embed_text():
     test = "Test text"
     emb = embed_text(test)
     assert isinstance(emb, list)
-    assert len(emb) > 0
\ No newline at end of file
+    assert len(emb) > 0
+
+
+def test_embed_texts_batches():
+    embs = embed_texts(["Test text", "Other text"], batch_size=1)
+    assert embs.shape[0] == 2
+    assert embs.dtype == np.float32
+    assert np.allclose(embs[0], embed_text("Test text"), atol=1e-5)
+    assert embed_texts([]).shape[0] == 0
+
+
+def test_embedding_cache_skips_encoder(tmp_path):
+    cache = EmbeddingCache(maxsize=10, path=str(tmp_path / "emb.sqlite3"))
+    with patch('backend.embedding.embedding_cache', cache), \
+         patch('backend.embedding._encode', side_effect=lambda texts, *args: np.ones((len(texts), 4), dtype=np.float32)) as mock_encode:
+        embed_texts(["Senior  Python dev", "Go dev"])
+        embs = embed_texts(["Senior Python dev ", "Go dev", "Rust dev"])
+
+    assert embs.shape == (3, 4)
+    # whitespace-normalized repeat hits the cache; only "Rust dev" is encoded the second time
+    assert mock_encode.call_args_list[1].args[0] == ["Rust dev"]
+    assert cache.stats()["hits"] == 2
+
+    # a fresh process (empty memory tier) is served from disk
+    reloaded = EmbeddingCache(maxsize=10, path=str(tmp_path / "emb.sqlite3"))
+    assert len(reloaded.get_many([cache.key("Go dev")])) == 1
+    assert reloaded.stats()["disk"]["hits"] == 1
+
+
+def test_encode_decode_float32_roundtrip():
+    vec = np.random.default_rng(0).standard_normal(384).astype(np.float32)
+    buf = encode_embedding(vec, "float32")
+    assert len(buf) == 4 + 384 * 4
+    decoded = decode_embedding(buf)
+    assert np.array_equal(decoded, vec)
+    assert not decoded.flags.owndata  # view over the stored bytes
+
+
+@pytest.mark.parametrize("dtype,size,tolerance", [("float16", 4 + 384 * 2, 1e-2), ("int8", 8 + 384, 3e-2)])
+def test_encode_decode_quantized(dtype, size, tolerance):
+    vec = np.random.default_rng(1).standard_normal(384).astype(np.float32)
+    buf = encode_embedding(vec, dtype)
+    assert len(buf) == size
+    assert np.allclose(decode_embedding(buf), vec, atol=tolerance)
+
+
+def test_decode_unknown_encoding():
+    with pytest.raises(ValueError, match="Unknown embedding encoding"):
+        decode_embedding(b"XXXX" + b"\x00" * 8)
+
+
+def test_model_loads_lazily():
+    with patch('backend.embedding._model', None):
+        from backend import embedding
+        assert not embedding.is_model_loaded()
+        model = embedding.get_model()
+        assert embedding.is_model_loaded()
+        assert embedding.get_model() is model
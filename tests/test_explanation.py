@@ -0,0 +1,129 @@
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+import asyncio
+from backend.explanation import explain_match, explain_match_async, explain_matches, explanation_cache, explanation_stats
+from backend.llm import AsyncFakeLLMClient
+
+
+@pytest.fixture(autouse=True)
+def empty_explanation_cache():
+    explanation_cache.clear()
+    yield
+    explanation_cache.clear()
+
+
+def _response(content):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    return response
+
+
+def test_explain_match_success():
+    with patch('backend.explanation.get_client') as mock_get_client:
+        mock_get_client.return_value.chat.completions.create.return_value = _response("Good fit")
+        assert explain_match("resume", "Engineer", "Build things", 0.8) == "Good fit"
+
+
+def test_explain_match_cached():
+    with patch('backend.explanation.get_client') as mock_get_client:
+        mock_create = mock_get_client.return_value.chat.completions.create
+        mock_create.return_value = _response("Good fit")
+
+        explain_match("resume", "Engineer", "Build things", 0.8)
+        assert explain_match("resume", "Engineer", "Build things", 0.8) == "Good fit"
+        explain_match("resume", "Engineer", "Build things", 0.9)  # different score, different prompt
+
+        assert mock_create.call_count == 2
+        assert explanation_stats()["cache"]["hits"] >= 1
+
+
+def test_explain_match_coalesces_concurrent_requests():
+    started = threading.Event()
+
+    def slow_create(**kwargs):
+        started.set()
+        time.sleep(0.2)
+        return _response("Shared answer")
+
+    with patch('backend.explanation.get_client') as mock_get_client:
+        mock_create = mock_get_client.return_value.chat.completions.create
+        mock_create.side_effect = slow_create
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            first = pool.submit(explain_match, "resume", "Engineer", "Build things", 0.8)
+            started.wait()
+            others = [pool.submit(explain_match, "resume", "Engineer", "Build things", 0.8) for _ in range(3)]
+            results = [first.result()] + [f.result() for f in others]
+
+    assert results == ["Shared answer"] * 4
+    assert mock_create.call_count == 1
+
+
+def test_explain_match_error():
+    with patch('backend.explanation.get_client') as mock_get_client:
+        mock_get_client.return_value.chat.completions.create.side_effect = Exception("API error")
+        with pytest.raises(ValueError, match="Explanation error - Explain match failed: API error"):
+            explain_match("resume", "Engineer", "Build things", 0.8)
+
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self):
+        super().__init__("rate limited")
+        self.response = MagicMock(headers={"retry-after": "0.05"})
+
+
+@pytest.mark.asyncio
+async def test_explain_match_async_retries_rate_limits():
+    fake = AsyncFakeLLMClient(reply="Eventually")
+    original = fake.create
+    failures = [_RateLimited(), _RateLimited()]
+
+    async def flaky_create(**kwargs):
+        if failures:
+            raise failures.pop()
+        return await original(**kwargs)
+
+    fake.chat.completions.create = flaky_create
+    with patch('backend.explanation.get_async_client', return_value=fake):
+        assert await explain_match_async("resume", "Engineer", "Build things", 0.8) == "Eventually"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("concurrency, peak_expected", [(3, 3), (None, 10)])
+async def test_explain_matches_respects_concurrency_limit(concurrency, peak_expected):
+    running = 0
+    peak = 0
+
+    async def counting_create(**kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        return _response("ok")
+
+    fake = AsyncFakeLLMClient()
+    fake.chat.completions.create = counting_create
+    jobs = [{"id": i, "title": f"Job {i}", "description": "d", "score": 0.5} for i in range(10)]
+    kwargs = {} if concurrency is None else {"concurrency": concurrency}
+    with patch('backend.explanation.get_async_client', return_value=fake):
+        results = [item async for item in explain_matches("resume", jobs, **kwargs)]
+
+    assert sorted(job["id"] for job, _, _ in results) == list(range(10))
+    assert all(error is None for _, _, error in results)
+    # by default every result of the batch is in flight at once
+    assert peak == peak_expected
+
+
+@pytest.mark.asyncio
+async def test_explain_match_async_coalesces():
+    fake = AsyncFakeLLMClient(reply="Shared", latency=0.1)
+    with patch('backend.explanation.get_async_client', return_value=fake):
+        results = await asyncio.gather(*[explain_match_async("resume", "Engineer", "Build things", 0.7) for _ in range(4)])
+    assert results == ["Shared"] * 4
+    assert fake.calls == 1
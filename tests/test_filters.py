@@ -0,0 +1,106 @@
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+from backend.db import SessionLocal
+from backend.embedding import encode_embedding
+from backend.filters import JobFilter
+from backend.models import Jobs
+from backend.scoring import rank_jobs, score_candidates
+from backend.ann import IVFIndex, ExactIndex, _synthetic_arrays
+from backend.vector_store import JobArrays, job_store
+
+NOW = time.time()
+DAY = 24 * 60 * 60
+
+
+@pytest.fixture(autouse=True)
+def fresh_job_store():
+    job_store.invalidate()
+    yield
+    job_store.invalidate()
+
+
+def make_arrays():
+    return JobArrays(
+        np.eye(4, dtype=np.float32),
+        np.arange(1, 5),
+        np.array(["A", "B", "C", "D"], dtype=object),
+        np.array(["Acme", "acme", "Globex", "Initech"], dtype=object),
+        [[], [], [], []],
+        remote=np.array([True, False, True, True]),
+        salary_min=np.array([50000, np.nan, 120000, np.nan]),
+        salary_max=np.array([90000, np.nan, 150000, 200000]),
+        created_at=np.array([NOW - 2 * DAY, NOW - 40 * DAY, NOW, np.nan]),
+    )
+
+
+def test_filter_masks():
+    jobs = make_arrays()
+    assert JobFilter().mask(jobs) is None
+    assert JobFilter(remote=True).mask(jobs).tolist() == [True, False, True, True]
+    assert JobFilter(min_salary=100000).mask(jobs).tolist() == [False, False, True, True]
+    assert JobFilter(max_salary=60000).mask(jobs).tolist() == [True, False, False, False]
+    assert JobFilter(companies=["ACME", "Nope"]).mask(jobs).tolist() == [True, True, False, False]
+    assert JobFilter(posted_within_days=7).mask(jobs, now=NOW).tolist() == [True, False, True, False]
+    assert JobFilter(remote=True, companies=["globex"]).mask(jobs).tolist() == [False, False, True, False]
+
+
+def test_filter_from_payload_validates():
+    filters = JobFilter.from_payload({"remote": True, "min_salary": "100000", "companies": "Acme"})
+    assert filters.key() == (("remote", True), ("min_salary", 100000.0), ("companies", ("acme",)))
+    assert not JobFilter.from_payload(None).active
+    with pytest.raises(ValueError, match="Unknown filters: salary"):
+        JobFilter.from_payload({"salary": 1})
+    with pytest.raises(ValueError, match="Invalid filter remote"):
+        JobFilter.from_payload({"remote": "yes"})
+    with pytest.raises(ValueError, match="Invalid filter min_salary"):
+        JobFilter.from_payload({"min_salary": "lots"})
+
+
+def test_score_candidates_only_returns_eligible_rows():
+    jobs = make_arrays()
+    mask = JobFilter(remote=True).mask(jobs)
+    rows, scores = score_candidates(jobs, ExactIndex(), [0, 1, 0, 0], [], k=10, mask=mask)
+    assert sorted(rows.tolist()) == [0, 2, 3]
+    rows, _ = score_candidates(jobs, ExactIndex(), [0, 1, 0, 0], [], k=10, mask=np.zeros(4, dtype=bool))
+    assert len(rows) == 0
+
+
+def test_filtered_ann_matches_exact():
+    arrays, _ = _synthetic_arrays(5000, 32, clusters=20, seed=0)
+    arrays.remote = np.arange(len(arrays)) % 3 == 0
+    mask = JobFilter(remote=True).mask(arrays)
+    index = IVFIndex(nprobe=8)
+    index.build(arrays)
+    query = arrays.matrix[10]
+
+    expected, _ = score_candidates(arrays, ExactIndex(), query, [], k=10, mask=mask)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("backend.scoring.FILTER_EXACT_ROWS", 100)
+        found, _ = score_candidates(arrays, index, query, [], k=10, mask=mask)
+    assert mask[found].all()
+    assert len(np.intersect1d(expected, found)) >= 8
+
+
+def test_rank_jobs_with_filters():
+    db = SessionLocal()
+    try:
+        db.query(Jobs).delete()
+        db.commit()
+        old = datetime.now(timezone.utc) - timedelta(days=30)
+        db.add_all([
+            Jobs(title="Remote Rich", company="Acme", remote=True, salary_min=150000, salary_max=180000, skills=[], embedding=encode_embedding([1.0, 0.0])),
+            Jobs(title="Onsite Rich", company="Acme", remote=False, salary_min=150000, salary_max=180000, skills=[], embedding=encode_embedding([1.0, 0.0])),
+            Jobs(title="Remote Old", company="Globex", remote=True, salary_max=90000, created_at=old, skills=[], embedding=encode_embedding([1.0, 0.0])),
+        ])
+        db.commit()
+
+        filters = JobFilter(remote=True, min_salary=100000)
+        assert [job["title"] for job in rank_jobs(db, "text", [1.0, 0.0], [], filters=filters)] == ["Remote Rich"]
+        recent = JobFilter(posted_within_days=7)
+        assert {job["title"] for job in rank_jobs(db, "text", [1.0, 0.0], [], filters=recent)} == {"Remote Rich", "Onsite Rich"}
+        companies = JobFilter(companies=["acme"], remote=False)
+        assert [job["title"] for job in rank_jobs(db, "text", [1.0, 0.0], [], filters=companies)] == ["Onsite Rich"]
+    finally:
+        db.close()
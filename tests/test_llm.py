@@ -0,0 +1,30 @@
+import pytest
+from unittest.mock import patch
+from backend import llm
+from backend.llm import FakeLLMClient, AsyncFakeLLMClient
+
+
+def test_fake_client_completion_and_stream():
+    client = FakeLLMClient(reply="one two three")
+    response = client.chat.completions.create(model="m", messages=[])
+    assert response.choices[0].message.content == "one two three"
+
+    chunks = client.chat.completions.create(model="m", messages=[], stream=True)
+    assert [c.choices[0].delta.content for c in chunks] == ["one", " two", " three"]
+    assert client.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_async_fake_client_stream():
+    client = AsyncFakeLLMClient(reply=lambda messages: messages[0]["content"].upper())
+    response = await client.chat.completions.create(messages=[{"role": "user", "content": "hi"}])
+    assert response.choices[0].message.content == "HI"
+
+    stream = await client.chat.completions.create(messages=[{"role": "user", "content": "a b"}], stream=True)
+    assert [c.choices[0].delta.content async for c in stream] == ["A", " B"]
+
+
+def test_fake_backend_selected_by_env():
+    with patch('backend.llm.LLM_BACKEND', "fake"), patch('backend.llm._client', None), patch('backend.llm._async_client', None):
+        assert isinstance(llm.get_client(), FakeLLMClient)
+        assert isinstance(llm.get_async_client(), AsyncFakeLLMClient)
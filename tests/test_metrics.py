@@ -0,0 +1,70 @@
+import threading
+import time
+from backend.metrics import Histogram, SamplingProfiler, _request_timings, server_timing, span, stage_seconds
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("demo_seconds", "Demo.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5.0, "/a")
+    text = histogram.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'demo_seconds_sum{route="/a"} 5.55' in text
+    assert 'demo_seconds_count{route="/a"} 3' in text
+
+
+def test_histogram_escapes_label_values():
+    histogram = Histogram("demo_seconds", "Demo.", ("route",))
+    histogram.observe(0.1, 'a"b')
+    assert 'route="a\\"b"' in histogram.render()
+
+
+def test_span_records_stage_and_request_timing():
+    before = stage_seconds.count("test.stage")
+    timings = []
+    token = _request_timings.set(timings)
+    try:
+        with span("test.stage"):
+            time.sleep(0.01)
+    finally:
+        _request_timings.reset(token)
+    assert stage_seconds.count("test.stage") == before + 1
+    assert timings[0][0] == "test.stage" and timings[0][1] >= 0.01
+
+
+def test_span_decorator_and_outside_requests():
+    @span("test.decorated")
+    def work():
+        return 42
+
+    before = stage_seconds.count("test.decorated")
+    assert work() == 42
+    assert work() == 42
+    assert stage_seconds.count("test.decorated") == before + 2
+
+
+def test_server_timing_sums_repeated_stages():
+    header = server_timing([("llm", 0.1), ("encode", 0.02), ("llm", 0.2)], 0.5)
+    assert header == "llm;dur=300.0, encode;dur=20.0, total;dur=500.0"
+
+
+def test_sampling_profiler_sees_busy_thread():
+    stop = threading.Event()
+
+    def busy_loop_for_profiler():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop_for_profiler)
+    worker.start()
+    profiler = SamplingProfiler(interval_ms=1).start()
+    time.sleep(0.1)
+    stacks = profiler.stop()
+    stop.set()
+    worker.join()
+    assert profiler.samples > 0
+    assert any("busy_loop_for_profiler" in stack for stack in stacks)
@@ -0,0 +1,72 @@
+import json
+import os
+import pytest
+from sqlalchemy import create_engine, inspect, text
+import backend.migrations.backfill_embeddings as backfill_embeddings
+from backend.embedding import decode_embedding
+
+MIGRATIONS_DIR = os.path.dirname(backfill_embeddings.__file__)
+
+
+# The migrations are written for Postgres; these are the only constructs SQLite lacks
+def _sqlite(sql):
+    return sql.replace("BIGSERIAL PRIMARY KEY", "INTEGER PRIMARY KEY").replace("DEFAULT now()", "DEFAULT CURRENT_TIMESTAMP")
+
+
+def apply_migrations(engine, names):
+    for name in names:
+        with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+            sql = "\n".join(line for line in f.read().splitlines() if not line.lstrip().startswith("--"))
+        with engine.begin() as conn:
+            for statement in _sqlite(sql).split(";"):
+                if statement.strip():
+                    conn.exec_driver_sql(statement)
+
+
+@pytest.fixture()
+def legacy_db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    monkeypatch.setattr(backfill_embeddings, "engine", engine)
+    names = sorted(name for name in os.listdir(MIGRATIONS_DIR) if name.endswith(".sql"))
+    apply_migrations(engine, names[:1])
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO jobs (title, company, embedding) VALUES (:title, 'Acme', :embedding)"),
+            [{"title": f"Job {i}", "embedding": json.dumps([float(i), 1.0])} for i in range(3)],
+        )
+    yield engine, names
+    engine.dispose()
+
+
+def corpus_version(engine):
+    with engine.connect() as conn:
+        return tuple(conn.execute(text("SELECT version, generation FROM corpus_version WHERE id = 1")).one())
+
+
+def assert_converted(engine):
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT id, embedding FROM jobs ORDER BY id")).all()
+    assert [decode_embedding(row.embedding).tolist() for row in rows] == [[float(i), 1.0] for i in range(3)]
+    assert "embedding_json" not in {column["name"] for column in inspect(engine).get_columns("jobs")}
+
+
+def test_backfill_after_all_migrations(legacy_db):
+    engine, names = legacy_db
+    apply_migrations(engine, names[1:])
+    assert corpus_version(engine) == (1, 1)
+
+    assert backfill_embeddings.backfill(batch_size=2, drop_json=True) == 3
+    assert_converted(engine)
+    # one rewrite bump per batch
+    assert corpus_version(engine) == (3, 3)
+
+
+def test_backfill_right_after_002(legacy_db):
+    engine, names = legacy_db
+    apply_migrations(engine, names[1:2])
+
+    # no corpus_version table yet: the backfill must not fail on it
+    assert backfill_embeddings.backfill(batch_size=2, drop_json=True) == 3
+    apply_migrations(engine, names[2:])
+    assert_converted(engine)
+    assert corpus_version(engine) == (1, 1)
@@ -1,6 +1,25 @@
 import pytest
+import threading
 from unittest.mock import patch, MagicMock
-from backend.parser import parse_resume
+from unittest.mock import AsyncMock
+from concurrent.futures import ThreadPoolExecutor
+from backend.parser import parse_resume, extract_skills, extract_skills_async, extract_text, skill_cache, SkillCache
+from backend.skills import SkillMatcher
+from backend.samples import make_pdf
+from backend.executors import get_process_pool
+
+
+@pytest.fixture(autouse=True)
+def empty_skill_cache():
+    skill_cache.memory.clear()
+    yield
+    skill_cache.memory.clear()
+
+
+@pytest.fixture()
+def no_fallback():
+    with patch('backend.parser.get_skill_matcher', return_value=SkillMatcher([])):
+        yield
 
 
 def test_parse_resume_success():
@@ -16,7 +35,8 @@ def test_parse_resume_success():
         mock_reader_class.return_value = mock_reader
         
         # Mock Groq API response
-        with patch('backend.parser.client.chat.completions.create') as mock_create:
+        with patch('backend.parser.get_client') as mock_get_client:
+            mock_create = mock_get_client.return_value.chat.completions.create
             mock_response = MagicMock()
             mock_response.choices[0].message.content = "Python, JavaScript, SQL"
             mock_create.return_value = mock_response
@@ -38,7 +58,7 @@ def test_parse_resume_pdf_error():
             parse_resume(mock_pdf_bytes)
 
 
-def test_parse_resume_api_error():
+def test_parse_resume_api_error(no_fallback):
     # Mock PDF success, but API failure
     mock_pdf_bytes = b"fake pdf content"
     
@@ -49,6 +69,110 @@ def test_parse_resume_api_error():
         mock_reader.pages = [mock_page]
         mock_reader_class.return_value = mock_reader
         
-        with patch('backend.parser.client.chat.completions.create', side_effect=Exception("API error")):
+        with patch('backend.parser.get_client') as mock_get_client:
+            mock_get_client.return_value.chat.completions.create.side_effect = Exception("API error")
             with pytest.raises(ValueError, match="Parsing error - Resume parsing failed: API error"):
-                parse_resume(mock_pdf_bytes)
\ No newline at end of file
+                parse_resume(mock_pdf_bytes)
+
+
+@pytest.mark.asyncio
+async def test_extract_skills_async():
+    with patch('backend.parser.get_async_client') as mock_get_client:
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "Python, SQL"
+        mock_get_client.return_value.chat.completions.create = AsyncMock(return_value=mock_response)
+
+        assert await extract_skills_async("resume text") == ["Python", "SQL"]
+
+
+@pytest.mark.asyncio
+async def test_extract_skills_async_error(no_fallback):
+    with patch('backend.parser.get_async_client') as mock_get_client:
+        mock_get_client.return_value.chat.completions.create = AsyncMock(side_effect=Exception("API error"))
+
+        with pytest.raises(ValueError, match="Parsing error - Resume parsing failed: API error"):
+            await extract_skills_async("resume text")
+
+
+def test_extract_text_extracts_each_page_once():
+    with patch('backend.parser.PyPDF2.PdfReader') as mock_reader_class:
+        pages = [MagicMock(), MagicMock()]
+        pages[0].extract_text.return_value = "Page one."
+        pages[1].extract_text.return_value = ""
+        mock_reader_class.return_value.pages = pages
+
+        assert extract_text(b"fake pdf content") == "Page one."
+        assert pages[0].extract_text.call_count == 1
+        assert pages[1].extract_text.call_count == 1
+
+
+def test_extract_text_parallel_pages_keep_order():
+    pdf = make_pdf([f"Page {i}" for i in range(12)])
+    with patch('backend.parser.PDF_PARALLEL_PAGES', 4), ThreadPoolExecutor(max_workers=3) as pool:
+        text = extract_text(pdf, pool=pool)
+    assert text == " ".join(f"Page {i}" for i in range(12))
+
+
+def test_extract_text_in_spawned_process_pool():
+    pool = get_process_pool()
+    assert pool._mp_context.get_start_method() == "spawn"
+    pdf = make_pdf([f"Page {i}" for i in range(8)])
+    with patch('backend.parser.PDF_PARALLEL_PAGES', 4):
+        assert extract_text(pdf, pool=pool) == " ".join(f"Page {i}" for i in range(8))
+
+
+def test_extract_text_reports_prefix_early():
+    pdf = make_pdf(["A" * 60, "B" * 60, "C" * 60])
+    prefixes = []
+    with patch('backend.parser.SKILLS_PROMPT_CHARS', 100):
+        text = extract_text(pdf, on_prefix=prefixes.append)
+    assert prefixes == ["A" * 60 + " " + "B" * 60]  # fired after page two, once
+    assert text.endswith("C" * 60)
+
+
+
+def test_extract_skills_cached_by_text():
+    with patch('backend.parser.get_client') as mock_get_client:
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "Python, SQL"
+        mock_create = mock_get_client.return_value.chat.completions.create
+        mock_create.return_value = mock_response
+
+        assert extract_skills("same resume") == ["Python", "SQL"]
+        assert extract_skills("same resume") == ["Python", "SQL"]
+        assert mock_create.call_count == 1
+        assert skill_cache.memory.stats()["hits"] >= 1
+
+
+def test_skill_cache_persistent_tier(tmp_path):
+    path = str(tmp_path / "skills.sqlite3")
+    SkillCache(path=path).set("resume text", ["Go"])
+    assert SkillCache(path=path).get("resume text") == ["Go"]
+
+
+def test_extract_skills_falls_back_to_vocabulary():
+    matcher = SkillMatcher(["Python", "Node.js", "Machine Learning"])
+    with patch('backend.parser.get_client') as mock_get_client, \
+         patch('backend.parser.get_skill_matcher', return_value=matcher):
+        mock_get_client.return_value.chat.completions.create.side_effect = Exception("timeout")
+
+        skills = extract_skills("Built machine   learning services in python and NODE.JS.")
+        assert skills == ["Machine Learning", "Python", "Node.js"]
+        assert skill_cache.get("Built machine   learning services in python and NODE.JS.") is None  # fallback is not cached
+
+
+@pytest.mark.asyncio
+async def test_extract_skills_async_builds_fallback_off_the_loop():
+    loop_thread = threading.get_ident()
+    threads = []
+
+    def build_matcher():
+        threads.append(threading.get_ident())
+        return SkillMatcher(["Python"])
+
+    with patch('backend.parser.get_async_client') as mock_get_client, \
+         patch('backend.parser.get_skill_matcher', side_effect=build_matcher):
+        mock_get_client.return_value.chat.completions.create = AsyncMock(side_effect=Exception("timeout"))
+
+        assert await extract_skills_async("python developer") == ["Python"]
+    assert threads and threads[0] != loop_thread
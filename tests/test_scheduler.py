@@ -0,0 +1,159 @@
+import threading
+import time
+from datetime import datetime, timezone
+import pytest
+from backend.ingestion.scheduler import (
+    CronSchedule,
+    FileLock,
+    IngestAlreadyRunning,
+    IngestScheduler,
+    IntervalSchedule,
+)
+from backend.models import IngestRuns
+
+
+def make_scheduler(tmp_path, sqlite_session, ingest, **kwargs):
+    kwargs.setdefault("schedule", IntervalSchedule(3600))
+    kwargs.setdefault("jitter", 0)
+    kwargs.setdefault("run_on_start", False)
+    return IngestScheduler(
+        ingest=ingest,
+        session_factory=sqlite_session,
+        leader_lock=FileLock(str(tmp_path / "leader.lock")),
+        run_lock=FileLock(str(tmp_path / "run.lock")),
+        **kwargs,
+    )
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def test_cron_next_after():
+    # every 15 minutes
+    assert CronSchedule("*/15 * * * *").next_after(utc(2024, 1, 1, 10, 7)) == utc(2024, 1, 1, 10, 15)
+    # 03:30 daily, already past today
+    assert CronSchedule("30 3 * * *").next_after(utc(2024, 1, 1, 4, 0)) == utc(2024, 1, 2, 3, 30)
+    # Mondays at 06:00; 2024-01-01 is a Monday
+    assert CronSchedule("0 6 * * 1").next_after(utc(2024, 1, 1, 6, 0)) == utc(2024, 1, 8, 6, 0)
+    # 7 is Sunday too
+    assert CronSchedule("0 0 * * 7").next_after(utc(2024, 1, 1)) == utc(2024, 1, 7)
+    # first of the month or any Friday, whichever comes first
+    assert CronSchedule("0 12 1 * 5").next_after(utc(2024, 1, 2)) == utc(2024, 1, 5, 12)
+    # month rollover across the year
+    assert CronSchedule("0 0 1 1,7 *").next_after(utc(2024, 7, 1, 0, 0)) == utc(2025, 1, 1)
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "* * * * 8", "5-1 * * * *", "*/0 * * * *", "a * * * *"])
+def test_cron_rejects_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+def test_cron_that_never_matches():
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 31 2 *").next_after(utc(2024, 1, 1))
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    first = FileLock(str(tmp_path / "locks" / "a.lock"))
+    second = FileLock(str(tmp_path / "locks" / "a.lock"))
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_run_records_success_and_failure(tmp_path, sqlite_session):
+    outcomes = [{"fetched": 3, "inserted": 2}, RuntimeError("feed down")]
+
+    def ingest():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    scheduler = make_scheduler(tmp_path, sqlite_session, ingest)
+    ok = scheduler.run("manual")
+    failed = scheduler.run("schedule")
+
+    assert ok["status"] == "succeeded" and ok["stats"] == {"fetched": 3, "inserted": 2}
+    assert ok["duration_seconds"] is not None and ok["trigger"] == "manual"
+    assert failed["status"] == "failed" and failed["error"] == "feed down" and failed["stats"] is None
+    assert [run["id"] for run in scheduler.history()] == [failed["id"], ok["id"]]
+    assert scheduler.running is None
+
+
+def test_overlapping_runs_are_refused(tmp_path, sqlite_session):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_ingest():
+        started.set()
+        release.wait(5)
+        return {"inserted": 0}
+
+    scheduler = make_scheduler(tmp_path, sqlite_session, slow_ingest)
+    # another worker process would use its own lock objects on the same file
+    other = make_scheduler(tmp_path, sqlite_session, slow_ingest)
+    run_id = scheduler.trigger("manual")
+    assert started.wait(5)
+    assert scheduler.running == run_id
+    with pytest.raises(IngestAlreadyRunning):
+        scheduler.trigger("manual")
+    with pytest.raises(IngestAlreadyRunning):
+        other.run("schedule")
+
+    release.set()
+    deadline = time.time() + 5
+    while scheduler.running is not None and time.time() < deadline:
+        time.sleep(0.01)
+    runs = scheduler.history()
+    assert [(run["id"], run["status"]) for run in runs] == [(run_id, "succeeded")]
+
+
+def test_stale_running_rows_are_marked_abandoned(tmp_path, sqlite_session):
+    db = sqlite_session()
+    db.add(IngestRuns(trigger="schedule", status="running", worker="dead:1", started_at=datetime.now(timezone.utc)))
+    db.commit()
+    db.close()
+
+    scheduler = make_scheduler(tmp_path, sqlite_session, lambda: {})
+    scheduler.run("manual")
+    assert [run["status"] for run in scheduler.history()] == ["succeeded", "abandoned"]
+
+
+def test_only_the_leader_runs_the_schedule(tmp_path, sqlite_session):
+    calls = []
+    leader = make_scheduler(tmp_path, sqlite_session, lambda: calls.append("leader") or {}, schedule=IntervalSchedule(0.02))
+    follower = make_scheduler(tmp_path, sqlite_session, lambda: calls.append("follower") or {}, schedule=IntervalSchedule(0.02))
+    assert leader.leader_lock.acquire()
+    leader.is_leader = True
+
+    follower.start()
+    time.sleep(0.2)
+    assert calls == [] and not follower.is_leader
+
+    # the leader going away lets the follower take over at its next tick
+    leader.stop()
+    deadline = time.time() + 5
+    while "follower" not in calls and time.time() < deadline:
+        time.sleep(0.01)
+    follower.stop()
+    assert "follower" in calls and "leader" not in calls
+
+
+def test_run_on_start_and_status(tmp_path, sqlite_session):
+    ran = threading.Event()
+    scheduler = make_scheduler(tmp_path, sqlite_session, lambda: ran.set() or {}, run_on_start=True)
+    assert scheduler.status()["enabled"] is False
+    scheduler.start()
+    try:
+        assert ran.wait(5)
+        status = scheduler.status()
+        assert status["enabled"] and status["leader"]
+        assert status["schedule"] == "every 3600s"
+        assert status["next_run_at"] is not None
+    finally:
+        scheduler.stop()
+    assert not scheduler.is_leader
@@ -1,8 +1,19 @@
 import pytest
 from unittest.mock import patch, MagicMock
 from backend.db import SessionLocal
-from backend.scoring import rank_jobs, skill_overlap, cosine_sim
+from backend.scoring import rank_jobs, skill_overlap, rank_cache
 from backend.models import Jobs
+from backend.embedding import cosine_sim, encode_embedding
+from backend.vector_store import JobArrays, job_store, top_k_indices
+import numpy as np
+
+@pytest.fixture(autouse=True)
+def fresh_job_store():
+    job_store.invalidate()
+    rank_cache.clear()
+    yield
+    job_store.invalidate()
+    rank_cache.clear()
 
 @pytest.fixture()
 def db_session():
@@ -15,19 +26,17 @@ def test_rank_jobs_with_string_embeddings():
     mock_db = MagicMock()
     mock_job = MagicMock()
     mock_job.embedding = '[0.1, 0.2, 0.3]'  # String embedding
-    mock_job.skills = ['python']  # Already list
+    mock_job.skills = ['python', 'sql']  # Already list
     mock_job.id = 1
     mock_job.title = 'Test Job'
     mock_job.company = 'Test Co'
     mock_job.description = 'Desc'
     mock_db.query.return_value.all.return_value = [mock_job]
     
-    with patch('backend.scoring.cosine_sim', return_value=0.8), \
-         patch('backend.scoring.skill_overlap', return_value=0.5):
-        result = rank_jobs(mock_db, 'text', [0.1, 0.2, 0.3], ['python'])
-        
-        assert len(result) == 1
-        assert result[0]['score'] == 0.71  # 0.7*0.8 + 0.3*0.5
+    result = rank_jobs(mock_db, 'text', [0.1, 0.2, 0.3], ['python'])
+
+    assert len(result) == 1
+    assert result[0]['score'] == 0.85  # 0.7*1.0 + 0.3*0.5
 
 
 def test_rank_jobs_with_invalid_string_embeddings():
@@ -40,12 +49,20 @@ def test_rank_jobs_with_invalid_string_embeddings():
     mock_job.title = 'Test Job'
     mock_job.company = 'Test Co'
     mock_job.description = 'Desc'
-    mock_db.query.return_value.all.return_value = [mock_job]
+    valid_job = MagicMock()
+    valid_job.embedding = [0.1, 0.2, 0.3]
+    valid_job.skills = ['python']
+    valid_job.id = 2
+    valid_job.title = 'Valid Job'
+    valid_job.company = 'Test Co'
     
-    with patch('backend.scoring.cosine_sim', return_value=0.0) as mock_cos:  # Should be called with [] and resume_emb
-        result = rank_jobs(mock_db, 'text', [0.1, 0.2, 0.3], ['python'])
-        
-        mock_cos.assert_called_with([0.1, 0.2, 0.3], [])  # job_emb falls back to []
+    mock_db.query.return_value.all.return_value = [mock_job, valid_job]
+
+    result = rank_jobs(mock_db, 'text', [0.1, 0.2, 0.3], ['python'])
+
+    scores = {job['id']: job['score'] for job in result}
+    assert scores[1] == 0.3  # job_emb falls back to a zero vector, only skills count
+    assert scores[2] == 1.0
 
 
 def test_rank_jobs_with_string_skills():
@@ -60,11 +77,10 @@ def test_rank_jobs_with_string_skills():
     mock_job.description = 'Desc'
     mock_db.query.return_value.all.return_value = [mock_job]
     
-    with patch('backend.scoring.cosine_sim', return_value=0.8), \
-         patch('backend.scoring.skill_overlap', return_value=1.0) as mock_overlap:
-        result = rank_jobs(mock_db, 'text', [0.1, 0.2, 0.3], ['python'])
-        
-        mock_overlap.assert_called_with(['python'], ['python', 'sql'])
+    result = rank_jobs(mock_db, 'text', [0.1, 0.2, 0.3], ['python'])
+
+    assert result[0]['skills'] == ['python', 'sql']
+    assert result[0]['score'] == 0.85  # one of the two decoded skills matches
 
 
 def test_rank_jobs_with_invalid_string_skills():
@@ -79,11 +95,10 @@ def test_rank_jobs_with_invalid_string_skills():
     mock_job.description = 'Desc'
     mock_db.query.return_value.all.return_value = [mock_job]
     
-    with patch('backend.scoring.cosine_sim', return_value=0.8), \
-         patch('backend.scoring.skill_overlap', return_value=0.0) as mock_overlap:
-        result = rank_jobs(mock_db, 'text', [0.1, 0.2, 0.3], ['python'])
-        
-        mock_overlap.assert_called_with(['python'], [])  # job_skills falls back to []
+    result = rank_jobs(mock_db, 'text', [0.1, 0.2, 0.3], ['python'])
+
+    assert result[0]['skills'] == []  # job_skills falls back to []
+    assert result[0]['score'] == 0.7
 
 def test_cosine_sim():
     a = [1, 0]
@@ -93,14 +108,30 @@ def test_cosine_sim():
 def test_skill_overlap():
     assert skill_overlap(["Python"], ["Python", "js"]) == 0.5
 
+
+def test_skill_overlap_normalizes_skills():
+    assert skill_overlap(["python "], ["Python", "JS", "js"]) == 0.5
+    assert skill_overlap(["python"], []) == 0
+
+
+def test_vectorized_skill_overlaps_match_reference():
+    skills = [["Python", "SQL"], ["java"], [], ["python ", "Docker", "k8s", "sql"]]
+    resume = ["PYTHON", "sql", "rust"]
+    jobs = JobArrays(np.zeros((4, 3), dtype=np.float32), np.arange(1, 5), ["t"] * 4, ["c"] * 4, skills)
+
+    expected = [skill_overlap(resume, job_skills) for job_skills in skills]
+    assert jobs.skill_overlaps(resume).tolist() == pytest.approx(expected)
+    assert jobs.skill_overlaps(resume, [3, 0]).tolist() == pytest.approx([expected[3], expected[0]])
+    assert jobs.skill_overlaps([]).tolist() == [0, 0, 0, 0]
+
 def test_rank_jobs(db_session):
     # Clear existing jobs
     db_session.query(Jobs).delete()
     db_session.commit()
 
     # Add test jobs to the database
-    job1 = Jobs(title="Test Job 1", company="Test Company", description="Test Description", skills=["Python"], embedding=[0.1, 0.2, 0.3])
-    job2 = Jobs(title="Test Job 2", company="Test Company", description="Test Description", skills=["Java"], embedding=[0.4, 0.5, 0.6])
+    job1 = Jobs(title="Test Job 1", company="Test Company", description="Test Description", skills=["Python"], embedding=encode_embedding([0.1, 0.2, 0.3]))
+    job2 = Jobs(title="Test Job 2", company="Test Company", description="Test Description", skills=["Java"], embedding=encode_embedding([0.4, 0.5, 0.6]))
     db_session.add(job1)
     db_session.add(job2)
     db_session.commit()
@@ -120,6 +151,126 @@ def test_rank_jobs_exception():
     mock_job.skills = ['python']
     mock_db.query.return_value.all.return_value = [mock_job]
     
-    with patch('backend.scoring.cosine_sim', side_effect=Exception("Sim error")):
+    with patch('backend.vector_store.JobArrays.similarities', side_effect=Exception("Sim error")):
         with pytest.raises(ValueError, match="Scoring error - Rank jobs failed: Sim error"):
-            rank_jobs(mock_db, 'text', [0.1, 0.2, 0.3], ['python'])
\ No newline at end of file
+            rank_jobs(mock_db, 'text', [0.1, 0.2, 0.3], ['python'])
+
+def test_top_k_indices():
+    scores = np.array([0.2, 0.9, 0.5, 0.9, 0.1])
+    assert top_k_indices(scores, 3).tolist() == [1, 3, 2]
+    assert top_k_indices(scores, 10).tolist() == [1, 3, 2, 0, 4]
+
+
+def test_rank_jobs_limits_to_k():
+    mock_db = MagicMock()
+    jobs = []
+    for i in range(15):
+        job = MagicMock()
+        job.id = i + 1
+        job.title = f'Job {i}'
+        job.company = 'Co'
+        job.embedding = [1.0, float(i), 0.0]
+        job.skills = []
+        jobs.append(job)
+    mock_db.query.return_value.all.return_value = jobs
+
+    result = rank_jobs(mock_db, 'text', [1.0, 0.0, 0.0], [])
+
+    assert len(result) == 10
+    assert result[0]['id'] == 1  # closest to the resume direction
+    assert [job['score'] for job in result] == sorted((job['score'] for job in result), reverse=True)
+
+
+def test_rank_jobs_with_binary_embeddings():
+    mock_db = MagicMock()
+    mock_job = MagicMock()
+    mock_job.embedding = encode_embedding([0.1, 0.2, 0.3], "float16")
+    mock_job.skills = ['python']
+    mock_job.id = 1
+    mock_job.title = 'Test Job'
+    mock_job.company = 'Test Co'
+    mock_db.query.return_value.all.return_value = [mock_job]
+
+    result = rank_jobs(mock_db, 'text', [0.1, 0.2, 0.3], ['python'])
+
+    assert result[0]['score'] == 1.0
+
+
+def test_score_batch_matches_single_resume_scoring():
+    from backend.ann import ExactIndex, _synthetic_arrays
+    from backend.scoring import score_batch, score_candidates
+
+    arrays, vocab = _synthetic_arrays(500, 16, clusters=5, seed=0)
+    rng = np.random.default_rng(1)
+    embs = [arrays.matrix[i] + 0.1 * rng.standard_normal(16) for i in range(7)]
+    skills = [list(rng.choice(vocab, 3, replace=False)) for _ in range(7)]
+    mask = np.arange(len(arrays)) % 2 == 0
+
+    for batch_mask in (None, mask):
+        batch = list(score_batch(arrays, embs, skills, k=5, mask=batch_mask, chunk_size=3))
+        assert len(batch) == 7
+        for emb, resume_skills, (rows, scores) in zip(embs, skills, batch):
+            expected_rows, expected_scores = score_candidates(arrays, ExactIndex(), emb, resume_skills, k=5, mask=batch_mask)
+            assert rows.tolist() == expected_rows.tolist()
+            assert scores.tolist() == expected_scores.tolist()
+
+
+def test_rank_cache_reuses_and_merges_appended_jobs(db_session):
+    import backend.scoring as scoring
+
+    db_session.query(Jobs).delete()
+    db_session.commit()
+    rng = np.random.default_rng(0)
+    def add_jobs(n, start):
+        for i in range(n):
+            db_session.add(Jobs(title=f"Job {start + i}", company="Co", skills=["Python"] if i % 2 else ["Java"], embedding=encode_embedding(rng.standard_normal(8))))
+        db_session.commit()
+
+    add_jobs(30, 0)
+    resume_emb = rng.standard_normal(8).tolist()
+    first = rank_jobs(db_session, "text", resume_emb, ["python"], k=5)
+    with patch('backend.scoring.score_candidates') as mock_score:
+        assert rank_jobs(db_session, "text", resume_emb, ["Python "], k=5) == first  # same fingerprint
+        mock_score.assert_not_called()
+
+    add_jobs(10, 30)
+    merges = scoring.rank_cache_merges
+    with patch('backend.scoring.score_candidates') as mock_score:
+        merged = rank_jobs(db_session, "text", resume_emb, ["python"], k=5)
+        mock_score.assert_not_called()  # only the 10 new rows were scored
+    assert scoring.rank_cache_merges == merges + 1
+
+    rank_cache.clear()
+    assert rank_jobs(db_session, "text", resume_emb, ["python"], k=5) == merged
+
+    # a deletion is not an append: the ranking is recomputed
+    db_session.delete(db_session.query(Jobs).filter(Jobs.id == merged[0]["id"]).one())
+    db_session.commit()
+    with patch('backend.scoring.score_candidates', wraps=scoring.score_candidates) as mock_score:
+        ranked = rank_jobs(db_session, "text", resume_emb, ["python"], k=5)
+        mock_score.assert_called_once()
+    assert merged[0]["id"] not in [job["id"] for job in ranked]
+
+
+def test_in_place_updates_invalidate_store_and_rank_cache(db_session):
+    import backend.scoring as scoring
+    from backend.models import corpus_version
+
+    db_session.query(Jobs).delete()
+    db_session.add(Jobs(title="Python Job", company="Co", skills=["Python"], embedding=encode_embedding([1.0, 0.0])))
+    db_session.add(Jobs(title="Java Job", company="Co", skills=["Java"], embedding=encode_embedding([1.0, 0.0])))
+    db_session.commit()
+    first = rank_jobs(db_session, "text", [1.0, 0.0], ["python"], k=2)
+    assert first[0]["title"] == "Python Job"
+
+    # same count and max id, different content
+    version = corpus_version(db_session)
+    job = db_session.query(Jobs).filter(Jobs.title == "Java Job").one()
+    job.skills = ["Python", "Java"]
+    db_session.commit()
+    assert corpus_version(db_session)[1] == version[1] + 1
+
+    with patch('backend.scoring.score_candidates', wraps=scoring.score_candidates) as mock_score:
+        ranked = rank_jobs(db_session, "text", [1.0, 0.0], ["python"], k=2)
+        mock_score.assert_called_once()  # recomputed, not merged
+    assert {job["title"]: job["skills"] for job in ranked}["Java Job"] == ["Python", "Java"]
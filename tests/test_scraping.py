@@ -1,34 +1,145 @@
+import asyncio
+import json
+import os
+import threading
 import pytest
-import requests
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch, MagicMock
 from backend.ingestion.scraping import fetch_jobs, normalize_job, ingest_jobs
+from backend.ingestion.sources import FetchState, JobSource, get_sources
+from backend.ingestion.json_stream import JsonArrayStream
 from backend.models import Jobs
 
 
 
-def test_fetch_jobs_success():
-    mock_response = MagicMock()
-    mock_response.json.return_value = {"jobs": [{"title": "Test Job"}]}
-    
-    with patch('backend.ingestion.scraping.requests.get', return_value=mock_response) as mock_get:
-        jobs = fetch_jobs()
-        assert jobs == [{"title": "Test Job"}]
-        mock_get.assert_called_once_with("https://remotive.com/api/remote-jobs?category=software-dev", timeout=10)
+class FeedHandler(BaseHTTPRequestHandler):
+    # per-server behaviour lives on self.server: feeds {path: (etag, body)}, failures {path: count}, hits
+    def do_GET(self):
+        server = self.server
+        server.hits.append((self.path, self.headers.get("If-None-Match")))
+        if server.failures.get(self.path, 0) > 0:
+            server.failures[self.path] -= 1
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        if self.path not in server.feeds:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag, body = server.feeds[self.path]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        payload = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(payload)
 
+    def log_message(self, *args):
+        pass
 
-def test_fetch_jobs_api_error():
-    with patch('backend.ingestion.scraping.requests.get', side_effect=requests.RequestException("Network error")):
-        with pytest.raises(ValueError, match="Scraping Error - Error fetching jobs from API: Network error"):
-            fetch_jobs()
 
+@pytest.fixture()
+def feed_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FeedHandler)
+    server.feeds, server.failures, server.hits = {}, {}, []
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture()
+def state():
+    state = FetchState(path=None)
+    with patch('backend.ingestion.scraping.fetch_state', state):
+        yield state
+
+
+def test_fetch_state_persists_only_committed_validators(tmp_path):
+    path = str(tmp_path / "state" / "fetch_state.sqlite3")
+    state = FetchState(path=path)
+    assert state.get("local") == {}
+    state.stage("local", {"etag": '"v1"'})
+    state.discard()
+    assert not os.path.exists(path)
+
+    state.stage("local", {"etag": '"v2"'})
+    state.commit()
+    assert FetchState(path=path).get("local") == {"etag": '"v2"'}
+
+
+def test_fetch_jobs_success(feed_server, state):
+    feed_server.feeds["/remote-jobs"] = ('"v1"', {"jobs": [{"title": "Test Job"}]})
+    source = JobSource("local", f"{feed_server.url}/remote-jobs")
+
+    jobs = fetch_jobs([source])
+    assert jobs == [{"title": "Test Job"}]
+    assert state.pending == {"local": {"etag": '"v1"'}}
+
+
+def test_fetch_jobs_conditional_request_after_commit(feed_server, state):
+    feed_server.feeds["/remote-jobs"] = ('"v1"', {"jobs": [{"title": "Test Job"}]})
+    source = JobSource("local", f"{feed_server.url}/remote-jobs")
+
+    assert fetch_jobs([source]) == [{"title": "Test Job"}]
+    state.discard()  # ingest failed: the next fetch must download the feed again
+    assert fetch_jobs([source]) == [{"title": "Test Job"}]
+    state.commit()
+    assert fetch_jobs([source]) == []  # unchanged feed costs one 304
+    assert feed_server.hits[-1] == ("/remote-jobs", '"v1"')
+
+    feed_server.feeds["/remote-jobs"] = ('"v2"', {"jobs": [{"title": "New Job"}]})
+    assert fetch_jobs([source]) == [{"title": "New Job"}]
 
-def test_fetch_jobs_invalid_response():
-    mock_response = MagicMock()
-    mock_response.json.return_value = {"invalid": "data"}  # Missing "jobs" key
-    
-    with patch('backend.ingestion.scraping.requests.get', return_value=mock_response):
-        with pytest.raises(ValueError, match="Scraping Error - Unexpected API response structure"):
-            fetch_jobs()
+
+def test_fetch_jobs_retries_and_fetches_sources_concurrently(feed_server, state):
+    feed_server.feeds["/a"] = ('"a"', {"jobs": [{"title": "A"}]})
+    feed_server.feeds["/b"] = ('"b"', {"results": [{"title": "B"}]})
+    feed_server.failures["/a"] = 2
+    sources = [JobSource("a", f"{feed_server.url}/a"), JobSource("b", f"{feed_server.url}/b", jobs_key="results")]
+
+    with patch('backend.ingestion.sources.FETCH_BACKOFF', 0):
+        jobs = fetch_jobs(sources)
+
+    assert sorted(job["title"] for job in jobs) == ["A", "B"]
+    assert [path for path, _ in feed_server.hits].count("/a") == 3
+
+
+def test_fetch_jobs_api_error(feed_server, state):
+    feed_server.failures["/down"] = 10
+    sources = [JobSource("down", f"{feed_server.url}/down"), JobSource("missing", f"{feed_server.url}/missing")]
+    with patch('backend.ingestion.sources.FETCH_BACKOFF', 0):
+        with pytest.raises(ValueError, match="Scraping Error - Error fetching jobs from API: down: HTTP 503; missing: HTTP 404"):
+            fetch_jobs(sources)
+
+
+def test_fetch_jobs_partial_failure_keeps_other_sources(feed_server, state):
+    feed_server.feeds["/ok"] = ('"ok"', {"jobs": [{"title": "OK"}]})
+    sources = [JobSource("ok", f"{feed_server.url}/ok"), JobSource("missing", f"{feed_server.url}/missing")]
+    assert fetch_jobs(sources) == [{"title": "OK"}]
+
+
+def test_fetch_jobs_invalid_response(feed_server, state):
+    feed_server.feeds["/remote-jobs"] = ('"v1"', {"invalid": "data"})  # Missing "jobs" key
+    source = JobSource("local", f"{feed_server.url}/remote-jobs")
+    with pytest.raises(ValueError, match="Unexpected API response structure"):
+        fetch_jobs([source])
+
+
+def test_get_sources_registry():
+    assert [source.name for source in get_sources(["remotive"])] == ["remotive"]
+    with pytest.raises(ValueError, match="Unknown job sources: nope"):
+        get_sources(["remotive", "nope"])
 
 
 def test_normalize_job():
@@ -41,7 +152,7 @@ def test_normalize_job():
         "job_type": "Full-time"
     }
     
-    with patch('backend.ingestion.scraping.embed_text', return_value=[0.1] * 384) as mock_embed:
+    with patch('backend.ingestion.scraping.embed_texts') as mock_embed:
         normalized = normalize_job(job_data)
         
         assert normalized["title"] == "Software Engineer"
@@ -49,8 +160,19 @@ def test_normalize_job():
         assert normalized["description"] == "Build apps"
         assert normalized["remote"] is True
         assert normalized["skills"] == ["Python", "SQL"]
-        assert normalized["embedding"] == [0.1] * 384
-        mock_embed.assert_called_once_with("Software Engineer Build apps Full-time")
+        assert normalized["embedding_text"] == "Software Engineer Build apps Full-time"
+        mock_embed.assert_not_called()  # embedding is batched in ingest_jobs
+
+
+def feeding(jobs):
+    # stands in for fetch_jobs: streams the jobs to the pipeline's on_job callback
+    def fetch(sources=None, on_job=None):
+        async def run():
+            for job in jobs:
+                await on_job(job)
+        asyncio.run(run())
+        return len(jobs)
+    return fetch
 
 
 def test_ingest_jobs_success():
@@ -59,43 +181,55 @@ def test_ingest_jobs_success():
         {"title": "Job 2", "company_name": "Co 2", "description": "Desc 2", "candidate_required_location": "Local", "tags": ["Skill2"]}
     ]
     
-    with patch('backend.ingestion.scraping.fetch_jobs', return_value=mock_jobs), \
+    with patch('backend.ingestion.scraping.fetch_jobs', side_effect=feeding(mock_jobs)), \
          patch('backend.ingestion.scraping.normalize_job') as mock_normalize, \
          patch('backend.ingestion.scraping.SessionLocal') as mock_session_class, \
-         patch('backend.ingestion.scraping.embed_text', return_value=[0.1] * 384):
+         patch('backend.ingestion.scraping.embed_texts', return_value=np.full((2, 384), 0.1, dtype=np.float32)) as mock_embed:
         
         mock_session = MagicMock()
         mock_session_class.return_value = mock_session
-        mock_session.query.return_value.filter.return_value.first.return_value = None  # No duplicates
+        mock_session.query.return_value.filter.return_value.all.return_value = []  # No duplicates
+        mock_session.execute.return_value.scalars.return_value.all.return_value = [1, 2]
         
         # Mock normalize_job returns
         mock_normalize.side_effect = [
-            {"title": "Job 1", "company": "Co 1", "description": "Desc 1", "remote": True, "skills": ["Skill1"], "embedding": [0.1]*384},
-            {"title": "Job 2", "company": "Co 2", "description": "Desc 2", "remote": False, "skills": ["Skill2"], "embedding": [0.1]*384}
+            {"title": "Job 1", "company": "Co 1", "description": "Desc 1", "remote": True, "skills": ["Skill1"], "embedding_text": "Job 1 Desc 1"},
+            {"title": "Job 2", "company": "Co 2", "description": "Desc 2", "remote": False, "skills": ["Skill2"], "embedding_text": "Job 2 Desc 2"}
         ]
         
-        ingest_jobs()
+        stats = ingest_jobs()
         
-        assert mock_session.add.call_count == 2
-        mock_session.commit.assert_called_once()
-        mock_session.close.assert_called_once()
+        mock_embed.assert_called_once_with(["Job 1 Desc 1", "Job 2 Desc 2"])
+        mock_session.execute.assert_called_once()  # one bulk insert
+        assert mock_session.query.call_count >= 1
+        assert stats["inserted"] == 2
+        assert stats["skipped"] == 0
+        assert set(stats["timings"]) == {"fetch", "dedup", "embed", "insert"}
+        assert stats["stages"]["embed"]["items"] == 2
+        mock_session.commit.assert_called_once()  # one chunk, one commit
+        assert mock_session.close.call_count == 2  # dedup stage and insert stage sessions
 
 
 def test_ingest_jobs_with_duplicates():
     mock_jobs = [{"title": "Job 1", "company_name": "Co 1", "description": "Desc 1", "candidate_required_location": "Worldwide", "tags": []}]
     
-    with patch('backend.ingestion.scraping.fetch_jobs', return_value=mock_jobs), \
-         patch('backend.ingestion.scraping.normalize_job', return_value={"title": "Job 1", "company": "Co 1", "description": "Desc 1", "remote": True, "skills": [], "embedding": [0.1]*384}), \
+    with patch('backend.ingestion.scraping.fetch_jobs', side_effect=feeding(mock_jobs)), \
+         patch('backend.ingestion.scraping.normalize_job', return_value={"title": "Job 1", "company": "Co 1", "description": "Desc 1", "remote": True, "skills": [], "embedding_text": "Job 1 Desc 1"}), \
+         patch('backend.ingestion.scraping.embed_texts', return_value=np.zeros((0, 384), dtype=np.float32)) as mock_embed, \
          patch('backend.ingestion.scraping.SessionLocal') as mock_session_class:
         
         mock_session = MagicMock()
         mock_session_class.return_value = mock_session
-        mock_session.query.return_value.filter.return_value.first.return_value = MagicMock()  # Duplicate exists
+        existing = MagicMock()
+        existing.title, existing.company = "Job 1", "Co 1"
+        mock_session.query.return_value.filter.return_value.all.return_value = [existing]  # Duplicate exists
         
-        ingest_jobs()
+        stats = ingest_jobs()
         
-        mock_session.add.assert_not_called()  # No insertion
-        mock_session.commit.assert_called_once()
+        mock_session.execute.assert_not_called()  # No insertion
+        assert stats == {"fetched": 1, "inserted": 0, "skipped": 1, "timings": stats["timings"], "stages": stats["stages"]}
+        mock_embed.assert_not_called()  # duplicates are never encoded
+        mock_session.commit.assert_not_called()
 
 
 def test_ingest_jobs_error():
@@ -109,4 +243,123 @@ def test_ingest_jobs_error():
             ingest_jobs()
         
         mock_session.rollback.assert_called_once()
-        mock_session.close.assert_called_once()
\ No newline at end of file
+        mock_session.close.assert_called_once()
+
+
+def test_ingest_jobs_bulk_upsert(sqlite_session):
+    feed = [
+        {"title": "Job 1", "company_name": "Co 1", "description": "Desc 1", "candidate_required_location": "Worldwide", "tags": []},
+        {"title": "Job 1", "company_name": "Co 1", "description": "Repost", "candidate_required_location": "Worldwide", "tags": []},
+        {"title": "Job 2", "company_name": "Co 2", "description": "Desc 2", "candidate_required_location": "Local", "tags": []},
+    ]
+    embed = lambda texts: np.full((len(texts), 4), 0.5, dtype=np.float32)
+
+    with patch('backend.ingestion.scraping.fetch_jobs', side_effect=feeding(feed)), \
+         patch('backend.ingestion.scraping.SessionLocal', sqlite_session), \
+         patch('backend.ingestion.scraping.embed_texts', side_effect=embed) as mock_embed, \
+         patch('backend.ingestion.scraping.job_store'):
+        first = ingest_jobs()
+        second = ingest_jobs()
+
+    assert (first["inserted"], first["skipped"]) == (2, 1)
+    assert (second["inserted"], second["skipped"]) == (0, 3)
+    assert mock_embed.call_count == 1  # nothing re-encoded on the second run
+    db = sqlite_session()
+    assert db.query(Jobs).count() == 2
+    db.close()
+
+
+def test_ingest_jobs_skips_known_postings_without_company(sqlite_session):
+    feed = [
+        {"title": "Job 1", "company_name": None, "description": "Desc 1", "candidate_required_location": "Worldwide", "tags": []},
+        {"title": "Job 2", "company_name": "Co 2", "description": "Desc 2", "candidate_required_location": "Local", "tags": []},
+    ]
+    embed = lambda texts: np.full((len(texts), 4), 0.5, dtype=np.float32)
+
+    with patch('backend.ingestion.scraping.fetch_jobs', side_effect=feeding(feed)), \
+         patch('backend.ingestion.scraping.SessionLocal', sqlite_session), \
+         patch('backend.ingestion.scraping.embed_texts', side_effect=embed) as mock_embed, \
+         patch('backend.ingestion.scraping.job_store'):
+        first = ingest_jobs()
+        second = ingest_jobs()
+
+    assert (first["inserted"], second["inserted"], second["skipped"]) == (2, 0, 2)
+    assert mock_embed.call_count == 1
+    db = sqlite_session()
+    assert db.query(Jobs).filter(Jobs.company.is_(None)).count() == 1
+    db.close()
+
+
+def test_ingest_jobs_commits_per_chunk_and_keeps_them_on_failure(sqlite_session):
+    feed = [
+        {"title": f"Job {i}", "company_name": "Co", "description": "Desc", "candidate_required_location": "Worldwide", "tags": []}
+        for i in range(7)
+    ]
+    calls = []
+
+    def embed(texts):
+        calls.append(len(texts))
+        if len(calls) == 3:
+            raise RuntimeError("encoder crashed")
+        return np.full((len(texts), 4), 0.5, dtype=np.float32)
+
+    with patch('backend.ingestion.scraping.fetch_jobs', side_effect=feeding(feed)), \
+         patch('backend.ingestion.scraping.SessionLocal', sqlite_session), \
+         patch('backend.ingestion.scraping.embed_texts', side_effect=embed), \
+         patch('backend.ingestion.scraping.INSERT_CHUNK_SIZE', 3), \
+         patch('backend.ingestion.scraping.job_store'):
+        with pytest.raises(ValueError, match="Scraping Error - Ingestion error: encoder crashed"):
+            ingest_jobs()
+
+    assert calls == [3, 3, 1]
+    db = sqlite_session()
+    assert db.query(Jobs).count() == 6  # the two chunks committed before the failure survive
+    db.close()
+
+
+def test_ingest_pipeline_streams_feed_from_server(feed_server, state, sqlite_session):
+    jobs = [
+        {"title": f"Job {i}", "company_name": "Co", "description": "Desc", "candidate_required_location": "Worldwide", "tags": ["Python"]}
+        for i in range(50)
+    ]
+    feed_server.feeds["/remote-jobs"] = ('"v1"', {"job-count": 50, "jobs": jobs})
+    source = JobSource("local", f"{feed_server.url}/remote-jobs")
+    embed = lambda texts: np.full((len(texts), 4), 0.5, dtype=np.float32)
+
+    with patch('backend.ingestion.sources.get_sources', return_value=[source]), \
+         patch('backend.ingestion.scraping.SessionLocal', sqlite_session), \
+         patch('backend.ingestion.scraping.embed_texts', side_effect=embed), \
+         patch('backend.ingestion.scraping.INSERT_CHUNK_SIZE', 16), \
+         patch('backend.ingestion.scraping.job_store'), \
+         patch('backend.ingestion.scraping.refresh_skill_matcher'):
+        stats = ingest_jobs()
+        assert (stats["fetched"], stats["inserted"]) == (50, 50)
+        assert stats["stages"]["insert"]["items"] == 50
+        assert state.get("local") == {"etag": '"v1"'}  # committed with the jobs
+
+        stats = ingest_jobs()
+        assert stats["fetched"] == 0  # 304
+
+
+def test_json_array_stream_parses_incrementally():
+    document = json.dumps({"0-legal-notice": "see {jobs: [}", "job-count": 12345, "jobs": [{"title": "A", "tags": ["x"]}, {"title": "B"}], "tail": [1, 2]})
+    parser = JsonArrayStream("jobs")
+    items = []
+    for char in document:  # worst case: one character per chunk
+        items.extend(parser.feed(char))
+    items.extend(parser.close())
+    assert items == [{"title": "A", "tags": ["x"]}, {"title": "B"}]
+    assert len(parser.buffer) == 0
+
+
+def test_json_array_stream_rejects_bad_documents():
+    with pytest.raises(ValueError, match='no complete "jobs" array'):
+        parser = JsonArrayStream("jobs")
+        parser.feed('{"invalid": "data"}')
+        parser.close()
+    with pytest.raises(ValueError, match="Unterminated string"):  # truncated download
+        parser = JsonArrayStream("jobs")
+        parser.feed('{"jobs": [{"title": "A"}, {"tit')
+        parser.close()
+    with pytest.raises(ValueError):
+        JsonArrayStream("jobs").feed('["not", "an", "object"]')
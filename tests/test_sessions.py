@@ -0,0 +1,31 @@
+import numpy as np
+from unittest.mock import patch
+from backend.sessions import ResumeStore
+
+
+def test_put_and_get():
+    store = ResumeStore(maxsize=10, ttl=60, path="")
+    resume_id = store.put("resume text", ["Python"], [0.1, 0.2, 0.3])
+    resume = store.get(resume_id)
+    assert resume["text"] == "resume text"
+    assert resume["skills"] == ["Python"]
+    assert resume["embedding"].dtype == np.float32
+    assert store.get("unknown") is None
+
+
+def test_ttl_expiry():
+    store = ResumeStore(maxsize=10, ttl=60, path="")
+    with patch('backend.cache.time.monotonic', return_value=0.0):
+        resume_id = store.put("resume text", [], [0.1])
+    with patch('backend.cache.time.monotonic', return_value=61.0):
+        assert store.get(resume_id) is None
+
+
+def test_persisted_store_survives_restart(tmp_path):
+    path = str(tmp_path / "resumes.sqlite3")
+    resume_id = ResumeStore(maxsize=10, ttl=60, path=path).put("résumé", ["SQL"], [0.5, 0.25])
+
+    resume = ResumeStore(maxsize=10, ttl=60, path=path).get(resume_id)
+    assert resume["text"] == "résumé"
+    assert resume["skills"] == ["SQL"]
+    assert np.array_equal(resume["embedding"], np.array([0.5, 0.25], dtype=np.float32))
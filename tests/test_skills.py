@@ -0,0 +1,41 @@
+from unittest.mock import MagicMock
+from backend.skills import normalize_skill, SkillMatcher, SkillVocabulary, build_skill_index, load_skill_vocabulary
+
+
+def test_normalize_skill():
+    assert normalize_skill(" Python ") == "python"
+    assert normalize_skill("Machine  Learning") == "machine learning"
+    assert normalize_skill("C++") == "c++"
+    assert normalize_skill("Node.js.") == "node.js"
+
+
+def test_skill_matcher_multiword_and_symbols():
+    matcher = SkillMatcher(["C++", "C#", "CI/CD", "Google Cloud", "Go"])
+    text = "Experience: C++, c# and ci/cd pipelines on Google  Cloud; learning Go."
+    assert matcher.match(text) == ["C++", "C#", "CI/CD", "Google Cloud", "Go"]
+    assert matcher.match("no matches here") == []
+
+
+def test_skill_matcher_empty_vocabulary():
+    matcher = SkillMatcher([])
+    assert len(matcher) == 0
+    assert matcher.match("Python") == []
+
+
+def test_load_skill_vocabulary():
+    db = MagicMock()
+    db.query.return_value.all.return_value = [(["Python", "SQL"],), (None,), (["SQL", "Go"],)]
+    assert load_skill_vocabulary(db) == {"Python", "SQL", "Go"}
+
+
+def test_skill_vocabulary_interns_normalized_names():
+    vocabulary = SkillVocabulary()
+    assert vocabulary.intern("Python") == vocabulary.intern("python ") == 0
+    assert vocabulary.intern("SQL") == 1
+    assert vocabulary.intern("  ") is None
+    assert vocabulary.lookup("rust") is None
+    assert vocabulary.mask(["PYTHON", "rust"]).tolist() == [True, False]
+
+    indptr, ids = build_skill_index([["sql", "Python", "python"], [], ["Go"]], vocabulary)
+    assert indptr.tolist() == [0, 2, 2, 3]
+    assert ids.tolist() == [0, 1, 2]
@@ -0,0 +1,133 @@
+import os
+import numpy as np
+from unittest.mock import patch
+from backend.ann import ExactIndex, IVFIndex, _synthetic_arrays
+from backend.db import SessionLocal
+from backend.embedding import encode_embedding
+from backend.filters import JobFilter
+from backend.models import Jobs, corpus_version
+from backend.snapshot import current_snapshot, load_snapshot, publish_snapshot, snapshot_name
+from backend.vector_store import JobVectorStore
+
+
+def make_arrays(rows=200, version=None):
+    arrays, vocab = _synthetic_arrays(rows, 16, clusters=4, seed=rows)
+    arrays.remote = np.arange(rows) % 2 == 0
+    arrays.version = version or (rows, rows)
+    return arrays, vocab
+
+
+def test_snapshot_round_trip_is_memory_mapped(tmp_path):
+    arrays, vocab = make_arrays()
+    publish_snapshot(arrays, str(tmp_path))
+    assert current_snapshot(str(tmp_path)) == "v200-200"
+
+    loaded = load_snapshot(str(tmp_path))
+    assert isinstance(loaded.matrix, np.memmap)
+    assert not loaded.matrix.flags.writeable
+    assert loaded.version == (200, 200)
+    query = arrays.matrix[3]
+    skills = vocab[:5]
+    assert np.array_equal(loaded.similarities(query), arrays.similarities(query))
+    assert np.array_equal(loaded.skill_overlaps(skills), arrays.skill_overlaps(skills))
+    assert np.array_equal(JobFilter(remote=True, companies=["co"]).mask(loaded), JobFilter(remote=True, companies=["co"]).mask(arrays))
+    assert list(loaded.titles) == list(arrays.titles)
+    # metadata stays packed on disk and is decoded per row
+    assert loaded.skills[7] == arrays.skills[7] and loaded.companies[0] == "Co"
+
+
+def test_publish_swaps_current_and_prunes_old_versions(tmp_path):
+    for rows in (10, 20, 30, 40):
+        arrays, _ = make_arrays(rows)
+        publish_snapshot(arrays, str(tmp_path), keep=2)
+    assert current_snapshot(str(tmp_path)) == "v40-40"
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith("v")) == ["v30-30", "v40-40"]
+    assert len(load_snapshot(str(tmp_path))) == 40
+
+
+def test_snapshot_carries_the_trained_index(tmp_path):
+    arrays, _ = make_arrays(400)
+    arrays.companies[3] = None
+    index = IVFIndex(nlist=8)
+    index.build(arrays)
+    publish_snapshot(arrays, str(tmp_path), index=index)
+
+    # another worker maps the snapshot and adopts the index instead of training its own
+    store = JobVectorStore(index=IVFIndex(nlist=8), snapshot_dir=str(tmp_path))
+    with patch.object(IVFIndex, 'train') as mock_train:
+        assert store.load_snapshot()
+        mock_train.assert_not_called()
+    assert np.array_equal(store.index.centroids, index.centroids)
+    assert store.arrays.companies[3] is None
+    query = arrays.matrix[5]
+    assert np.array_equal(store.index.search(store.arrays, query, 5)[0], index.search(arrays, query, 5)[0])
+
+
+def test_load_snapshot_ignores_missing_or_unknown_format(tmp_path):
+    assert load_snapshot(str(tmp_path)) is None
+    arrays, _ = make_arrays()
+    path = publish_snapshot(arrays, str(tmp_path))
+    with open(os.path.join(path, "manifest.json"), "w") as f:
+        f.write('{"format": 999}')
+    assert load_snapshot(str(tmp_path)) is None
+
+
+def test_stores_share_the_published_snapshot(tmp_path):
+    db = SessionLocal()
+    try:
+        db.query(Jobs).delete()
+        db.commit()
+        for i in range(5):
+            db.add(Jobs(title=f"Job {i}", company="Co", skills=["Python"], embedding=encode_embedding([1.0, float(i)])))
+        db.commit()
+
+        first = JobVectorStore(index=ExactIndex(), snapshot_dir=str(tmp_path))
+        arrays = first.get(db)  # loads the table and publishes
+        assert current_snapshot(str(tmp_path)) == snapshot_name(corpus_version(db))
+
+        # another worker: cold start maps the snapshot and never reads the table
+        second = JobVectorStore(index=ExactIndex(), snapshot_dir=str(tmp_path))
+        with patch('backend.vector_store.JobArrays.from_rows') as mock_from_rows:
+            assert second.load_snapshot()
+            mapped = second.get(db)
+            mock_from_rows.assert_not_called()
+        assert isinstance(mapped.matrix, np.memmap)
+        assert np.array_equal(mapped.ids, arrays.ids)
+
+        # new version published by the first process is picked up by the second
+        db.add(Jobs(title="Job 5", company="Co", skills=[], embedding=encode_embedding([0.0, 1.0])))
+        db.commit()
+        first.refresh(db)
+        with patch('backend.vector_store.JobArrays.from_rows') as mock_from_rows:
+            assert len(second.get(db)) == 6
+            mock_from_rows.assert_not_called()
+    finally:
+        db.close()
+
+
+def test_in_place_rewrite_retires_the_snapshot(tmp_path):
+    from sqlalchemy import text
+    from backend.models import bump_corpus_version
+
+    db = SessionLocal()
+    try:
+        db.query(Jobs).delete()
+        db.add(Jobs(title="Job", company="Co", skills=[], embedding=encode_embedding([0.0, 0.0])))
+        db.commit()
+        first = JobVectorStore(index=ExactIndex(), snapshot_dir=str(tmp_path))
+        stale = first.get(db)
+        assert not stale.matrix.any()
+
+        # a backfill-style rewrite outside the ORM: same row count, same max id
+        with db.get_bind().begin() as conn:
+            conn.execute(text("UPDATE jobs SET embedding = :embedding"), {"embedding": encode_embedding([1.0, 0.0])})
+            bump_corpus_version(conn, rewrite=True)
+
+        # a restarted worker maps the old snapshot, but get() sees the new version and reloads
+        second = JobVectorStore(index=ExactIndex(), snapshot_dir=str(tmp_path))
+        assert second.load_snapshot()
+        fresh = second.get(db)
+        assert fresh.matrix[0].tolist() == [1.0, 0.0]
+        assert current_snapshot(str(tmp_path)) == snapshot_name(corpus_version(db))
+    finally:
+        db.close()